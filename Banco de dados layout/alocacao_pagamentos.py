@@ -0,0 +1,163 @@
+import time
+import numpy as np
+import pandas as pd
+from esquemas import centavos
+
+LIMITE_TEMPO = 2.0         # segundos por pagamento
+MAX_COMBINACOES = 10
+LIMITE_MEIO_A_MEIO = 32    # até aqui a busca é exaustiva (2 × 2^16 somas)
+JANELA_DIAS = 45
+MAX_FATURAS = 600          # acima disso ficam as de vencimento mais próximo
+
+class _Fim(Exception):
+    pass
+
+def _somas(valores):
+    """
+    Soma, quantidade de itens e máscara de bits de todos os subconjuntos
+    """
+    somas = np.zeros(1, dtype=np.int64)
+    quantidades = np.zeros(1, dtype=np.int64)
+    mascaras = np.zeros(1, dtype=np.int64)
+    for i, v in enumerate(valores):
+        somas = np.concatenate([somas, somas + v])
+        quantidades = np.concatenate([quantidades, quantidades + 1])
+        mascaras = np.concatenate([mascaras, mascaras | (1 << i)])
+    return somas, quantidades, mascaras
+
+def _meio_a_meio(valores, alvo, tolerancia, quantidade, prazo, maximo):
+    """
+    Meet-in-the-middle: somas das duas metades, a da direita ordenada;
+    para cada soma da esquerda, o complemento é uma faixa via searchsorted
+    """
+    meio = len(valores) // 2
+    esquerda, direita = valores[:meio], valores[meio:]
+    s_esq, q_esq, m_esq = _somas(esquerda)
+    s_dir, q_dir, m_dir = _somas(direita)
+    ordem = np.argsort(s_dir, kind="stable")
+    s_dir, q_dir, m_dir = s_dir[ordem], q_dir[ordem], m_dir[ordem]
+
+    inicio = np.searchsorted(s_dir, alvo - tolerancia - s_esq, side="left")
+    fim = np.searchsorted(s_dir, alvo + tolerancia - s_esq, side="right")
+    # Menos faturas primeiro: costuma ser a explicação certa
+    candidatas = np.flatnonzero(fim > inicio)
+    candidatas = candidatas[np.argsort(q_esq[candidatas], kind="stable")]
+
+    resultados = []
+    for n, i in enumerate(candidatas):
+        if n % 256 == 0 and time.perf_counter() > prazo:
+            break
+        for j in range(inicio[i], fim[i]):
+            if quantidade is not None and q_esq[i] + q_dir[j] != quantidade:
+                continue
+            if q_esq[i] + q_dir[j] == 0:
+                continue
+            itens = [k for k in range(meio) if m_esq[i] >> k & 1]
+            itens += [meio + k for k in range(len(direita)) if m_dir[j] >> k & 1]
+            resultados.append(itens)
+            if len(resultados) >= maximo * 4:
+                return resultados
+    return resultados
+
+def _profundidade(valores, alvo, tolerancia, quantidade, prazo, maximo):
+    """
+    Busca em profundidade com poda pelo que ainda falta e pelo que ainda
+    cabe (valores em ordem decrescente), interrompida no prazo
+    """
+    n = len(valores)
+    sufixo = np.concatenate([np.cumsum(valores[::-1])[::-1], [0]]).tolist()
+    valores = valores.tolist()
+    resultados, escolhidos = [], []
+    nos = [0]
+
+    def visitar(i, soma):
+        nos[0] += 1
+        if nos[0] % 1024 == 0 and time.perf_counter() > prazo:
+            raise _Fim
+        if escolhidos and abs(alvo - soma) <= tolerancia and (quantidade is None or len(escolhidos) == quantidade):
+            resultados.append(list(escolhidos))
+            if len(resultados) >= maximo:
+                raise _Fim
+        if quantidade is not None and len(escolhidos) >= quantidade:
+            return
+        for j in range(i, n):
+            v = valores[j]
+            if soma + sufixo[j] < alvo - tolerancia:
+                break
+            # Valores iguais no mesmo nível gerariam as mesmas somas
+            if soma + v > alvo + tolerancia or (j > i and v == valores[j - 1]):
+                continue
+            escolhidos.append(j)
+            visitar(j + 1, soma + v)
+            escolhidos.pop()
+
+    try:
+        visitar(0, 0)
+    except _Fim:
+        pass
+    return resultados
+
+def combinacoes(valores, alvo, tolerancia=0, quantidade=None, limite_tempo=LIMITE_TEMPO, maximo=MAX_COMBINACOES):
+    """
+    Subconjuntos de `valores` (centavos inteiros, positivos) cuja soma fica a
+    até `tolerancia` do alvo, como listas de posições. Responde dentro de
+    `limite_tempo`; com muitos valores o resultado pode não ser exaustivo.
+    """
+    valores = np.asarray(valores, dtype=np.int64)
+    prazo = time.perf_counter() + limite_tempo
+    # Só entra o que cabe no alvo; ordem decrescente ajuda as podas
+    posicoes = np.flatnonzero((valores > 0) & (valores <= alvo + tolerancia))
+    posicoes = posicoes[np.argsort(-valores[posicoes], kind="stable")]
+    if len(posicoes) == 0:
+        return []
+    if len(posicoes) <= LIMITE_MEIO_A_MEIO:
+        achados = _meio_a_meio(valores[posicoes], alvo, tolerancia, quantidade, prazo, maximo)
+    else:
+        achados = _profundidade(valores[posicoes], alvo, tolerancia, quantidade, prazo, maximo)
+    achados = [sorted(posicoes[a].tolist()) for a in achados]
+    achados.sort(key=lambda a: (abs(alvo - int(valores[a].sum())), len(a)))
+    return achados[:maximo]
+
+def sugerir_alocacoes(valor, data, documentos, cnpj=None, pagador=None, janela_dias=JANELA_DIAS,
+                      tolerancia_centavos=0, quantidade=None, limite_tempo=LIMITE_TEMPO):
+    """
+    Combinações de documentos em aberto (ver documentos_abertos) do mesmo
+    pagador, com vencimento na janela da data do pagamento, que somam o
+    valor recebido. Uma linha por combinação.
+    """
+    candidatos = documentos
+    if cnpj:
+        digitos = "".join(c for c in str(cnpj) if c.isdigit())
+        candidatos = candidatos[(candidatos["CNPJ"] == digitos).fillna(False).astype(bool)]
+    elif pagador:
+        candidatos = candidatos[candidatos["Pagador"] == pagador]
+    data = pd.Timestamp(data)
+    distancia = (candidatos["Data Documento"] - data).dt.days.abs()
+    candidatos = candidatos[distancia <= janela_dias]
+    if len(candidatos) > MAX_FATURAS:
+        candidatos = candidatos.loc[distancia[candidatos.index].nsmallest(MAX_FATURAS).index]
+    candidatos = candidatos.reset_index(drop=True)
+
+    alvo = int(centavos(pd.Series([valor])).iloc[0])
+    achados = combinacoes(
+        candidatos["centavos"].to_numpy(dtype=np.int64), alvo, tolerancia_centavos, quantidade, limite_tempo
+    )
+    linhas = []
+    for posicoes in achados:
+        escolhidos = candidatos.iloc[posicoes].sort_values("Data Documento")
+        total = int(escolhidos["centavos"].sum())
+        linhas.append({
+            "Documentos": ", ".join(escolhidos["Documento"]),
+            "Qtd": len(escolhidos),
+            "Total": total / 100,
+            "Diferença": (alvo - total) / 100,
+            "Vencimentos": f"{escolhidos['Data Documento'].min():%d/%m/%Y} a {escolhidos['Data Documento'].max():%d/%m/%Y}",
+            "Dias": int((escolhidos["Data Documento"] - data).dt.days.abs().max()),
+        })
+    colunas = ["Documentos", "Qtd", "Total", "Diferença", "Vencimentos", "Dias"]
+    if not linhas:
+        return pd.DataFrame(columns=colunas)
+    # Entre combinações igualmente exatas, as de vencimento mais próximo
+    resultado = pd.DataFrame(linhas, columns=colunas)
+    ordem = resultado.assign(erro=resultado["Diferença"].abs()).sort_values(["erro", "Qtd", "Dias"], kind="stable").index
+    return resultado.loc[ordem].reset_index(drop=True)
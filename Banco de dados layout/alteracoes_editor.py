@@ -0,0 +1,110 @@
+from dataclasses import dataclass, field
+import pandas as pd
+import streamlit as st
+
+@dataclass
+class ConjuntoAlteracoes:
+    """
+    Alterações feitas num st.data_editor, já traduzidas das posições da
+    tabela exibida para o identificador estável de cada linha.
+
+    editadas: coluna -> Series de novos valores indexada pelo id (só as
+    células tocadas); adicionadas: linhas novas; removidas: ids.
+    """
+    editadas: dict = field(default_factory=dict)
+    adicionadas: pd.DataFrame = field(default_factory=pd.DataFrame)
+    removidas: list = field(default_factory=list)
+
+    def vazio(self):
+        return not self.editadas and self.adicionadas.empty and not self.removidas
+
+    def ids_editados(self):
+        """
+        Ids das linhas com alguma célula editada
+        """
+        if not self.editadas:
+            return pd.Index([])
+        return pd.Index(pd.concat([s.index.to_series() for s in self.editadas.values()]).unique())
+
+def ler_alteracoes(chave_editor, exibido, chave=None):
+    """
+    Lê os deltas do editor `chave_editor` (edited_rows/added_rows/deleted_rows)
+    sobre o DataFrame `exibido`. O id de cada linha é a coluna `chave` ou,
+    sem ela, o índice de `exibido`.
+    """
+    estado = st.session_state.get(chave_editor) or {}
+    ids = exibido[chave].to_numpy() if chave is not None else exibido.index.to_numpy()
+
+    # Células por coluna: {coluna: {id: novo}}; None (célula apagada) é mantido
+    por_coluna = {}
+    for posicao, celulas in (estado.get("edited_rows") or {}).items():
+        posicao = int(posicao)
+        if posicao >= len(ids):
+            continue
+        for coluna, valor in celulas.items():
+            por_coluna.setdefault(coluna, {})[ids[posicao]] = valor
+    editadas = {
+        coluna: pd.Series(list(valores.values()), index=list(valores.keys()), dtype=object)
+        for coluna, valores in por_coluna.items()
+    }
+
+    removidas = [ids[int(p)] for p in estado.get("deleted_rows") or [] if int(p) < len(ids)]
+    adicionadas = pd.DataFrame.from_records([linha for linha in estado.get("added_rows") or [] if linha])
+    return ConjuntoAlteracoes(editadas, adicionadas, removidas)
+
+def alteracoes_celula(conjunto, exibido, chave=None):
+    """
+    Lista (id, coluna, antigo, novo) das células editadas, no formato do
+    DiarioAlteracoes. Células reeditadas para o valor original são ignoradas.
+    """
+    originais = exibido.set_index(chave) if chave is not None else exibido
+    originais = originais[~originais.index.duplicated(keep="last")]
+    alteracoes = []
+    for coluna, novos in conjunto.editadas.items():
+        if coluna not in originais.columns:
+            continue
+        antigos = originais[coluna].reindex(novos.index).astype(object)
+        iguais = (antigos.to_numpy() == novos.to_numpy()) | (antigos.isna().to_numpy() & novos.isna().to_numpy())
+        mudou = ~iguais
+        alteracoes.extend(
+            (valor_chave, coluna, antigo, novo)
+            for valor_chave, antigo, novo in zip(novos.index[mudou], antigos[mudou], novos[mudou])
+        )
+    return alteracoes
+
+def aplicar_alteracoes(df, conjunto, chave=None):
+    """
+    Aplica o conjunto sobre `df` (tabela inteira ou só a exibida) com uma
+    atribuição por coluna, sem percorrer linha a linha. Retorna o novo
+    DataFrame e a máscara das linhas afetadas (editadas ou adicionadas).
+    """
+    df = df.copy()
+    ids = df[chave] if chave is not None else df.index.to_series(index=df.index)
+    afetadas = pd.Series(False, index=df.index)
+
+    for coluna, novos in conjunto.editadas.items():
+        alvo = ids.isin(novos.index)
+        if not alvo.any():
+            continue
+        if coluna not in df.columns:
+            df[coluna] = None
+        valores = ids[alvo].map(novos)
+        if isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            faltando = pd.Index(valores.dropna().unique()).difference(df[coluna].cat.categories)
+            df[coluna] = df[coluna].cat.add_categories(faltando)
+        df.loc[alvo, coluna] = valores.to_numpy()
+        afetadas |= alvo
+
+    if conjunto.removidas:
+        manter = ~ids.isin(conjunto.removidas)
+        df, afetadas = df[manter], afetadas[manter]
+
+    if not conjunto.adicionadas.empty:
+        novas = conjunto.adicionadas
+        if chave is None and len(df):
+            # Linhas sem chave ganham índice depois do maior existente
+            inicio = int(pd.to_numeric(df.index, errors="coerce").max()) + 1
+            novas = novas.set_axis(range(inicio, inicio + len(novas)))
+        df = pd.concat([df, novas], ignore_index=chave is not None)
+        afetadas = pd.Series([*afetadas.to_numpy(), *([True] * len(novas))], index=df.index)
+    return df, afetadas
@@ -0,0 +1,275 @@
+import os
+import sqlite3
+from contextlib import closing
+import numpy as np
+import pandas as pd
+from esquemas import ESQUEMAS, ler_tabela, gravar_tabela
+
+# "csv" (padrão) ou "sqlite"
+BACKEND = os.getenv("DASHBOARD_BACKEND", "csv").lower()
+ARQ_SQLITE = os.getenv("DASHBOARD_SQLITE", "data/dashboard.db")
+
+# Colunas indexadas quando presentes na tabela. Os índices servem às
+# escritas por chave (UPDATE/DELETE); as telas leem a tabela inteira e
+# consultam os índices em memória (ex.: IndiceFaturas)
+COLUNAS_INDICE = ["Número", "Nº Fatura", "Data de Emissão", "ID Transação"]
+
+FORMATO_DATA_SQL = "%Y-%m-%d %H:%M:%S"
+LOTE_SQL = 500
+
+def _q(nome):
+    """
+    Identificador SQL entre aspas (as colunas têm espaços e acentos)
+    """
+    return '"' + str(nome).replace('"', '""') + '"'
+
+def _valor_sql(valor):
+    """
+    Converte valores pandas/numpy para tipos aceitos pelo sqlite3
+    """
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    if isinstance(valor, pd.Timestamp):
+        return valor.strftime(FORMATO_DATA_SQL)
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+class BackendCSV:
+    """
+    Persistência em CSV pelo esquema registrado (comportamento original)
+    """
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.arquivo = ESQUEMAS[nome]["arquivo"]
+
+    def existe(self):
+        return os.path.exists(self.arquivo)
+
+    def carregar(self, colunas=None):
+        df = ler_tabela(self.nome, self.arquivo)
+        if colunas is not None:
+            df = df[[c for c in colunas if c in df.columns]]
+        return df
+
+    def salvar(self, df):
+        gravar_tabela(self.nome, df, self.arquivo)
+
+    def atualizar(self, chave, valor_chave, campos):
+        self.atualizar_varios(chave, pd.DataFrame([{chave: valor_chave, **campos}]))
+
+    def atualizar_varios(self, chave, alteracoes):
+        df = self.carregar()
+        if df.empty or alteracoes.empty:
+            return
+        posicoes = pd.Series(np.arange(len(df)), index=df[chave].astype(str))
+        posicoes = posicoes[~posicoes.index.duplicated()]
+        alvo = alteracoes[chave].astype(str)
+        encontrados = alvo.isin(posicoes.index)
+        linhas = posicoes.loc[alvo[encontrados]].to_numpy()
+        for coluna in alteracoes.columns.drop(chave):
+            df.iloc[linhas, df.columns.get_loc(coluna)] = alteracoes.loc[encontrados, coluna].to_numpy()
+        self.salvar(df)
+
+    def upsert(self, novos, chave):
+        df = self.carregar()
+        if not df.empty:
+            df = df[~df[chave].astype(str).isin(novos[chave].astype(str))]
+            novos = pd.concat([df, novos], ignore_index=True)
+        self.salvar(novos)
+
+class BackendSQLite:
+    """
+    Persistência em SQLite local (WAL) com índices nas colunas chave.
+    Edições de linha viram UPDATE/DELETE+INSERT indexados em vez de
+    regravar o arquivo inteiro. A assinatura do arquivo de origem da
+    última importação fica registrada em _origens.
+    """
+
+    def __init__(self, nome, caminho=ARQ_SQLITE):
+        self.nome = nome
+        self.caminho = caminho
+
+    def _conectar(self):
+        pasta = os.path.dirname(self.caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        con = sqlite3.connect(self.caminho, timeout=30)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS _tipos_colunas "
+            "(tabela TEXT, coluna TEXT, tipo TEXT, PRIMARY KEY (tabela, coluna))"
+        )
+        con.execute("CREATE TABLE IF NOT EXISTS _origens (tabela TEXT PRIMARY KEY, assinatura TEXT)")
+        return con
+
+    def existe(self):
+        if not os.path.exists(self.caminho):
+            return False
+        with closing(self._conectar()) as con:
+            linha = con.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (self.nome,)
+            ).fetchone()
+        return linha is not None
+
+    def origem(self):
+        """
+        Assinatura do arquivo de origem registrada na última importação
+        """
+        if not os.path.exists(self.caminho):
+            return None
+        with closing(self._conectar()) as con:
+            linha = con.execute("SELECT assinatura FROM _origens WHERE tabela=?", (self.nome,)).fetchone()
+        return linha[0] if linha else None
+
+    def registrar_origem(self, assinatura):
+        with closing(self._conectar()) as con, con:
+            self._gravar_origem(con, assinatura)
+
+    def _gravar_origem(self, con, assinatura):
+        con.execute(
+            "INSERT OR REPLACE INTO _origens (tabela, assinatura) VALUES (?, ?)", (self.nome, assinatura)
+        )
+
+    def _tipos(self, con):
+        linhas = con.execute(
+            "SELECT coluna, tipo FROM _tipos_colunas WHERE tabela=?", (self.nome,)
+        ).fetchall()
+        return dict(linhas)
+
+    def _restaurar_tipos(self, df, tipos):
+        for coluna, tipo in tipos.items():
+            if coluna not in df.columns:
+                continue
+            if tipo.startswith("datetime"):
+                df[coluna] = pd.to_datetime(df[coluna], format=FORMATO_DATA_SQL, errors="coerce")
+            elif tipo in ("category", "Int64"):
+                df[coluna] = df[coluna].astype(tipo)
+        return df
+
+    def _preparar(self, df):
+        """
+        Datas viram texto ISO ordenável; o tipo original fica registrado
+        """
+        df = df.copy()
+        tipos = {}
+        for coluna in df.columns:
+            tipo = str(df[coluna].dtype)
+            tipos[coluna] = tipo
+            if tipo.startswith("datetime"):
+                df[coluna] = df[coluna].dt.strftime(FORMATO_DATA_SQL)
+            elif tipo == "category":
+                df[coluna] = df[coluna].astype(object)
+        return df, tipos
+
+    def _gravar_tipos(self, con, tipos):
+        con.executemany(
+            "INSERT OR REPLACE INTO _tipos_colunas (tabela, coluna, tipo) VALUES (?, ?, ?)",
+            [(self.nome, c, t) for c, t in tipos.items()],
+        )
+
+    def _criar_indices(self, con, colunas):
+        for posicao, coluna in enumerate(COLUNAS_INDICE):
+            if coluna in colunas:
+                nome_indice = f"idx_{self.nome}_{posicao}"
+                con.execute(
+                    f"CREATE INDEX IF NOT EXISTS {_q(nome_indice)} ON {_q(self.nome)} ({_q(coluna)})"
+                )
+
+    def _colunas_tabela(self, con):
+        return [linha[1] for linha in con.execute(f"PRAGMA table_info({_q(self.nome)})")]
+
+    def _garantir_colunas(self, con, colunas):
+        existentes = self._colunas_tabela(con)
+        for coluna in colunas:
+            if coluna not in existentes:
+                con.execute(f"ALTER TABLE {_q(self.nome)} ADD COLUMN {_q(coluna)}")
+
+    def carregar(self, colunas=None):
+        if not self.existe():
+            self._migrar_csv()
+        with closing(self._conectar()) as con:
+            existentes = self._colunas_tabela(con)
+            if colunas is not None:
+                existentes = [c for c in colunas if c in existentes]
+            sql = f"SELECT {', '.join(_q(c) for c in existentes)} FROM {_q(self.nome)}"
+            df = pd.read_sql_query(sql, con)
+            return self._restaurar_tipos(df, self._tipos(con))
+
+    def _migrar_csv(self):
+        """
+        Primeira carga: importa o CSV registrado para a tabela SQLite
+        """
+        self.salvar(ler_tabela(self.nome))
+
+    def salvar(self, df, origem=None):
+        """
+        Regrava a tabela inteira. `origem` é a assinatura do arquivo
+        importado, quando a gravação é uma importação.
+        """
+        dados, tipos = self._preparar(df)
+        with closing(self._conectar()) as con, con:
+            con.execute("DELETE FROM _tipos_colunas WHERE tabela=?", (self.nome,))
+            dados.to_sql(self.nome, con, if_exists="replace", index=False, chunksize=LOTE_SQL)
+            self._gravar_tipos(con, tipos)
+            self._criar_indices(con, dados.columns)
+            if origem is not None:
+                self._gravar_origem(con, origem)
+
+    def atualizar(self, chave, valor_chave, campos):
+        self.atualizar_varios(chave, pd.DataFrame([{chave: valor_chave, **campos}]))
+
+    def atualizar_varios(self, chave, alteracoes):
+        """
+        UPDATE indexado por chave para cada linha de `alteracoes`
+        """
+        if alteracoes.empty:
+            return
+        colunas = [c for c in alteracoes.columns if c != chave]
+        sql = (
+            f"UPDATE {_q(self.nome)} SET {', '.join(f'{_q(c)} = ?' for c in colunas)} "
+            f"WHERE {_q(chave)} = ?"
+        )
+        parametros = [
+            [_valor_sql(v) for v in linha[1:]] + [_valor_sql(linha[0])]
+            for linha in alteracoes[[chave] + colunas].itertuples(index=False, name=None)
+        ]
+        with closing(self._conectar()) as con, con:
+            self._garantir_colunas(con, colunas)
+            con.executemany(sql, parametros)
+
+    def upsert(self, novos, chave):
+        """
+        Substitui as linhas com a mesma chave e insere as novas
+        """
+        if not self.existe():
+            self.salvar(novos)
+            return
+        dados, tipos = self._preparar(novos)
+        with closing(self._conectar()) as con, con:
+            self._garantir_colunas(con, dados.columns)
+            chaves = [_valor_sql(v) for v in dados[chave]]
+            for i in range(0, len(chaves), LOTE_SQL):
+                lote = chaves[i:i + LOTE_SQL]
+                con.execute(
+                    f"DELETE FROM {_q(self.nome)} WHERE {_q(chave)} IN ({', '.join('?' * len(lote))})",
+                    lote,
+                )
+            colunas = list(dados.columns)
+            con.executemany(
+                f"INSERT INTO {_q(self.nome)} ({', '.join(_q(c) for c in colunas)}) "
+                f"VALUES ({', '.join('?' * len(colunas))})",
+                [[_valor_sql(v) for v in linha] for linha in dados.itertuples(index=False, name=None)],
+            )
+            tipos_atuais = self._tipos(con)
+            self._gravar_tipos(con, {c: t for c, t in tipos.items() if c not in tipos_atuais})
+
+def obter_backend(nome):
+    """
+    Backend de persistência configurado (DASHBOARD_BACKEND) para a tabela
+    """
+    if BACKEND == "sqlite":
+        return BackendSQLite(nome)
+    return BackendCSV(nome)
@@ -2,8 +2,6 @@ import streamlit as st
 import hashlib
 import json
 import os
-from azure.keyvault.secrets import SecretClient
-from azure.identity import DefaultAzureCredential
 
 class AuthenticationManager:
     def __init__(self):
@@ -1,13 +1,15 @@
 import os
 import pandas as pd
-from azure.storage.blob import BlobServiceClient
-from azure.keyvault.secrets import SecretClient
-from azure.identity import DefaultAzureCredential
 import streamlit as st
 import logging
 
 class AzureIntegration:
     def __init__(self):
+        # SDKs do Azure importados só quando a integração é usada
+        from azure.identity import DefaultAzureCredential
+        from azure.storage.blob import BlobServiceClient
+        from azure.keyvault.secrets import SecretClient
+
         self.credential = DefaultAzureCredential()
         self.storage_account_name = os.getenv('STORAGE_ACCOUNT_NAME')
         self.key_vault_name = os.getenv('AZURE_KEY_VAULT_NAME')
@@ -141,69 +143,81 @@ class AzureIntegration:
             logging.error(f"Error syncing data to Azure: {e}")
             return False, False
 
+@st.cache_resource(show_spinner=False)
+def obter_integracao():
+    """
+    AzureIntegration única por processo: a credencial e os clientes são
+    reaproveitados entre execuções e sessões (e renovam o token sozinhos)
+    """
+    return AzureIntegration()
+
 def show_azure_status():
     """Show Azure integration status in sidebar"""
-    azure = AzureIntegration()
-    
     with st.sidebar:
-        st.markdown("---")
-        st.markdown("### ☁️ Status Azure")
-        
-        # Check environment variables
-        storage_account = os.getenv('STORAGE_ACCOUNT_NAME')
-        key_vault = os.getenv('AZURE_KEY_VAULT_NAME')
-        client_id = os.getenv('AZURE_CLIENT_ID')
-        
-        if storage_account:
-            st.success("✅ Storage Account")
-        else:
-            st.error("❌ Storage Account")
-        
-        if key_vault:
-            st.success("✅ Key Vault")
-        else:
-            st.error("❌ Key Vault")
-        
-        if client_id:
-            st.success("✅ Managed Identity")
-        else:
-            st.error("❌ Managed Identity")
-        
-        # Test connections
-        if st.button("🔄 Testar Conexões"):
-            with st.spinner("Testando conexões..."):
-                test_results = []
-                
-                # Test Blob Storage
-                try:
-                    if azure.blob_service_client:
-                        containers = azure.blob_service_client.list_containers()
-                        list(containers)  # Try to iterate
-                        test_results.append("✅ Blob Storage")
-                    else:
-                        test_results.append("❌ Blob Storage")
-                except:
+        _status_azure()
+
+@st.fragment
+def _status_azure():
+    """Status no sidebar; o teste de conexões reexecuta só este trecho"""
+    st.markdown("---")
+    st.markdown("### ☁️ Status Azure")
+    
+    # Check environment variables
+    storage_account = os.getenv('STORAGE_ACCOUNT_NAME')
+    key_vault = os.getenv('AZURE_KEY_VAULT_NAME')
+    client_id = os.getenv('AZURE_CLIENT_ID')
+    
+    if storage_account:
+        st.success("✅ Storage Account")
+    else:
+        st.error("❌ Storage Account")
+    
+    if key_vault:
+        st.success("✅ Key Vault")
+    else:
+        st.error("❌ Key Vault")
+    
+    if client_id:
+        st.success("✅ Managed Identity")
+    else:
+        st.error("❌ Managed Identity")
+    
+    # Test connections
+    if st.button("🔄 Testar Conexões"):
+        with st.spinner("Testando conexões..."):
+            azure = obter_integracao()
+            test_results = []
+            
+            # Test Blob Storage
+            try:
+                if azure.blob_service_client:
+                    containers = azure.blob_service_client.list_containers()
+                    list(containers)  # Try to iterate
+                    test_results.append("✅ Blob Storage")
+                else:
                     test_results.append("❌ Blob Storage")
-                
-                # Test Key Vault
-                try:
-                    if azure.secret_client:
-                        azure.secret_client.list_properties_of_secrets()
-                        test_results.append("✅ Key Vault")
-                    else:
-                        test_results.append("❌ Key Vault")
-                except:
+            except:
+                test_results.append("❌ Blob Storage")
+            
+            # Test Key Vault
+            try:
+                if azure.secret_client:
+                    azure.secret_client.list_properties_of_secrets()
+                    test_results.append("✅ Key Vault")
+                else:
                     test_results.append("❌ Key Vault")
-                
-                for result in test_results:
-                    if "✅" in result:
-                        st.success(result)
-                    else:
-                        st.error(result)
+            except:
+                test_results.append("❌ Key Vault")
+            
+            for result in test_results:
+                if "✅" in result:
+                    st.success(result)
+                else:
+                    st.error(result)
 
 def backup_to_azure():
     """Backup data to Azure"""
-    azure = AzureIntegration()
+    azure = obter_integracao()
     
     st.subheader("☁️ Backup para Azure")
     
@@ -240,7 +254,7 @@ def backup_to_azure():
 # Email integration using SendGrid
 class EmailService:
     def __init__(self):
-        self.azure = AzureIntegration()
+        self.azure = obter_integracao()
         self.api_key = self.azure.get_secret('SENDGRID-API-KEY')
     
     def send_email(self, to_email, subject, content):
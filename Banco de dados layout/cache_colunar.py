@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import logging
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow é opcional: sem ele o cache fica desativado
+    pa = None
+    feather = None
+
+PASTA_CACHE = "data/cache"
+TAMANHO_BLOCO_HASH = 1024 * 1024
+
+def _caminhos(nome):
+    return (
+        os.path.join(PASTA_CACHE, f"{nome}.arrow"),
+        os.path.join(PASTA_CACHE, f"{nome}.meta.json"),
+    )
+
+def hash_arquivo(caminho):
+    """
+    Calcula o SHA-256 do arquivo lendo em blocos
+    """
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO_HASH), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+def _ler_meta(caminho_meta):
+    try:
+        with open(caminho_meta, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _gravar_meta(caminho_meta, meta):
+    tmp = f"{caminho_meta}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp, caminho_meta)
+
+def _meta_valida(meta, origem):
+    """
+    Confere se o snapshot ainda corresponde ao arquivo de origem.
+    Tamanho e mtime iguais bastam; se só o mtime mudou (cópia, touch),
+    o hash decide e a meta é atualizada.
+    """
+    if not meta:
+        return False
+    info = os.stat(origem)
+    if meta.get("tamanho") != info.st_size:
+        return False
+    if meta.get("mtime_ns") == info.st_mtime_ns:
+        return True
+    if meta.get("sha256") != hash_arquivo(origem):
+        return False
+    meta["mtime_ns"] = info.st_mtime_ns
+    _gravar_meta(_caminhos(meta["nome"])[1], meta)
+    return True
+
+def versao_snapshot(nome):
+    """
+    Retorna o hash do arquivo de origem do snapshot (versão do dataset) ou None
+    """
+    meta = _ler_meta(_caminhos(nome)[1])
+    return meta.get("sha256") if meta else None
+
+def _ler_arrow(caminho_arrow, colunas=None):
+    # Sem compressão na gravação para permitir leitura via memory-map
+    tabela = feather.read_table(caminho_arrow, columns=colunas, memory_map=True)
+    return tabela.to_pandas()
+
+def _gravar_arrow(caminho_arrow, df):
+    os.makedirs(PASTA_CACHE, exist_ok=True)
+    tabela = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+    tmp = f"{caminho_arrow}.tmp"
+    feather.write_feather(tabela, tmp, compression="uncompressed")
+    os.replace(tmp, caminho_arrow)
+    return list(tabela.column_names)
+
+def ler_snapshot(nome, origem, colunas=None):
+    """
+    Lê o snapshot colunar (Arrow IPC, memory-map) se ainda for válido para o
+    arquivo de origem. Retorna None quando não há snapshot utilizável.
+    """
+    if feather is None or not os.path.exists(origem):
+        return None
+    caminho_arrow, caminho_meta = _caminhos(nome)
+    if not os.path.exists(caminho_arrow):
+        return None
+    meta = _ler_meta(caminho_meta)
+    try:
+        if not _meta_valida(meta, origem):
+            return None
+        if colunas is not None:
+            colunas = [c for c in colunas if c in meta.get("colunas", [])]
+        return _ler_arrow(caminho_arrow, colunas)
+    except Exception as e:
+        logging.warning(f"Snapshot {nome} ignorado: {e}")
+        return None
+
+def salvar_snapshot(nome, origem, df):
+    """
+    Grava o DataFrame normalizado como snapshot colunar, associado à
+    assinatura (tamanho/mtime/hash) do arquivo de origem
+    """
+    if feather is None or not os.path.exists(origem):
+        return False
+    caminho_arrow, caminho_meta = _caminhos(nome)
+    try:
+        info = os.stat(origem)
+        colunas = _gravar_arrow(caminho_arrow, df)
+        _gravar_meta(caminho_meta, {
+            "nome": nome,
+            "origem": origem,
+            "tamanho": info.st_size,
+            "mtime_ns": info.st_mtime_ns,
+            "sha256": hash_arquivo(origem),
+            "colunas": colunas,
+        })
+        return True
+    except Exception as e:
+        logging.warning(f"Não foi possível gravar o snapshot {nome}: {e}")
+        return False
+
+def ler_cache(nome):
+    """
+    Lê uma tabela derivada (sem arquivo de origem) e seus metadados.
+    Retorna (None, None) quando não há cache utilizável.
+    """
+    if feather is None:
+        return None, None
+    caminho_arrow, caminho_meta = _caminhos(nome)
+    meta = _ler_meta(caminho_meta)
+    if meta is None or not os.path.exists(caminho_arrow):
+        return None, None
+    try:
+        return _ler_arrow(caminho_arrow), meta
+    except Exception as e:
+        logging.warning(f"Cache {nome} ignorado: {e}")
+        return None, None
+
+def salvar_cache(nome, df, meta):
+    """
+    Grava uma tabela derivada com metadados livres (marca d'água, versão...)
+    """
+    if feather is None:
+        return False
+    caminho_arrow, caminho_meta = _caminhos(nome)
+    try:
+        colunas = _gravar_arrow(caminho_arrow, df)
+        _gravar_meta(caminho_meta, {**meta, "nome": nome, "colunas": colunas})
+        return True
+    except Exception as e:
+        logging.warning(f"Não foi possível gravar o cache {nome}: {e}")
+        return False
+
+def atualizar_meta_cache(nome, meta):
+    """
+    Regrava só os metadados de um cache, sem reescrever a tabela
+    """
+    if feather is None:
+        return False
+    try:
+        _gravar_meta(_caminhos(nome)[1], {**meta, "nome": nome})
+        return True
+    except OSError as e:
+        logging.warning(f"Não foi possível gravar o cache {nome}: {e}")
+        return False
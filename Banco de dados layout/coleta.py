@@ -1,37 +1,43 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date, timedelta
-import os
+from registro_append import RegistroAppend
+from tabela_paginada import tabela_paginada
+
+REGISTRO_COLETAS = RegistroAppend("coletas", chave="Número Coleta")
+
+def carregar_coletas():
+    """
+    Carrega as ordens de coleta (snapshot CSV + log de operações)
+    """
+    return REGISTRO_COLETAS.carregar()
 
 def salvar_coleta(dados_coleta):
     """
-    Salva a ordem de coleta em arquivo CSV
+    Acrescenta a ordem de coleta ao log, sem regravar o arquivo inteiro
     """
     try:
-        # Verifica se arquivo existe
-        if os.path.exists("coletas.csv"):
-            df_existing = pd.read_csv("coletas.csv", sep=";")
-            df_new = pd.DataFrame([dados_coleta])
-            df_final = pd.concat([df_existing, df_new], ignore_index=True)
-        else:
-            df_final = pd.DataFrame([dados_coleta])
-        
-        df_final.to_csv("coletas.csv", sep=";", index=False, encoding="utf-8")
+        REGISTRO_COLETAS.inserir(dados_coleta)
         return True
     except Exception as e:
         st.error(f"Erro ao salvar coleta: {e}")
         return False
 
+def atualizar_status_coleta(numero_coleta, status):
+    """
+    Registra a mudança de status de uma ordem de coleta
+    """
+    REGISTRO_COLETAS.atualizar(numero_coleta, {"Status": status})
+
 def gerar_numero_coleta():
     """
     Gera número sequencial para a coleta
     """
     try:
-        if os.path.exists("coletas.csv"):
-            df = pd.read_csv("coletas.csv", sep=";")
-            if not df.empty:
-                ultimo_num = df["Número Coleta"].max()
-                return ultimo_num + 1
+        df = carregar_coletas()
+        if not df.empty:
+            ultimo_num = df["Número Coleta"].max()
+            return int(ultimo_num) + 1
         return 1001  # Número inicial
     except:
         return 1001
@@ -158,8 +164,8 @@ def mostrar_coleta():
         st.subheader("📅 Agendar Coletas do Dia")
         
         try:
-            if os.path.exists("coletas.csv"):
-                df_coletas = pd.read_csv("coletas.csv", sep=";")
+            df_coletas = carregar_coletas()
+            if not df_coletas.empty:
                 
                 # Filtrar coletas agendadas
                 coletas_agendadas = df_coletas[df_coletas["Status"] == "Agendada"]
@@ -208,24 +214,21 @@ def mostrar_coleta():
                                 with col_act1:
                                     if st.button(f"✅ Executar", key=f"exec_{coleta['Número Coleta']}"):
                                         # Atualizar status para "Em Execução"
-                                        df_coletas.loc[idx, "Status"] = "Em Execução"
-                                        df_coletas.to_csv("coletas.csv", sep=";", index=False)
+                                        atualizar_status_coleta(coleta["Número Coleta"], "Em Execução")
                                         st.success("Status atualizado!")
                                         st.rerun()
                                 
                                 with col_act2:
                                     if st.button(f"✅ Concluir", key=f"conc_{coleta['Número Coleta']}"):
                                         # Atualizar status para "Concluída"
-                                        df_coletas.loc[idx, "Status"] = "Concluída"
-                                        df_coletas.to_csv("coletas.csv", sep=";", index=False)
+                                        atualizar_status_coleta(coleta["Número Coleta"], "Concluída")
                                         st.success("Coleta concluída!")
                                         st.rerun()
                                 
                                 with col_act3:
                                     if st.button(f"❌ Cancelar", key=f"canc_{coleta['Número Coleta']}"):
                                         # Atualizar status para "Cancelada"
-                                        df_coletas.loc[idx, "Status"] = "Cancelada"
-                                        df_coletas.to_csv("coletas.csv", sep=";", index=False)
+                                        atualizar_status_coleta(coleta["Número Coleta"], "Cancelada")
                                         st.warning("Coleta cancelada!")
                                         st.rerun()
                     else:
@@ -241,8 +244,8 @@ def mostrar_coleta():
         st.subheader("📊 Histórico de Coletas")
         
         try:
-            if os.path.exists("coletas.csv"):
-                df_coletas = pd.read_csv("coletas.csv", sep=";")
+            if REGISTRO_COLETAS.existe():
+                df_coletas = carregar_coletas()
                 
                 if not df_coletas.empty:
                     # Filtros
@@ -273,7 +276,7 @@ def mostrar_coleta():
                         df_filtered = df_filtered.drop("Data_filtro", axis=1)
                     
                     # Exibir dados
-                    st.dataframe(df_filtered, use_container_width=True)
+                    tabela_paginada(df_filtered, "tabela_coletas")
                     
                     # Estatísticas
                     if not df_filtered.empty:
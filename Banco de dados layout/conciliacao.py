@@ -1,57 +1,101 @@
+import os
 import streamlit as st
 import pandas as pd
-import fitz  # PyMuPDF
-import re
+import numpy as np
+from parser_fatura import extrair_lotes
+from livro_conciliacao import LivroConciliacao
 
-@st.cache_data
+ARQ_FATURA_PADRAO = "AVILA TRANSPORTES.pdf"  # Usado quando nenhum PDF é enviado
+LIVRO_FRETES = LivroConciliacao("fretes_pdf")  # Status por Número de CT-e
 
-def extrair_dados_fatura_mello():
+def extrair_dados_fatura_mello(arquivos, aviso=None):
+    """
+    Registros (Número, Data, Valor) das faturas em PDF enviadas. Cada PDF é
+    lido página a página e o resultado fica em cache pelo hash do conteúdo.
+    """
+    lotes = []
     try:
-        with fitz.open("AVILA TRANSPORTES.pdf") as doc:
-            texto = "\n".join([page.get_text() for page in doc])
-
-        # Expressão para capturar: nota, valor e data
-        padrao = re.compile(r"(\d{5,})\s+.*?\s+(\d{2}/\d{2}/\d{4}).*?([\d\.]+,[\d]{2})")
-        linhas = padrao.findall(texto)
-
-        dados = []
-        for nota, data, valor in linhas:
-            valor_float = float(valor.replace(".", "").replace(",", "."))
-            dados.append({"Número": nota, "Data": data, "Valor do frete (PDF)": valor_float})
-
-        df_pdf = pd.DataFrame(dados)
-        df_pdf["Data"] = pd.to_datetime(df_pdf["Data"], dayfirst=True, errors="coerce")
-        return df_pdf
-
+        for nome, conteudo in arquivos:
+            lidos = 0
+            for lote in extrair_lotes(conteudo):
+                lotes.append(lote.assign(Arquivo=nome))
+                lidos += len(lote)
+                if aviso is not None:
+                    aviso.info(f"⏳ {nome}: {lidos} registros lidos...")
     except Exception as e:
         st.error(f"Erro ao extrair dados do PDF: {e}")
         return pd.DataFrame()
+    if aviso is not None:
+        aviso.empty()
+    return pd.concat(lotes, ignore_index=True) if lotes else pd.DataFrame()
+
+def atualizar_livro_fretes(df_fatura, base):
+    """
+    Avalia no livro só os CT-e da fatura novos ou alterados (no PDF ou na
+    base) desde a última execução e devolve os lançamentos da fatura
+    """
+    # Chave textual nos dois lados, sem alterar a base compartilhada
+    fatura = df_fatura.assign(Número=df_fatura["Número"].astype(str)).drop_duplicates("Número", keep="last")
+    numeros = base["Número"].astype(str)
+    fretes = pd.DataFrame({"Número": numeros, "Valor do frete": base["Valor do frete"]})
+    fretes = fretes[numeros.isin(fatura["Número"])].drop_duplicates("Número")
+
+    lado_fatura = LIVRO_FRETES.alteracoes("fatura", fatura, "Número", ["Data", "Valor do frete (PDF)"])
+    lado_base = LIVRO_FRETES.alteracoes("base", fretes, "Número", ["Valor do frete"])
+    chaves = set(lado_fatura.chaves) | (
+        (set(lado_base.chaves) | set(lado_base.removidas)) & set(fatura["Número"])
+    )
+    if chaves or lado_fatura.removidas or lado_base.removidas:
+        avaliados = fatura[fatura["Número"].isin(chaves)].merge(fretes, on="Número", how="left")
+        diferenca = (avaliados["Valor do frete (PDF)"] - avaliados["Valor do frete"]).round(2)
+        LIVRO_FRETES.gravar(pd.DataFrame({
+            "chave": avaliados["Número"],
+            "documento": avaliados["Número"],
+            "origem": avaliados["Arquivo"].astype(str) + " p." + avaliados["Página"].astype(str),
+            "status": np.select(
+                [avaliados["Valor do frete"].isna(), diferenca.abs() < 1],
+                ["Não encontrado", "Conciliado"],
+                "Divergente",
+            ),
+            "valor": avaliados["Valor do frete (PDF)"],
+            "valor_documento": avaliados["Valor do frete"],
+            "diferenca": diferenca,
+        }), lado_fatura, lado_base)
+    return LIVRO_FRETES.lancamentos(fatura["Número"])
 
 def mostrar_conciliacao(base):
     st.header("🔁 Conciliação de Fretes - Mello")
 
-    df_fatura = extrair_dados_fatura_mello()
+    enviados = st.file_uploader(
+        "📁 Faturas da transportadora (PDF)", type=["pdf"], accept_multiple_files=True
+    )
+    if enviados:
+        arquivos = [(f.name, f.getvalue()) for f in enviados]
+    elif os.path.exists(ARQ_FATURA_PADRAO):
+        with open(ARQ_FATURA_PADRAO, "rb") as f:
+            arquivos = [(ARQ_FATURA_PADRAO, f.read())]
+    else:
+        st.info("Envie o PDF da fatura para conciliar.")
+        return
+
+    df_fatura = extrair_dados_fatura_mello(arquivos, st.empty())
     if df_fatura.empty:
         st.warning("Nenhum dado extraído do PDF.")
         return
 
-    base["Número"] = base["Número"].astype(str)
-    df_fatura["Número"] = df_fatura["Número"].astype(str)
-
-    conciliado = df_fatura.merge(base, on="Número", how="left", suffixes=("_fatura", "_base"))
-    conciliado["Diferença"] = (conciliado["Valor do frete (PDF)"] - conciliado["Valor do frete"]).round(2)
-
-    conciliado["Status"] = conciliado["Valor do frete"].apply(
-        lambda x: "Não encontrado" if pd.isna(x) else "OK"
-    )
-    conciliado.loc[conciliado["Status"] == "OK", "Status"] = conciliado["Diferença"].apply(
-        lambda x: "Conciliado" if abs(x) < 1 else "Divergente"
-    )
+    conciliado = atualizar_livro_fretes(df_fatura, base).rename(columns={
+        "chave": "Número", "origem": "Origem", "status": "Status", "valor": "Valor do frete (PDF)",
+        "valor_documento": "Valor do frete", "diferenca": "Diferença", "em": "Avaliado em",
+    }).drop(columns="documento")
+    conciliado = df_fatura[["Número", "Data"]].drop_duplicates("Número").merge(conciliado, on="Número", how="left")
 
     st.dataframe(conciliado, use_container_width=True)
     st.write("\nResumo:")
     st.dataframe(conciliado["Status"].value_counts().rename("Qtd"))
 
+    csv = conciliado.to_csv(index=False, sep=";").encode("utf-8")
+    st.download_button("📥 Baixar Conciliação (CSV)", csv, "conciliacao_mello.csv", mime="text/csv")
+
 def exibir_conciliacao(base, salvar_func):
     trans = base[base["Conciliado com"].isna() | (base["Conciliado com"] == "")]
     if trans.empty: 
@@ -67,6 +111,3 @@ def exibir_conciliacao(base, salvar_func):
         base.loc[idx, "Conciliado com"] = doc
         salvar_func(base)
         st.success("Conciliação salva com sucesso!")
-
-    csv = conciliado.to_csv(index=False, sep=";").encode("utf-8")
-    st.download_button("📥 Baixar Conciliação (CSV)", csv, "conciliacao_mello.csv", mime="text/csv")
@@ -0,0 +1,324 @@
+import os
+import re
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from esquemas import centavos
+from indice_texto import normalizar_texto
+from registro_append import trava_arquivo, anexar_linhas, ler_linhas
+
+ARQ_REJEITADAS = "data/conciliacao_rejeitadas.jsonl"  # Pares recusados pelo usuário
+
+TOLERANCIA_DIAS = 10
+TOLERANCIA_CENTAVOS = 100  # R$ 1,00, a mesma folga da conciliação de fretes
+RODADAS = 3
+
+# Pesos da confiança (somam 1): valor, data e nome do pagador no texto.
+# Sem o pagador a confiança não passa de 0.6.
+PESO_VALOR, PESO_DATA, PESO_NOME = 0.4, 0.2, 0.4
+DIAS_PRESELECAO = 3  # data "confere" até aqui (ver preselecionadas)
+
+# Palavras de razão social que aparecem em quase todo pagador (já
+# normalizadas): não servem para reconhecer o pagador no texto
+PALAVRAS_GENERICAS = {
+    "ltda", "eireli", "comercio", "comercial", "industria", "industrial", "servicos", "servico",
+    "service", "pecas", "transportes", "transporte", "transportadora", "distribuidora",
+    "distribuicao", "logistica", "brasil", "produtos", "empresa", "importacao", "exportacao",
+    "representacoes", "solucoes", "grupo", "holding", "participacoes", "atacado", "varejo",
+    "materiais", "equipamentos", "filial", "matriz",
+}
+
+COLUNAS_PROPOSTA = [
+    "ID Transação", "Data", "Valor", "Descrição", "Documento", "Origem", "Pagador",
+    "Data Documento", "Valor Documento", "Diferença", "Dias", "Pagador no Texto", "Confiança",
+]
+
+def _vazio(texto):
+    return texto.isna() | (texto.astype(str).str.strip() == "")
+
+def recebimentos_abertos(financeiro):
+    """
+    Receitas da base financeira ainda sem documento conciliado
+    """
+    if financeiro.empty:
+        return pd.DataFrame(columns=["ID Transação", "Data", "Valor", "Descrição", "centavos", "texto"])
+    conciliado = financeiro["Conciliado com"] if "Conciliado com" in financeiro.columns else pd.Series(None, index=financeiro.index)
+    valores = pd.to_numeric(financeiro["Valor"], errors="coerce")
+    abertos = financeiro[(valores > 0) & _vazio(conciliado)]
+    vazio = pd.Series("", index=abertos.index)
+    texto = abertos.get("Descrição", vazio).fillna("").astype(str) + " " + abertos.get("Memo", vazio).fillna("").astype(str)
+    return pd.DataFrame({
+        "ID Transação": abertos["ID Transação"].astype(str),
+        "Data": pd.to_datetime(abertos["Data"], errors="coerce"),
+        "Valor": valores[abertos.index],
+        "Descrição": texto.str.strip(),
+        "centavos": centavos(valores[abertos.index]),
+        "texto": texto.map(normalizar_texto),
+    }).dropna(subset=["Data", "centavos"])
+
+def documentos_abertos(base=None, extrato=None, conciliados=()):
+    """
+    Faturas da base de CT-e (total por Nº Fatura, no vencimento) e
+    lançamentos do extrato ainda não conciliados, num formato comum
+    """
+    # Um recebimento pode quitar várias faturas ("123, 456")
+    conciliados = {d.strip() for c in conciliados for d in str(c).split(",")}
+    partes = []
+    if extrato is not None and "Conciliação" in extrato.columns and "Nº Fatura" in extrato.columns:
+        # Fatura já baixada no extrato não está mais em aberto
+        pagas = extrato.loc[extrato["Conciliação"].astype(str) == "Conciliado", "Nº Fatura"]
+        conciliados |= set(pagas.dropna().astype(str).str.strip())
+    if base is not None and not base.empty and "Nº Fatura" in base.columns:
+        data = "Data de Vencimento" if "Data de Vencimento" in base.columns else "Data de Emissão"
+        agregados = {"valor": ("Valor do frete", "sum"), "data": (data, "max")}
+        if "Pagador do Frete - Nome" in base.columns:
+            agregados["pagador"] = ("Pagador do Frete - Nome", "first")
+        if "Pagador do Frete - CNPJ" in base.columns:
+            agregados["cnpj"] = ("Pagador do Frete - CNPJ", "first")
+        faturas = base.dropna(subset=["Nº Fatura"]).groupby("Nº Fatura", observed=True).agg(**agregados).reset_index()
+        partes.append(pd.DataFrame({
+            "Documento": faturas["Nº Fatura"].astype(str),
+            "Origem": "Fatura",
+            "Pagador": faturas["pagador"].astype(object) if "pagador" in faturas.columns else None,
+            "CNPJ": faturas["cnpj"].astype(object) if "cnpj" in faturas.columns else None,
+            "Data Documento": pd.to_datetime(faturas["data"], errors="coerce"),
+            "Valor Documento": faturas["valor"].astype(float),
+        }))
+    if extrato is not None and not extrato.empty and "Valor Fatura Sistema" in extrato.columns:
+        pendentes = extrato
+        if "Conciliação" in extrato.columns:
+            pendentes = extrato[extrato["Conciliação"].astype(str) != "Conciliado"]
+        partes.append(pd.DataFrame({
+            "Documento": pendentes["Nº Fatura"].astype(str) if "Nº Fatura" in pendentes.columns else pendentes.index.astype(str),
+            "Origem": "Extrato",
+            "Pagador": pendentes["Cliente"].astype(object) if "Cliente" in pendentes.columns else None,
+            "CNPJ": pendentes["CNPJ"].astype(object) if "CNPJ" in pendentes.columns else None,
+            "Data Documento": pd.to_datetime(pendentes["Data Lançamento"], errors="coerce"),
+            "Valor Documento": pd.to_numeric(pendentes["Valor Fatura Sistema"], errors="coerce"),
+        }))
+    if not partes:
+        return pd.DataFrame(columns=["Documento", "Origem", "Pagador", "CNPJ", "Data Documento", "Valor Documento", "centavos", "nome"])
+    documentos = pd.concat(partes, ignore_index=True)
+    documentos = documentos[~documentos["Documento"].isin(conciliados)]
+    documentos = documentos.drop_duplicates("Documento").dropna(subset=["Data Documento", "Valor Documento"])
+    documentos["centavos"] = centavos(documentos["Valor Documento"])
+    documentos["nome"] = documentos["Pagador"].fillna("").astype(str).map(normalizar_texto)
+    # CNPJ só com dígitos, para comparar formatos diferentes
+    documentos["CNPJ"] = documentos["CNPJ"].astype("string").str.replace(r"\D", "", regex=True).replace("", pd.NA)
+    return documentos[documentos["centavos"] > 0].reset_index(drop=True)
+
+def totais_documentos(base=None, extrato=None):
+    """
+    Valor total de cada documento conhecido (fatura da base de CT-e ou
+    Nº Fatura do extrato), conciliado ou não
+    """
+    partes = []
+    if base is not None and not base.empty and "Nº Fatura" in base.columns:
+        faturas = base.dropna(subset=["Nº Fatura"]).groupby("Nº Fatura", observed=True)["Valor do frete"].sum()
+        partes.append(pd.Series(faturas.to_numpy(dtype=float), index=faturas.index.astype(str)))
+    if extrato is not None and not extrato.empty and {"Nº Fatura", "Valor Fatura Sistema"} <= set(extrato.columns):
+        valores = pd.to_numeric(extrato["Valor Fatura Sistema"], errors="coerce")
+        lancados = valores.groupby(extrato["Nº Fatura"].astype(str).str.strip()).sum()
+        partes.append(lancados)
+    if not partes:
+        return pd.DataFrame(columns=["Documento", "Valor Documento"])
+    totais = pd.concat(partes)
+    totais = totais[~totais.index.duplicated(keep="first")]
+    return pd.DataFrame({"Documento": totais.index, "Valor Documento": totais.to_numpy()})
+
+def avaliar_transacoes(transacoes, totais):
+    """
+    Status de conciliação de cada transação: Pendente (sem documento),
+    Documento não encontrado, Conciliado (diferença abaixo de R$ 1) ou
+    Divergente. Retorna as linhas no formato do livro de conciliação.
+    """
+    documentos = transacoes["Conciliado com"].fillna("").astype(str).str.strip()
+    valor = pd.to_numeric(transacoes["Valor"], errors="coerce")
+    partes = documentos.str.split(",").explode().str.strip()
+    partes = partes[partes != ""]
+    mapa = totais.set_index("Documento")["Valor Documento"]
+    valores_docs = partes.map(mapa)
+    total = valores_docs.groupby(level=0).sum(min_count=1).reindex(transacoes.index)
+    faltando = valores_docs.isna().groupby(level=0).any().reindex(transacoes.index, fill_value=False)
+    diferenca = (valor.abs() - total).round(2)
+    status = np.select(
+        [documentos == "", faltando.to_numpy(dtype=bool), (diferenca.abs() < 1).to_numpy(dtype=bool)],
+        ["Pendente", "Documento não encontrado", "Conciliado"],
+        "Divergente",
+    )
+    datas = pd.to_datetime(transacoes["Data"], errors="coerce").dt.strftime("%d/%m/%Y").fillna("")
+    descricao = transacoes["Descrição"].fillna("").astype(str) if "Descrição" in transacoes.columns else ""
+    return pd.DataFrame({
+        "chave": transacoes["ID Transação"].astype(str),
+        "documento": documentos.where(documentos != "", None),
+        "origem": (datas + " " + descricao).str.strip(),
+        "status": status,
+        "valor": valor,
+        "valor_documento": total,
+        "diferenca": diferenca,
+    })
+
+def _palavras(texto):
+    return set(re.findall(r"[a-z0-9]+", texto))
+
+def _nome_no_texto(nomes, cnpjs, textos):
+    """
+    True quando o texto da transação (descrição + memo) traz uma palavra
+    distintiva do pagador (mais de 3 letras, fora de PALAVRAS_GENERICAS)
+    ou o CNPJ dele (completo ou a raiz de 8 dígitos)
+    """
+    resultado = []
+    for nome, cnpj, texto in zip(nomes, cnpjs, textos):
+        palavras = _palavras(texto)
+        distintivas = {p for p in _palavras(nome) if len(p) > 3 and p not in PALAVRAS_GENERICAS}
+        achou = bool(distintivas & palavras)
+        if not achou and isinstance(cnpj, str) and len(cnpj) >= 8:
+            numeros = re.findall(r"\d+", texto)
+            achou = cnpj[:8] in numeros or cnpj in "".join(numeros)
+        resultado.append(achou)
+    return np.array(resultado, dtype=bool)
+
+def _pontuar(pares, tolerancia_centavos, tolerancia_dias):
+    diferenca = (pares["centavos"] - pares["centavos_doc"]).abs().astype(float)
+    dias = (pares["Data"] - pares["Data Documento"]).dt.days.abs().astype(float)
+    nome = pares["Pagador no Texto"] if "Pagador no Texto" in pares.columns else _nome_no_texto(
+        pares["nome"], pares["CNPJ"], pares["texto"]
+    )
+    confianca = (
+        PESO_VALOR * (1 - diferenca / (tolerancia_centavos + 1))
+        + PESO_DATA * (1 - dias / (tolerancia_dias + 1))
+        + PESO_NOME * np.asarray(nome, dtype=float)
+    )
+    return pares.assign(
+        Diferença=(pares["centavos"] - pares["centavos_doc"]).astype(float) / 100,
+        Dias=dias.astype(int),
+        **{"Pagador no Texto": np.asarray(nome, dtype=bool)},
+        Confiança=confianca.round(2),
+    )
+
+def preselecionadas(propostas):
+    """
+    Propostas que já vêm marcadas: valor exato, data a até
+    DIAS_PRESELECAO dias e pagador reconhecido no texto
+    """
+    return (
+        (propostas["Diferença"].abs() < 0.005)
+        & (propostas["Dias"] <= DIAS_PRESELECAO)
+        & propostas["Pagador no Texto"].astype(bool)
+    )
+
+def _pares_na_faixa(recebimentos, documentos, tolerancia_centavos):
+    """
+    Todos os pares (recebimento, documento) com valores a até
+    `tolerancia_centavos` um do outro, por busca binária nos documentos
+    ordenados por valor
+    """
+    documentos = documentos.sort_values("centavos_doc", kind="stable")
+    valores = documentos["centavos_doc"].to_numpy()
+    alvos = recebimentos["centavos"].to_numpy()
+    inicio = np.searchsorted(valores, alvos - tolerancia_centavos, side="left")
+    quantos = np.searchsorted(valores, alvos + tolerancia_centavos, side="right") - inicio
+    esquerda = np.repeat(np.arange(len(recebimentos)), quantos)
+    # Posições inicio, inicio + 1, ..., fim - 1 de cada recebimento
+    passo = np.arange(quantos.sum()) - np.repeat(np.cumsum(quantos) - quantos, quantos)
+    direita = np.repeat(inicio, quantos) + passo
+    return pd.concat([
+        recebimentos.iloc[esquerda].reset_index(drop=True),
+        documentos.iloc[direita].reset_index(drop=True),
+    ], axis=1)
+
+def _juntar(recebimentos, documentos, por_valor, tolerancia_centavos, tolerancia_dias):
+    """
+    Com valor exato: todos os documentos do mesmo valor dentro da janela,
+    ficando para cada recebimento o de pagador reconhecido no texto e,
+    entre esses, o de data mais próxima. Sem valor exato: os documentos
+    dentro da folga de valor e da janela de datas, ficando para cada
+    recebimento o de valor mais próximo e, no empate, o de data mais próxima.
+    """
+    docs = documentos.rename(columns={"centavos": "centavos_doc"})
+    if por_valor:
+        pares = recebimentos.merge(docs, left_on="centavos", right_on="centavos_doc")
+        dias = (pares["Data"] - pares["Data Documento"]).dt.days.abs()
+        pares = pares[dias <= tolerancia_dias]
+        if pares.empty:
+            return pares
+        pares = pares.assign(**{
+            "Pagador no Texto": _nome_no_texto(pares["nome"], pares["CNPJ"], pares["texto"]),
+            "dias": dias[pares.index],
+        })
+        pares = (
+            pares.sort_values(["Pagador no Texto", "dias"], ascending=[False, True], kind="stable")
+            .drop_duplicates("ID Transação")
+            .drop(columns="dias")
+        )
+    else:
+        pares = _pares_na_faixa(recebimentos, docs, tolerancia_centavos)
+        dias = (pares["Data"] - pares["Data Documento"]).dt.days.abs()
+        # A janela de datas vale antes de escolher o valor mais próximo
+        pares = pares.assign(
+            distancia=(pares["centavos"] - pares["centavos_doc"]).abs(), dias=dias,
+        )[dias <= tolerancia_dias]
+        pares = (
+            pares.sort_values(["distancia", "dias"], kind="stable")
+            .drop_duplicates("ID Transação")
+            .drop(columns=["distancia", "dias"])
+        )
+    return pares.dropna(subset=["Documento"])
+
+def propor_conciliacoes(recebimentos, documentos, rejeitadas=(), tolerancia_centavos=TOLERANCIA_CENTAVOS,
+                        tolerancia_dias=TOLERANCIA_DIAS):
+    """
+    Propõe um documento para cada recebimento, com confiança entre 0 e 1.
+    Cada documento é proposto uma vez só: nas disputas fica o par de maior
+    confiança e os perdedores tentam de novo na rodada seguinte.
+    """
+    rejeitadas = set(rejeitadas)
+    propostas = []
+    recebimentos = recebimentos.dropna(subset=["centavos"]).copy()
+    recebimentos["centavos"] = recebimentos["centavos"].astype("int64")
+    documentos = documentos.copy()
+    documentos["centavos"] = documentos["centavos"].astype("int64")
+    for _ in range(RODADAS):
+        novas = []
+        for por_valor in (True, False):
+            if recebimentos.empty or documentos.empty:
+                break
+            pares = _juntar(recebimentos, documentos, por_valor, tolerancia_centavos, tolerancia_dias)
+            if rejeitadas and not pares.empty:
+                recusado = [(i, d) in rejeitadas for i, d in zip(pares["ID Transação"], pares["Documento"])]
+                pares = pares[~np.array(recusado, dtype=bool)]
+            if pares.empty:
+                continue
+            pares = _pontuar(pares, tolerancia_centavos, tolerancia_dias)
+            pares = pares.sort_values("Confiança", ascending=False, kind="stable").drop_duplicates("Documento")
+            novas.append(pares)
+            recebimentos = recebimentos[~recebimentos["ID Transação"].isin(pares["ID Transação"])]
+            documentos = documentos[~documentos["Documento"].isin(pares["Documento"])]
+        if not novas:
+            break
+        propostas.extend(novas)
+    if not propostas:
+        return pd.DataFrame(columns=COLUNAS_PROPOSTA)
+    resultado = pd.concat(propostas, ignore_index=True)
+    return resultado.sort_values(["Confiança", "Data"], ascending=[False, True])[COLUNAS_PROPOSTA].reset_index(drop=True)
+
+def carregar_rejeitadas():
+    """
+    Pares (ID Transação, Documento) já recusados
+    """
+    return {(r["id"], r["documento"]) for r in ler_linhas(ARQ_REJEITADAS)}
+
+def rejeitar(propostas, usuario=None):
+    """
+    Registra as propostas recusadas para não sugeri-las de novo
+    """
+    if propostas.empty:
+        return 0
+    em = datetime.now().isoformat(timespec="seconds")
+    os.makedirs(os.path.dirname(ARQ_REJEITADAS), exist_ok=True)
+    with trava_arquivo(f"{ARQ_REJEITADAS}.lock"):
+        anexar_linhas(ARQ_REJEITADAS, [
+            {"id": str(i), "documento": str(d), "usuario": usuario, "em": em}
+            for i, d in zip(propostas["ID Transação"], propostas["Documento"])
+        ])
+    return len(propostas)
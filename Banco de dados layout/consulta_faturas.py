@@ -1,5 +1,20 @@
 import streamlit as st
 import pandas as pd
+from data_loader import versao_base
+from indice_faturas import IndiceFaturas
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _indice_faturas(versao, _base):
+    """
+    Resumo e índices das faturas, montados uma vez por versão do dataset
+    """
+    return IndiceFaturas(_base)
+
+def _obter_indice(base):
+    versao = versao_base(base)
+    if versao is None:
+        return IndiceFaturas(base)
+    return _indice_faturas((versao, len(base)), base)
 
 def exibir_consulta(base, tipo):
     st.markdown(f"### 🔍 Consulta de {tipo.title()}")
@@ -10,32 +25,23 @@ def exibir_consulta(base, tipo):
         
 def mostrar_faturas(base):
     st.header("📄 Consulta de Faturas")
+    _consulta_faturas(base)
+
+@st.fragment
+def _consulta_faturas(base):
+    """
+    Filtros e tabelas da consulta; mudar uma data reexecuta só este trecho
+    """
     data_ini = st.date_input("Data de Vencimento Início")
     data_fim = st.date_input("Data de Vencimento Fim")
-    base["Data de Vencimento"] = pd.to_datetime(base.get("Data de Vencimento", pd.NaT), dayfirst=True, errors="coerce")
-    base_filtrado = base[
-        (base["Data de Vencimento"] >= pd.to_datetime(data_ini)) &
-        (base["Data de Vencimento"] <= pd.to_datetime(data_fim))
-    ]
-
-    faturas = base_filtrado.groupby("Nº Fatura", as_index=False).agg({
-        "Pagador do Frete - Nome": "first",
-        "Valor do frete": "sum",
-        "Número": "max",
-        "Quinzena": "first"
-    }).rename(columns={
-        "Pagador do Frete - Nome": "Empresa Pagadora",
-        "Valor do frete": "Total do Frete",
-        "Número": "Número Fatura"
-    })
+    indice = _obter_indice(base)
+    faturas = indice.resumo(data_ini, data_fim)
 
     st.dataframe(faturas, use_container_width=True)
 
     fat_selecionada = st.selectbox("Selecione uma fatura:", faturas["Nº Fatura"])
     if fat_selecionada:
-        detalhes = base_filtrado[base_filtrado["Nº Fatura"] == fat_selecionada][
+        detalhes = indice.detalhe(fat_selecionada, data_ini, data_fim)[
             ["Número", "Remetente - Nome", "Destinatário - Nome", "Soma dos Volumes", "Notas Fiscais", "Valor do frete", "Data de Vencimento"]
         ]
         st.dataframe(detalhes, use_container_width=True)
-
-
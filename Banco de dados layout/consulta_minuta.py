@@ -1,4 +1,30 @@
 import streamlit as st
+from data_loader import versao_base
+from indice_texto import IndiceTexto
+
+COLUNAS_BUSCA = [
+    "Número",
+    "Remetente - Nome",
+    "Destinatário - Nome",
+    "Pagador do Frete - Nome",
+    "Destinatário - Cidade",
+]
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _indice_minutas(versao, _base):
+    """
+    Índice de busca montado uma vez por versão do dataset
+    """
+    return IndiceTexto(_base, COLUNAS_BUSCA)
+
+def _buscar_minutas(base, filtro):
+    versao = versao_base(base)
+    if versao is None:
+        indice = IndiceTexto(base, COLUNAS_BUSCA)
+    else:
+        indice = _indice_minutas((versao, len(base)), base)
+    return base.iloc[indice.buscar(filtro)]
+
 def exibir_consulta(base, tipo):
     st.markdown(f"### 🔍 Consulta de {tipo.title()}")
     termo = st.text_input(f"Buscar {tipo}", "")
@@ -8,13 +34,14 @@ def exibir_consulta(base, tipo):
 
 def mostrar_minutas(base):
     st.header("🔍 Consulta de Minuta")
+    _consulta_minutas(base)
+
+@st.fragment
+def _consulta_minutas(base):
+    """
+    Busca e resultado; digitar um filtro reexecuta só este trecho
+    """
     filtro = st.text_input("Digite número, nome, cidade ou pagador:")
     if filtro:
-        resultado = base[
-            base["Número"].astype(str).str.contains(filtro) |
-            base["Remetente - Nome"].astype(str).str.contains(filtro, case=False, na=False) |
-            base["Destinatário - Nome"].astype(str).str.contains(filtro, case=False, na=False) |
-            base["Pagador do Frete - Nome"].astype(str).str.contains(filtro, case=False, na=False) |
-            base["Destinatário - Cidade"].astype(str).str.contains(filtro, case=False, na=False)
-        ]
+        resultado = _buscar_minutas(base, filtro)
         st.dataframe(resultado, use_container_width=True)
@@ -1,35 +1,79 @@
 import streamlit as st
 import pandas as pd
 import os
+import uuid
+from esquemas import tabela_vazia
+from registro_append import RegistroAppend
+from alteracoes_editor import ler_alteracoes
+from tabela_paginada import paginar
 
 ARQ_CONTATOS = "contatos.csv"
+# Snapshot CSV + log: edições gravam só as linhas alteradas, pelo ID
+REGISTRO_CONTATOS = RegistroAppend("contatos", chave="ID")
+
+def _novo_id():
+    return uuid.uuid4().hex[:12]
+
+def _com_ids(df):
+    """
+    Garante um ID em cada contato (arquivos antigos e importados não têm)
+    """
+    df = df.copy()
+    if "ID" not in df.columns:
+        df.insert(0, "ID", None)
+    sem_id = df["ID"].isna() | (df["ID"].astype(str).str.strip() == "")
+    if sem_id.any():
+        df.loc[sem_id, "ID"] = [_novo_id() for _ in range(int(sem_id.sum()))]
+    return df
 
 def carregar_contatos():
     """
     Carrega a lista de contatos do CSV
     """
     try:
-        if os.path.exists(ARQ_CONTATOS):
-            df = pd.read_csv(ARQ_CONTATOS, encoding="utf-8")
-            df.columns = [c.strip() for c in df.columns]
-            return df
+        if os.path.exists(ARQ_CONTATOS) or os.path.exists(REGISTRO_CONTATOS.log):
+            contatos = REGISTRO_CONTATOS.carregar()
+            if "ID" not in contatos.columns or contatos["ID"].isna().any():
+                # Migração única: atribui IDs e regrava o arquivo
+                contatos = _com_ids(contatos)
+                REGISTRO_CONTATOS.substituir(contatos)
+            return contatos
         else:
-            return pd.DataFrame(columns=["Nome", "Número", "Email", "Cidade", "Observação"])
+            return tabela_vazia("contatos")
     except Exception as e:
         st.error(f"Erro ao carregar contatos: {e}")
-        return pd.DataFrame(columns=["Nome", "Número", "Email", "Cidade", "Observação"])
+        return tabela_vazia("contatos")
 
 def salvar_contatos(df):
     """
     Salva a lista de contatos no CSV
     """
     try:
-        df.to_csv(ARQ_CONTATOS, index=False, encoding="utf-8")
+        REGISTRO_CONTATOS.substituir(_com_ids(df))
         return True
     except Exception as e:
         st.error(f"Erro ao salvar contatos: {e}")
         return False
 
+def salvar_alteracoes_contatos(exibidos, chave_editor="editor_contatos"):
+    """
+    Grava só o que mudou no editor de contatos: células editadas,
+    contatos adicionados e removidos
+    """
+    try:
+        conjunto = ler_alteracoes(chave_editor, exibidos, "ID")
+        atualizados = {}
+        for coluna, novos in conjunto.editadas.items():
+            for valor_chave, valor in novos.items():
+                atualizados.setdefault(valor_chave, {})[coluna] = valor
+        inseridos = []
+        if not conjunto.adicionadas.empty:
+            inseridos = _com_ids(conjunto.adicionadas.drop(columns="ID", errors="ignore")).to_dict("records")
+        return REGISTRO_CONTATOS.aplicar_lote(inseridos, atualizados, conjunto.removidas)
+    except Exception as e:
+        st.error(f"Erro ao salvar contatos: {e}")
+        return None
+
 def mostrar_contatos():
     """
     Interface principal do módulo de contatos
@@ -81,10 +125,14 @@ def mostrar_contatos():
             st.metric("Total de Contatos", len(contatos_filtrados))
             
             if not contatos_filtrados.empty:
-                # Editor de dados para permitir edições
-                contatos_editados = st.data_editor(
-                    contatos_filtrados,
+                # Editor só com a página visível; a chave muda com a página
+                # para as edições de uma página não caírem nas linhas de outra
+                pagina = paginar(contatos_filtrados, "tabela_contatos", fixas=["ID"])
+                chave_editor = f"editor_contatos_{pagina.numero}"
+                st.data_editor(
+                    pagina.dados,
                     column_config={
+                        "ID": None,
                         "Nome": st.column_config.TextColumn("Nome", width="medium", required=True),
                         "Número": st.column_config.TextColumn("Telefone", width="medium"),
                         "Email": st.column_config.TextColumn("E-mail", width="medium"),
@@ -93,14 +141,14 @@ def mostrar_contatos():
                     },
                     use_container_width=True,
                     num_rows="dynamic",
-                    key="editor_contatos"
+                    key=chave_editor
                 )
                 
                 # Botão para salvar alterações
                 col1, col2 = st.columns(2)
                 with col1:
                     if st.button("💾 Salvar Alterações", type="primary"):
-                        if salvar_contatos(contatos_editados):
+                        if salvar_alteracoes_contatos(pagina.dados, chave_editor) is not None:
                             st.success("✅ Contatos salvos com sucesso!")
                             st.rerun()
                         else:
@@ -108,7 +156,7 @@ def mostrar_contatos():
                 
                 with col2:
                     # Download dos contatos filtrados
-                    csv = contatos_editados.to_csv(index=False).encode("utf-8")
+                    csv = contatos_filtrados.drop(columns="ID", errors="ignore").to_csv(index=False).encode("utf-8")
                     st.download_button(
                         "📥 Baixar Lista (CSV)",
                         csv,
@@ -164,11 +212,9 @@ def mostrar_contatos():
             
             if submitted:
                 if nome and numero:
-                    # Carregar contatos existentes
-                    contatos = carregar_contatos()
-                    
                     # Criar novo contato
                     novo_contato = {
+                        "ID": _novo_id(),
                         "Nome": nome,
                         "Número": numero,
                         "Email": email,
@@ -176,16 +222,13 @@ def mostrar_contatos():
                         "Observação": observacao
                     }
                     
-                    # Adicionar à lista
-                    novo_df = pd.DataFrame([novo_contato])
-                    contatos_atualizados = pd.concat([contatos, novo_df], ignore_index=True)
-                    
-                    # Salvar
-                    if salvar_contatos(contatos_atualizados):
+                    # Acrescentar ao registro (sem regravar a lista)
+                    try:
+                        REGISTRO_CONTATOS.inserir(novo_contato)
                         st.success(f"✅ Contato '{nome}' adicionado com sucesso!")
                         st.balloons()
-                    else:
-                        st.error("❌ Erro ao adicionar contato")
+                    except Exception as e:
+                        st.error(f"❌ Erro ao adicionar contato: {e}")
                 else:
                     st.error("❌ Nome e telefone são obrigatórios")
     
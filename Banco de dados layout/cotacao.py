@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import os
+from registro_append import RegistroAppend
+from tabela_paginada import tabela_paginada
 
 def calcular_frete(peso, distancia, tipo_carga="Normal"):
     """
@@ -27,20 +28,20 @@ def calcular_frete(peso, distancia, tipo_carga="Normal"):
     
     return max(valor_minimo, valor_distancia + valor_peso)
 
+REGISTRO_COTACOES = RegistroAppend("cotacoes")
+
+def carregar_cotacoes():
+    """
+    Carrega as cotações salvas (snapshot CSV + log de operações)
+    """
+    return REGISTRO_COTACOES.carregar()
+
 def salvar_cotacao(dados_cotacao):
     """
-    Salva a cotação em arquivo CSV
+    Acrescenta a cotação ao log, sem regravar o arquivo inteiro
     """
     try:
-        # Verifica se arquivo existe
-        if os.path.exists("cotacoes.csv"):
-            df_existing = pd.read_csv("cotacoes.csv", sep=";")
-            df_new = pd.DataFrame([dados_cotacao])
-            df_final = pd.concat([df_existing, df_new], ignore_index=True)
-        else:
-            df_final = pd.DataFrame([dados_cotacao])
-        
-        df_final.to_csv("cotacoes.csv", sep=";", index=False, encoding="utf-8")
+        REGISTRO_COTACOES.inserir(dados_cotacao)
         return True
     except Exception as e:
         st.error(f"Erro ao salvar cotação: {e}")
@@ -120,8 +121,8 @@ def mostrar_cotacao():
         st.subheader("📊 Histórico de Cotações")
         
         try:
-            if os.path.exists("cotacoes.csv"):
-                df_cotacoes = pd.read_csv("cotacoes.csv", sep=";")
+            if REGISTRO_COTACOES.existe():
+                df_cotacoes = carregar_cotacoes()
                 
                 if not df_cotacoes.empty:
                     # Filtros
@@ -150,7 +151,7 @@ def mostrar_cotacao():
                         df_filtered = df_filtered.drop("Data_filtro", axis=1)
                     
                     # Exibir tabela
-                    st.dataframe(df_filtered, use_container_width=True)
+                    tabela_paginada(df_filtered, "tabela_cotacoes")
                     
                     # Estatísticas
                     if not df_filtered.empty:
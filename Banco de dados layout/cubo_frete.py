@@ -0,0 +1,83 @@
+import pandas as pd
+from cache_colunar import atualizar_meta_cache, ler_cache, salvar_cache
+from data_loader import versao_base
+from marca_dagua import assinatura, linhas_novas
+
+CACHE_CUBO = "cubo_frete"
+# Versão do formato do cubo; ao mudar, os caches gravados são descartados
+VERSAO_CUBO = 1
+
+# Dimensões e medidas do cubo (coluna da base -> nome no cubo)
+DIMENSOES = ["Ano", "Mês", "Destinatário - Cidade", "Pagador do Frete - Nome"]
+MEDIDAS = {
+    "Valor do frete": "Frete Total",
+    "Soma dos Volumes": "Volumes",
+    "Soma dos Pesos": "Peso",
+}
+CONTAGEM = "Qtd CT-e"
+
+def construir_cubo(base):
+    """
+    Agrega a base por mês × ano × cidade destinatária × pagador, com a
+    soma das medidas e a quantidade de CT-e de cada célula
+    """
+    datas = base["Data de Emissão"]
+    # Ano e Mês já vêm calculados na base compartilhada (data_loader)
+    dados = pd.DataFrame({
+        "Ano": base["Ano"] if "Ano" in base.columns else datas.dt.year.astype("Int64"),
+        "Mês": base["Mês"] if "Mês" in base.columns else datas.dt.strftime("%Y-%m"),
+    }, index=base.index)
+    for dimensao in DIMENSOES[2:]:
+        if dimensao in base.columns:
+            dados[dimensao] = base[dimensao].astype(object)
+    for origem, medida in MEDIDAS.items():
+        if origem in base.columns:
+            dados[medida] = pd.to_numeric(base[origem], errors="coerce").fillna(0)
+    dados[CONTAGEM] = 1
+
+    dimensoes = [d for d in DIMENSOES if d in dados.columns]
+    return _reagrupar(dados, dimensoes)
+
+def _reagrupar(dados, dimensoes):
+    medidas = [c for c in dados.columns if c not in dimensoes]
+    return dados.groupby(dimensoes, dropna=False, sort=True)[medidas].sum().reset_index()
+
+def _combinar(cubo, novo):
+    """
+    Soma as células de dois cubos com as mesmas dimensões
+    """
+    dimensoes = [d for d in DIMENSOES if d in cubo.columns]
+    return _reagrupar(pd.concat([cubo, novo], ignore_index=True), dimensoes)
+
+def obter_cubo(base):
+    """
+    Cubo agregado da base. É reaproveitado enquanto a versão do dataset não
+    muda; quando só chegam CT-e novos (Número acima da marca d'água), apenas
+    as linhas novas são agregadas e somadas ao cubo gravado.
+    """
+    if base.empty or "Data de Emissão" not in base.columns:
+        return pd.DataFrame(columns=DIMENSOES + list(MEDIDAS.values()) + [CONTAGEM])
+
+    versao = versao_base(base)
+    cubo, meta = ler_cache(CACHE_CUBO)
+    if cubo is not None and meta.get("formato") == VERSAO_CUBO:
+        if versao is not None and meta.get("versao") == versao:
+            return cubo
+        novas = linhas_novas(base, meta)
+        if novas is not None:
+            if not novas.empty:
+                cubo = _combinar(cubo, construir_cubo(novas))
+                _gravar(cubo, base, versao)
+            elif meta.get("versao") != versao:
+                # Arquivo regravado sem linhas novas: só a versão muda
+                atualizar_meta_cache(CACHE_CUBO, {**meta, "versao": versao})
+            return cubo
+
+    cubo = construir_cubo(base)
+    _gravar(cubo, base, versao)
+    return cubo
+
+def _gravar(cubo, base, versao):
+    meta = {"formato": VERSAO_CUBO, "versao": versao}
+    meta.update(assinatura(base) or {"marca_numero": None})
+    salvar_cache(CACHE_CUBO, cubo, meta)
@@ -1,5 +1,8 @@
 import streamlit as st
 import pandas as pd
+from cubo_frete import obter_cubo, CONTAGEM
+from series_frete import RESOLUCOES, obter_series, resolucao_para, serie
+from graficos import MAX_CATEGORIAS, grafico_barras, grafico_linha
 
 def exibir_dashboard(df):
     st.markdown("### 📋 Transações Financeiras")
@@ -19,46 +22,76 @@ def mostrar_dashboard(base):
     # Mostrar colunas disponíveis
     st.write("Colunas da base:", base.columns.tolist())
 
-    # Tratamento de datas
     if "Data de Emissão" in base.columns:
+        # Cubo pré-agregado: o custo aqui não depende do tamanho da base
         try:
-            base["Data de Emissão"] = pd.to_datetime(base["Data de Emissão"], dayfirst=True, errors="coerce")
-            base["Ano"] = base["Data de Emissão"].dt.year
-            base["Mês"] = base["Data de Emissão"].dt.strftime("%Y-%m")
+            cubo = obter_cubo(base)
+            series = obter_series(base)
         except Exception as e:
-            st.error(f"Erro ao processar datas: {e}")
+            st.error(f"Erro ao montar o cubo de agregação: {e}")
+            return
 
         # Métricas principais
-        if "Valor do frete" in base.columns:
-            try:
-                base["Valor do frete"] = base["Valor do frete"].astype(str).str.replace("R$", "", regex=False).str.replace(".", "", regex=False).str.replace(",", ".").astype(float)
-                st.metric("Total de Frete", f"R${base['Valor do frete'].sum():,.2f}")
-            except Exception as e:
-                st.error(f"Erro ao calcular valor total de frete: {e}")
+        if "Frete Total" in cubo.columns:
+            st.metric("Total de Frete", f"R${cubo['Frete Total'].sum():,.2f}")
 
-        if "Soma dos Volumes" in base.columns:
-            try:
-                total_volumes = pd.to_numeric(base["Soma dos Volumes"], errors='coerce').fillna(0)
-                st.metric("Total de Volumes", int(total_volumes.sum()))
-            except Exception as e:
-                st.error(f"Erro ao calcular total de volumes: {e}")
+        if "Volumes" in cubo.columns:
+            st.metric("Total de Volumes", int(cubo["Volumes"].sum()))
 
-        # Gráficos
-        if "Valor do frete" in base.columns:
-            try:
-                st.subheader("📅 Frete por Mês")
-                st.bar_chart(base.groupby("Mês")["Valor do frete"].sum())
-
-                st.subheader("📈 Média de Frete por Ano")
-                st.line_chart(base.groupby("Ano")["Valor do frete"].mean())
-            except Exception as e:
-                st.error(f"Erro ao gerar gráficos de frete: {e}")
-
-        if "Destinatário - Cidade" in base.columns and "Valor do frete" in base.columns:
-            try:
-                st.subheader("📍 Frete por Cidade Destinatária")
-                st.bar_chart(base.groupby("Destinatário - Cidade")["Valor do frete"].sum().sort_values(ascending=False))
-            except Exception as e:
-                st.error(f"Erro ao gerar gráfico por cidade: {e}")
+        _graficos_frete(cubo, series)
     else:
         st.warning("A coluna 'Data de Emissão' não está disponível na base.")
+
+@st.fragment
+def _graficos_frete(cubo, series):
+    """
+    Gráficos do cubo e das séries por período, reexecutados sem recarregar
+    a base nem os agregados
+    """
+    if "Frete Total" in series.columns:
+        try:
+            st.subheader("📅 Frete por Mês")
+            st.bar_chart(serie(series, "Mês")["Frete Total"])
+
+            st.subheader("📈 Média de Frete por Ano")
+            por_ano = serie(series, "Ano")
+            st.line_chart(por_ano["Frete Total"] / por_ano[CONTAGEM])
+
+            _tendencia(series)
+        except Exception as e:
+            st.error(f"Erro ao gerar gráficos de frete: {e}")
+
+    if "Destinatário - Cidade" in cubo.columns and "Frete Total" in cubo.columns:
+        try:
+            st.subheader("📍 Frete por Cidade Destinatária")
+            # Só as maiores cidades vão ao navegador; as demais viram "Outros"
+            n = st.slider("Cidades exibidas", 5, 50, MAX_CATEGORIAS)
+            por_cidade = cubo.groupby("Destinatário - Cidade", observed=True)["Frete Total"].sum()
+            st.plotly_chart(grafico_barras(por_cidade, n, "Frete Total"), use_container_width=True)
+        except Exception as e:
+            st.error(f"Erro ao gerar gráfico por cidade: {e}")
+
+def _tendencia(series):
+    """
+    Série de um indicador no período escolhido; em "Automática" a
+    resolução é a mais fina que cabe em MAX_PONTOS pontos
+    """
+    st.subheader("📉 Tendência por Período")
+    dias = serie(series, "Dia")
+    if dias.empty:
+        return
+    primeiro, ultimo = dias.index.min().date(), dias.index.max().date()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        periodo = st.date_input("Período", (primeiro, ultimo), min_value=primeiro, max_value=ultimo)
+    with col2:
+        resolucao = st.selectbox("Resolução", ["Automática"] + list(RESOLUCOES))
+    with col3:
+        medida = st.selectbox("Indicador", [c for c in series.columns if c not in ("Resolução", "Início")])
+    if not isinstance(periodo, (tuple, list)) or len(periodo) != 2:
+        return
+    inicio, fim = periodo
+    if resolucao == "Automática":
+        resolucao = resolucao_para(inicio, fim)
+    st.plotly_chart(grafico_linha(serie(series, resolucao, inicio, fim)[medida]), use_container_width=True)
+    st.caption(f"Resolução: {resolucao}")
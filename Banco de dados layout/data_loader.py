@@ -1,63 +1,285 @@
+import numpy as np
 import pandas as pd
 import streamlit as st
 import os
+from cache_colunar import ler_snapshot, salvar_snapshot, versao_snapshot
+from esquemas import ler_tabela
+from armazenamento import BackendSQLite, obter_backend
+
+try:
+    import pyarrow as pa
+except ImportError:  # sem pyarrow o texto fica em object
+    pa = None
 
 ARQ_BASE = "data/base.csv"
+SNAPSHOT_BASE = "base"
+PRAZO_VENCIMENTO = pd.Timedelta(days=10)
 
-@st.cache_data(show_spinner=False)
-def carregar_base():
-    try:
-        if not os.path.exists(ARQ_BASE):
-            return pd.DataFrame(columns=[
-                "Data de Emissão", "Descrição", "Valor do frete", "Valor", "Tipo",
-                "Categoria", "Centro de Custo", "Setor", "ID Transação", "Conciliado com"
-            ])
-        df = pd.read_csv(ARQ_BASE, sep=";", encoding="utf-8")
-        df = df.loc[:, ~df.columns.str.contains("^Unnamed")]
-        df.columns = [c.strip() for c in df.columns]
-
-        col_frete = [c for c in df.columns if "valor do frete" in c.lower()]
-        if not col_frete:
-            col_frete = [c for c in df.columns if "frete" in c.lower() and "valor" in c.lower()]
-
-        if col_frete:
-            col = col_frete[0]
-            df[col] = (
-                df[col].astype(str)
-                .str.replace("R$", "", regex=False)
-                .str.replace(" ", "", regex=False)
-                .str.replace(".", "", regex=False)
-                .str.replace(",", ".")
-            )
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-            df.rename(columns={col: "Valor do frete"}, inplace=True)
-        else:
-            df["Valor do frete"] = 0.0
-            st.warning("⚠️ Coluna de frete não encontrada. Criada com valor 0.0.")
-
-        if "Data de Emissão" in df.columns:
-            df["Data de Emissão"] = pd.to_datetime(df["Data de Emissão"], dayfirst=True, errors="coerce")
-            df = df[df["Data de Emissão"].notnull()]
-            df["Quinzena"] = df["Data de Emissão"].apply(
-                lambda x: f"{x.month:02d}/1ª" if x.day <= 15 else f"{x.month:02d}/2ª"
-            )
-            df["Data de Vencimento"] = df["Data de Emissão"] + pd.Timedelta(days=10)
-        else:
-            st.warning("⚠️ Coluna 'Data de Emissão' não encontrada.")
-
-        for campo in ["Soma dos Volumes", "Soma das Notas", "Soma dos Pesos"]:
-            if campo in df.columns:
-                df[campo] = pd.to_numeric(df[campo], errors="coerce").fillna(0)
-
-        return df
+BACKEND_BASE = obter_backend("base")
+
+# "01/1ª", "01/2ª", ..., "12/2ª": código = (mês - 1) * 2 + (dia > 15)
+ROTULOS_QUINZENA = np.array([f"{m:02d}/{q}ª" for m in range(1, 13) for q in (1, 2)], dtype=object)
+
+# Arrays com valores e máscara numpy (Int64, Float64, boolean)
+MASCARADOS = (pd.arrays.IntegerArray, pd.arrays.FloatingArray, pd.arrays.BooleanArray)
+
+# Colunas derivadas da base: nome -> (função(df) -> Series, colunas exigidas).
+# São calculadas uma vez por versão do dataset, ao montar a base compartilhada.
+COLUNAS_DERIVADAS = {}
+
+def coluna_derivada(nome, requer=()):
+    """
+    Registra uma coluna derivada da base
+    """
+    def registrar(funcao):
+        COLUNAS_DERIVADAS[nome] = (funcao, tuple(requer))
+        return funcao
+    return registrar
+
+def rotulo_quinzena(datas):
+    """
+    Rótulo "mm/1ª" ou "mm/2ª" de cada data, sem percorrer linha a linha
+    """
+    datas = pd.to_datetime(datas)
+    codigos = (datas.dt.month - 1) * 2 + (datas.dt.day > 15)
+    rotulos = pd.Series(None, index=datas.index, dtype=object)
+    validas = codigos.notna().to_numpy()
+    rotulos[validas] = ROTULOS_QUINZENA[codigos[validas].astype(np.int64).to_numpy()]
+    return rotulos
+
+@coluna_derivada("Quinzena", requer=["Data de Emissão"])
+def _quinzena(df):
+    return rotulo_quinzena(df["Data de Emissão"])
+
+@coluna_derivada("Data de Vencimento", requer=["Data de Emissão"])
+def _vencimento(df):
+    return df["Data de Emissão"] + PRAZO_VENCIMENTO
 
+@coluna_derivada("Ano", requer=["Data de Emissão"])
+def _ano(df):
+    return df["Data de Emissão"].dt.year.astype("Int64")
+
+@coluna_derivada("Mês", requer=["Data de Emissão"])
+def _mes(df):
+    return df["Data de Emissão"].dt.strftime("%Y-%m")
+
+def carregar_base(colunas=None):
+    """
+    Base de CT-e compartilhada entre as sessões. Cada chamada recebe uma
+    visão sem cópia do mesmo objeto: colunas novas ficam só na visão,
+    escrita nas colunas numéricas, de datas e categóricas falha e escrita
+    no texto (Arrow) fica só na visão, sem alterar a base de todos.
+    """
+    try:
+        base = _base_compartilhada(_assinatura_arquivos())
     except Exception as e:
         st.error(f"❌ Erro ao carregar base: {e}")
         return pd.DataFrame()
+    return visao_base(base, colunas)
+
+def visao_base(base, colunas=None):
+    """
+    Visão (sem copiar os dados) de todas as colunas ou só das informadas
+    """
+    colunas = base.columns if colunas is None else [c for c in colunas if c in base.columns]
+    visao = pd.DataFrame({c: _coluna_visao(base[c]) for c in colunas}, index=base.index, copy=False)
+    visao.attrs = dict(base.attrs)
+    return visao
+
+def _arrow(serie):
+    return isinstance(serie.dtype, pd.ArrowDtype) or getattr(serie.dtype, "storage", None) == "pyarrow"
+
+def _coluna_visao(serie):
+    """
+    Arrays Arrow não podem ser travados e a escrita troca o array do
+    objeto: cada visão recebe o seu, sobre os mesmos buffers imutáveis
+    """
+    if _arrow(serie):
+        return pd.Series(serie.array.copy(), index=serie.index, name=serie.name, copy=False)
+    return serie
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _base_compartilhada(assinatura):
+    """
+    Lê a base uma vez por versão dos arquivos, calcula as colunas
+    derivadas e congela o resultado (somente leitura)
+    """
+    df = _ler_base()
+    return _congelar(df, _derivadas(df))
+
+def _ler_base():
+    """
+    Carrega a base de CT-e. Usa o snapshot colunar quando ele ainda
+    corresponde ao CSV; caso contrário normaliza o CSV e regrava o snapshot.
+    Com o backend SQLite a base é lida da tabela, reimportada quando o CSV
+    do ERP muda em relação à última importação.
+    """
+    if isinstance(BACKEND_BASE, BackendSQLite):
+        if os.path.exists(ARQ_BASE):
+            _importar_csv_sqlite()
+        if BACKEND_BASE.existe():
+            return _com_versao(BACKEND_BASE.carregar())
+
+    if not os.path.exists(ARQ_BASE):
+        return pd.DataFrame(columns=[
+            "Data de Emissão", "Descrição", "Valor do frete", "Valor", "Tipo",
+            "Categoria", "Centro de Custo", "Setor", "ID Transação", "Conciliado com"
+        ])
+
+    df = ler_snapshot(SNAPSHOT_BASE, ARQ_BASE)
+    if df is None:
+        df = _ler_base_csv()
+        salvar_snapshot(SNAPSHOT_BASE, ARQ_BASE, df)
+    return _com_versao(df)
+
+def _assinatura_csv():
+    info = os.stat(ARQ_BASE)
+    return f"{info.st_size}:{info.st_mtime_ns}"
+
+def _importar_csv_sqlite():
+    """
+    Importa o CSV para o SQLite na primeira carga e sempre que a assinatura
+    do CSV difere da registrada na última importação
+    """
+    assinatura = _assinatura_csv()
+    registrada = BACKEND_BASE.origem()
+    if not BACKEND_BASE.existe() or (registrada is not None and registrada != assinatura):
+        BACKEND_BASE.salvar(_ler_base_csv(), origem=assinatura)
+    elif registrada is None:
+        # Banco anterior ao registro de origem: adota o CSV atual sem reimportar
+        BACKEND_BASE.registrar_origem(assinatura)
+
+def _derivadas(df):
+    """
+    Valores das colunas derivadas registradas que se aplicam à base
+    """
+    if df.empty:
+        return {}
+    return {
+        nome: funcao(df)
+        for nome, (funcao, requer) in COLUNAS_DERIVADAS.items()
+        if all(c in df.columns for c in requer)
+    }
+
+def _congelar(df, derivadas):
+    """
+    Junta base e colunas derivadas num DataFrame somente leitura: texto
+    livre vira string Arrow (imutável; ver _coluna_visao), arrays numpy e
+    os buffers de valores e máscara de Int64/Float64/boolean e os códigos
+    das categorias ficam travados para escrita e as demais colunas entram sem cópia
+    """
+    colunas = {}
+    series = [(nome, df[nome]) for nome in df.columns if nome not in derivadas]
+    for nome, serie in series + list(derivadas.items()):
+        if serie.dtype == object and pa is not None and pd.api.types.infer_dtype(serie, skipna=True) == "string":
+            serie = serie.astype("string[pyarrow]")
+        elif isinstance(serie.dtype, np.dtype):
+            valores = serie.to_numpy(copy=True)
+            valores.flags.writeable = False
+            serie = pd.Series(valores, index=df.index, name=nome, copy=False)
+        elif isinstance(serie.array, MASCARADOS):
+            mascara = serie.isna().to_numpy(copy=True)
+            valores = serie.to_numpy(dtype=serie.dtype.numpy_dtype, na_value=serie.dtype.numpy_dtype.type(0))
+            mascara.flags.writeable = False
+            valores.flags.writeable = False
+            serie = pd.Series(type(serie.array)(valores, mascara), index=df.index, name=nome, copy=False)
+        elif isinstance(serie.dtype, pd.CategoricalDtype):
+            codigos = serie.cat.codes.to_numpy(copy=True)
+            codigos.flags.writeable = False
+            serie = pd.Series(pd.Categorical.from_codes(codigos, dtype=serie.dtype), index=df.index, name=nome, copy=False)
+        colunas[nome] = serie
+    congelado = pd.DataFrame(colunas, index=df.index, copy=False)
+    congelado.attrs = dict(df.attrs)
+    return congelado
+
+def _assinatura_arquivos():
+    """
+    Assinatura barata (tamanho e mtime) dos arquivos da base, usada como
+    chave da base compartilhada
+    """
+    caminhos = [ARQ_BASE]
+    if isinstance(BACKEND_BASE, BackendSQLite):
+        caminhos += [BACKEND_BASE.caminho, f"{BACKEND_BASE.caminho}-wal"]
+    partes = []
+    for caminho in caminhos:
+        if os.path.exists(caminho):
+            info = os.stat(caminho)
+            partes.append(f"{caminho}:{info.st_size}:{info.st_mtime_ns}")
+    return "|".join(partes)
+
+def _versao_arquivos():
+    """
+    Versão do dataset em disco: hash do CSV (via snapshot) ou, no SQLite,
+    a assinatura do banco e do seu WAL
+    """
+    if isinstance(BACKEND_BASE, BackendSQLite):
+        partes = []
+        for caminho in (BACKEND_BASE.caminho, f"{BACKEND_BASE.caminho}-wal"):
+            if os.path.exists(caminho):
+                info = os.stat(caminho)
+                partes.append(f"{info.st_size}:{info.st_mtime_ns}")
+        return "sqlite:" + "|".join(partes)
+    versao = versao_snapshot(SNAPSHOT_BASE)
+    if versao is None and os.path.exists(ARQ_BASE):
+        info = os.stat(ARQ_BASE)
+        versao = f"csv:{info.st_size}:{info.st_mtime_ns}"
+    return versao
+
+def _com_versao(df):
+    # Guardada em attrs para acompanhar o próprio DataFrame (inclusive no cache)
+    df.attrs["versao"] = _versao_arquivos()
+    return df
+
+def versao_base(base):
+    """
+    Versão do dataset de onde a base foi carregada, para chavear índices
+    e agregados derivados dela
+    """
+    return base.attrs.get("versao")
+
+def _ler_base_csv():
+    """
+    Lê o CSV exportado do ERP pelo esquema "base" (as colunas derivadas,
+    como quinzena e vencimento, ficam em COLUNAS_DERIVADAS)
+    """
+    df = ler_tabela("base", ARQ_BASE)
+
+    if "Valor do frete" in df.columns:
+        df["Valor do frete"] = df["Valor do frete"].fillna(0)
+    else:
+        df["Valor do frete"] = 0.0
+        st.warning("⚠️ Coluna de frete não encontrada. Criada com valor 0.0.")
+
+    if "Data de Emissão" in df.columns:
+        df = df[df["Data de Emissão"].notnull()]
+    else:
+        st.warning("⚠️ Coluna 'Data de Emissão' não encontrada.")
+
+    for campo in ["Soma dos Volumes", "Soma das Notas", "Soma dos Pesos"]:
+        if campo in df.columns:
+            df[campo] = df[campo].fillna(0)
+
+    return df
+
+def _sem_derivadas(df):
+    """
+    Tira as colunas derivadas (recalculadas a cada carga), menos as que o
+    próprio CSV do ERP já traz, para o arquivo manter o layout de origem
+    """
+    originais = set()
+    if os.path.exists(ARQ_BASE):
+        with open(ARQ_BASE, "r", encoding="utf-8", errors="replace", newline="") as f:
+            originais = {c.strip().lstrip("\ufeff") for c in f.readline().rstrip("\r\n").split(";")}
+    return df.drop(columns=[c for c in COLUNAS_DERIVADAS if c in df.columns and c not in originais])
 
 def salvar_base(df):
-    pasta = os.path.dirname(ARQ_BASE)
-    if not os.path.exists(pasta):
-        os.makedirs(pasta)
-    df.to_csv(ARQ_BASE, sep=";", index=False)
+    df = _sem_derivadas(df)
+    if isinstance(BACKEND_BASE, BackendSQLite):
+        BACKEND_BASE.salvar(df)
+    else:
+        pasta = os.path.dirname(ARQ_BASE)
+        if not os.path.exists(pasta):
+            os.makedirs(pasta)
+        df.to_csv(ARQ_BASE, sep=";", index=False)
     st.success("Base salva com sucesso!")
+    return True
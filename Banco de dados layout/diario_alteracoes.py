@@ -0,0 +1,152 @@
+import os
+import threading
+from datetime import datetime
+import pandas as pd
+from registro_append import trava_arquivo, anexar_linhas, ler_linhas
+
+# Tamanho do diário a partir do qual a compactação em segundo plano é disparada
+LIMITE_COMPACTACAO = 64 * 1024
+
+def _valor_json(valor):
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    if hasattr(valor, "item"):
+        return valor.item()
+    return valor
+
+class DiarioAlteracoes:
+    """
+    Diário (write-ahead) de alterações célula a célula sobre uma base.
+
+    Cada edição grava só (chave, coluna, antigo, novo, usuário, horário);
+    a leitura aplica o diário por cima da base e a compactação leva as
+    alterações para o backend em segundo plano. As entradas compactadas
+    vão para um histórico, que serve de trilha de auditoria.
+    """
+
+    def __init__(self, backend, caminho, chave="ID Transação", limite_compactacao=LIMITE_COMPACTACAO):
+        self.backend = backend
+        self.chave = chave
+        self.caminho = caminho
+        self.caminho_compactando = f"{caminho}.compactando"
+        self.caminho_historico = f"{caminho}.historico"
+        self.lock = f"{caminho}.lock"
+        self.limite_compactacao = limite_compactacao
+        self._compactando = threading.Lock()
+
+    def trava(self):
+        """
+        Trava usada também por quem regrava a base inteira
+        """
+        return trava_arquivo(self.lock)
+
+    def registrar(self, alteracoes, usuario=None):
+        """
+        Grava uma lista de (valor_chave, coluna, antigo, novo) no diário
+        """
+        if not alteracoes:
+            return 0
+        em = datetime.now().isoformat(timespec="seconds")
+        registros = [
+            {
+                "chave": str(valor_chave),
+                "coluna": coluna,
+                "antigo": _valor_json(antigo),
+                "novo": _valor_json(novo),
+                "usuario": usuario,
+                "em": em,
+            }
+            for valor_chave, coluna, antigo, novo in alteracoes
+        ]
+        pasta = os.path.dirname(self.caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with self.trava():
+            anexar_linhas(self.caminho, registros)
+        self.compactar_em_segundo_plano()
+        return len(registros)
+
+    def _pendentes(self):
+        return ler_linhas(self.caminho_compactando) + ler_linhas(self.caminho)
+
+    def _ultimas(self, registros):
+        """
+        Último valor de cada (chave, coluna)
+        """
+        return pd.DataFrame(registros).drop_duplicates(["chave", "coluna"], keep="last")
+
+    def carregar(self):
+        """
+        Base do backend com as alterações pendentes aplicadas. Backend e
+        diário são lidos sob a mesma trava da compactação, então a leitura
+        vê os dois antes ou depois dela, nunca no meio.
+        """
+        with self.trava():
+            base = self.backend.carregar()
+            registros = self._pendentes()
+        return self._aplicar(base, registros)
+
+    def aplicar(self, base):
+        """
+        Aplica as alterações pendentes do diário sobre a base carregada
+        """
+        with self.trava():
+            registros = self._pendentes()
+        return self._aplicar(base, registros)
+
+    def _aplicar(self, base, registros):
+        if not registros or base.empty or self.chave not in base.columns:
+            return base
+        base = base.copy()
+        chaves = base[self.chave].astype(str)
+        for coluna, grupo in self._ultimas(registros).groupby("coluna", sort=False):
+            novos = pd.Series(grupo["novo"].to_numpy(), index=grupo["chave"].to_numpy())
+            alvo = chaves.isin(novos.index)
+            if not alvo.any():
+                continue
+            if coluna not in base.columns:
+                base[coluna] = None
+            base.loc[alvo, coluna] = chaves[alvo].map(novos).to_numpy()
+        return base
+
+    def compactar_em_segundo_plano(self):
+        """
+        Dispara a compactação numa thread quando o diário passa do limite
+        """
+        if not os.path.exists(self.caminho) or os.path.getsize(self.caminho) < self.limite_compactacao:
+            return
+        if self._compactando.locked():
+            return
+        threading.Thread(target=self._compactar_thread, daemon=True).start()
+
+    def _compactar_thread(self):
+        if not self._compactando.acquire(blocking=False):
+            return
+        try:
+            self.compactar()
+        finally:
+            self._compactando.release()
+
+    def compactar(self):
+        """
+        Leva as alterações do diário para o backend e arquiva as entradas.
+        Aplicar uma alteração duas vezes é inofensivo, então uma compactação
+        interrompida é simplesmente refeita.
+        """
+        with self.trava():
+            if os.path.exists(self.caminho):
+                if os.path.exists(self.caminho_compactando):
+                    anexar_linhas(self.caminho_compactando, ler_linhas(self.caminho))
+                    os.remove(self.caminho)
+                else:
+                    os.replace(self.caminho, self.caminho_compactando)
+            registros = ler_linhas(self.caminho_compactando)
+            if not registros:
+                return
+            for coluna, grupo in self._ultimas(registros).groupby("coluna", sort=False):
+                self.backend.atualizar_varios(
+                    self.chave,
+                    pd.DataFrame({self.chave: grupo["chave"].to_numpy(), coluna: grupo["novo"].to_numpy()}),
+                )
+            anexar_linhas(self.caminho_historico, registros)
+            os.remove(self.caminho_compactando)
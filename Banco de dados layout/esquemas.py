@@ -0,0 +1,298 @@
+import csv
+import os
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # sem pyarrow a leitura cai no parser do pandas
+    pa = None
+    pa_csv = None
+
+# Tipos de coluna aceitos no registro
+TEXTO = "texto"            # string livre (também colunas editáveis)
+CATEGORIA = "categoria"    # string repetitiva e somente leitura
+DOCUMENTO = "documento"    # número de documento (Int64; mantém texto se houver letras)
+NUMERO = "numero"          # quantidade numérica (float/int)
+MOEDA = "moeda"            # valor em R$, convertido via centavos inteiros
+DATA = "data"              # data brasileira (dd/mm/aaaa)
+DATA_ISO = "data_iso"      # data gravada pelo próprio sistema (aaaa-mm-dd)
+
+# Registro central dos arquivos de dados do projeto.
+# "sinonimos" mapeia a coluna canônica para grupos de palavras que,
+# presentes juntas no cabeçalho (em minúsculas), identificam a coluna.
+ESQUEMAS = {
+    "base": {
+        "arquivo": "data/base.csv",
+        "separador": ";",
+        "colunas": {
+            "Número": DOCUMENTO,
+            "Nº Fatura": DOCUMENTO,
+            "Data de Emissão": DATA,
+            "Valor do frete": MOEDA,
+            "Soma dos Volumes": NUMERO,
+            "Soma das Notas": NUMERO,
+            "Soma dos Pesos": NUMERO,
+            "Remetente - Nome": CATEGORIA,
+            "Destinatário - Nome": CATEGORIA,
+            "Destinatário - Cidade": CATEGORIA,
+            "Pagador do Frete - Nome": CATEGORIA,
+            "Notas Fiscais": TEXTO,
+        },
+        "sinonimos": {
+            "Valor do frete": [("valor do frete",), ("valor", "frete")],
+        },
+    },
+    "extrato": {
+        "arquivo": "extrato.csv",
+        "separador": ";",
+        "colunas": {
+            "Data Lançamento": DATA,
+            "Cliente": CATEGORIA,
+            "Conciliação": CATEGORIA,
+            "Valor Fatura Sistema": MOEDA,
+            "Quantidade de Fretes": NUMERO,
+        },
+    },
+    "base_financeira": {
+        "arquivo": "data/base_financeira.csv",
+        "separador": ";",
+        "colunas": {
+            "Data": DATA_ISO,
+            "Descrição": TEXTO,
+            "Memo": TEXTO,
+            "Valor": NUMERO,
+            "Tipo": TEXTO,
+            "Categoria": TEXTO,
+            "Setor": TEXTO,
+            "Centro de Custo": TEXTO,
+            "ID Transação": TEXTO,
+            "Conciliado com": TEXTO,
+            "Conta": TEXTO,
+        },
+    },
+    "coletas": {
+        "arquivo": "coletas.csv",
+        "separador": ";",
+        "colunas": {
+            "Número Coleta": DOCUMENTO,
+            "Data Criação": TEXTO,
+            "Data Coleta": DATA_ISO,
+            "Horário Início": TEXTO,
+            "Horário Fim": TEXTO,
+            "Remetente Nome": TEXTO,
+            "Remetente Endereço": TEXTO,
+            "Remetente Cidade": CATEGORIA,
+            "Remetente Telefone": TEXTO,
+            "Remetente Contato": TEXTO,
+            "Destinatário Nome": TEXTO,
+            "Destinatário Endereço": TEXTO,
+            "Destinatário Cidade": CATEGORIA,
+            "Destinatário Telefone": TEXTO,
+            "Destinatário Contato": TEXTO,
+            "Tipo Mercadoria": CATEGORIA,
+            "Quantidade Volumes": NUMERO,
+            "Peso Total (kg)": NUMERO,
+            "Valor Mercadoria (R$)": NUMERO,
+            "Observações": TEXTO,
+            "Urgente": CATEGORIA,
+            "Status": TEXTO,
+            "Motorista": TEXTO,
+            "Veículo": TEXTO,
+        },
+    },
+    "cotacoes": {
+        "arquivo": "cotacoes.csv",
+        "separador": ";",
+        "colunas": {
+            "Data": TEXTO,
+            "Cliente": CATEGORIA,
+            "Origem": CATEGORIA,
+            "Destino": CATEGORIA,
+            "Distância (km)": NUMERO,
+            "Peso (kg)": NUMERO,
+            "Tipo de Carga": CATEGORIA,
+            "Prazo (dias)": NUMERO,
+            "Valor Cotado (R$)": NUMERO,
+            "Status": CATEGORIA,
+            "Observações": TEXTO,
+        },
+    },
+    "contatos": {
+        "arquivo": "contatos.csv",
+        "separador": ",",
+        "colunas": {
+            "ID": TEXTO,
+            "Nome": TEXTO,
+            "Número": TEXTO,
+            "Email": TEXTO,
+            "Cidade": TEXTO,
+            "Observação": TEXTO,
+        },
+    },
+}
+
+def colunas(nome):
+    """
+    Lista as colunas declaradas para o arquivo registrado
+    """
+    return list(ESQUEMAS[nome]["colunas"].keys())
+
+def tabela_vazia(nome):
+    """
+    DataFrame vazio com as colunas declaradas no esquema
+    """
+    return pd.DataFrame(columns=colunas(nome))
+
+def centavos(serie):
+    """
+    Converte valores em R$ (texto "R$ 1.234,56", "1.500", "1234.56" ou
+    numérico) para centavos inteiros (Int64). Valores inválidos viram <NA>.
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return (serie.astype("float64") * 100).round().astype("Int64")
+
+    texto = (
+        serie.astype("string")
+        .str.replace(r"[R$\s\u00a0]", "", regex=True)
+    )
+    # Com vírgula, ou só com pontos em grupos de três dígitos ("1.500"), é
+    # formato brasileiro: ponto é separador de milhar
+    brasileiro = (
+        texto.str.contains(",", regex=False, na=False)
+        | texto.str.fullmatch(r"-?\d{1,3}(\.\d{3})+", na=False)
+    )
+    texto = texto.mask(
+        brasileiro,
+        texto.str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+    )
+    valores = pd.to_numeric(texto, errors="coerce")
+    return (valores * 100).round().astype("Int64")
+
+def _converter_moeda(serie):
+    return centavos(serie).astype("float64") / 100
+
+def _converter_documento(serie):
+    texto = serie.astype("string").str.strip()
+    numeros = pd.to_numeric(texto, errors="coerce")
+    # Só vira inteiro se todo valor preenchido for numérico e inteiro
+    invalidos = texto.notna() & (texto != "") & numeros.isna()
+    if invalidos.any() or (numeros.dropna() % 1 != 0).any():
+        return serie.astype(object).where(serie.notna(), None)
+    return numeros.round().astype("Int64")
+
+def _converter_data(serie, dayfirst):
+    formato = "%d/%m/%Y" if dayfirst else "%Y-%m-%d"
+    texto = serie.astype("string").str.strip()
+    datas = pd.to_datetime(texto, format=formato, errors="coerce")
+    # Valores com hora ou em outro formato: parse genérico só nas falhas
+    falhas = datas.isna() & texto.notna() & (texto != "")
+    if falhas.any():
+        datas[falhas] = pd.to_datetime(texto[falhas], format="mixed", dayfirst=dayfirst, errors="coerce")
+    return datas
+
+def _converter_texto(serie):
+    return serie.astype(object).where(serie.notna(), None)
+
+CONVERSORES = {
+    TEXTO: _converter_texto,
+    CATEGORIA: lambda s: s.astype("category"),
+    DOCUMENTO: _converter_documento,
+    NUMERO: lambda s: pd.to_numeric(s, errors="coerce"),
+    MOEDA: _converter_moeda,
+    DATA: lambda s: _converter_data(s, dayfirst=True),
+    DATA_ISO: lambda s: _converter_data(s, dayfirst=False),
+}
+
+def _ler_cabecalho(caminho, separador, encoding):
+    with open(caminho, "r", encoding=encoding, newline="") as f:
+        cabecalho = next(csv.reader(f, delimiter=separador), [])
+    # O BOM do UTF-8 é descartado pelos parsers; descarta aqui também
+    return [c.lstrip("\ufeff") for c in cabecalho]
+
+def _mapear_cabecalho(cabecalho, esquema):
+    """
+    Relaciona o cabeçalho bruto com as colunas canônicas do esquema:
+    remove espaços extras, descarta colunas sem nome e aplica sinônimos
+    """
+    declaradas = {c.lower(): c for c in esquema["colunas"]}
+    sinonimos = esquema.get("sinonimos", {})
+    mapa = {}
+    usadas = set()
+    for bruto in cabecalho:
+        limpo = bruto.strip()
+        if not limpo or limpo.startswith("Unnamed"):
+            continue
+        canonico = declaradas.get(limpo.lower())
+        if canonico is None:
+            for destino, grupos in sinonimos.items():
+                if destino in usadas:
+                    continue
+                if any(all(p in limpo.lower() for p in grupo) for grupo in grupos):
+                    canonico = destino
+                    break
+        if canonico is None or canonico in usadas:
+            canonico = limpo
+        usadas.add(canonico)
+        mapa[bruto] = canonico
+    return mapa
+
+def _ler_bruto(caminho, separador, encoding, textuais):
+    """
+    Lê o CSV com o parser multithread do pyarrow. Colunas declaradas são
+    lidas como texto para conversão controlada; as demais têm tipo inferido.
+    """
+    if pa_csv is not None:
+        tabela = pa_csv.read_csv(
+            caminho,
+            read_options=pa_csv.ReadOptions(use_threads=True, encoding=encoding),
+            parse_options=pa_csv.ParseOptions(delimiter=separador, newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={c: pa.string() for c in textuais},
+                strings_can_be_null=True,
+            ),
+        )
+        return tabela.to_pandas()
+    return pd.read_csv(caminho, sep=separador, encoding=encoding,
+                       dtype={c: str for c in textuais})
+
+def ler_tabela(nome, caminho=None, encoding="utf-8"):
+    """
+    Lê um arquivo registrado em ESQUEMAS e devolve o DataFrame já tipado:
+    cabeçalhos normalizados, categorias, documentos inteiros, valores em R$
+    e datas convertidos em uma única passagem.
+    """
+    esquema = ESQUEMAS[nome]
+    caminho = caminho or esquema["arquivo"]
+    if not os.path.exists(caminho):
+        return tabela_vazia(nome)
+
+    separador = esquema["separador"]
+    cabecalho = _ler_cabecalho(caminho, separador, encoding)
+    mapa = _mapear_cabecalho(cabecalho, esquema)
+    textuais = [bruto for bruto, canonico in mapa.items() if canonico in esquema["colunas"]]
+
+    df = _ler_bruto(caminho, separador, encoding, textuais)
+    df.columns = [c.lstrip("\ufeff") for c in df.columns]
+    df = df[[c for c in df.columns if c in mapa]].rename(columns=mapa)
+    return tipar(nome, df)
+
+def tipar(nome, df):
+    """
+    Aplica os conversores do esquema às colunas declaradas presentes no DataFrame
+    """
+    for coluna, tipo in ESQUEMAS[nome]["colunas"].items():
+        if coluna in df.columns:
+            df[coluna] = CONVERSORES[tipo](df[coluna])
+    return df
+
+def gravar_tabela(nome, df, caminho=None, encoding="utf-8"):
+    """
+    Grava o DataFrame no arquivo registrado, com o separador do esquema
+    """
+    esquema = ESQUEMAS[nome]
+    caminho = caminho or esquema["arquivo"]
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    df.to_csv(caminho, sep=esquema["separador"], index=False, encoding=encoding)
@@ -1,28 +1,40 @@
-import streamlit as st
-import pandas as pd
-import os
-from parser_ofx import extrair_transacoes  # Função que você deve ter para extrair OFX
-
 import streamlit as st
 import pandas as pd
 import os
 from datetime import datetime
+from esquemas import ler_tabela
+from armazenamento import obter_backend
+from diario_alteracoes import DiarioAlteracoes
+from indice_duplicidade import IndiceDuplicidade
+from alteracoes_editor import ler_alteracoes, alteracoes_celula, aplicar_alteracoes
+from conciliacao_automatica import (
+    TOLERANCIA_DIAS, TOLERANCIA_CENTAVOS, recebimentos_abertos, documentos_abertos,
+    propor_conciliacoes, carregar_rejeitadas, rejeitar, totais_documentos, avaliar_transacoes,
+    preselecionadas,
+)
+from alocacao_pagamentos import JANELA_DIAS, sugerir_alocacoes
+from livro_conciliacao import LivroConciliacao
+from tabela_paginada import tabela_paginada
 
 ARQ_BASE = "data/base_financeira.csv"
 ARQ_EXTRATO = "extrato.csv"  # Arquivo de extrato bancário adicional
 
-# Garantir pasta 'data' para salvar arquivos
-os.makedirs("data", exist_ok=True)
+ARQ_DIARIO = "data/base_financeira.diario.jsonl"  # Diário de edições célula a célula
+
+BACKEND_FINANCEIRO = obter_backend("base_financeira")
+DIARIO_FINANCEIRO = DiarioAlteracoes(BACKEND_FINANCEIRO, ARQ_DIARIO)
+
+COLUNAS_MANUAIS = ["Centro de Custo", "Setor"]  # Editáveis na classificação manual
+
+ARQ_DUPLICIDADE = "data/base_financeira.dedup.jsonl"  # FITIDs e impressões já importados
+INDICE_DUPLICIDADE = IndiceDuplicidade(ARQ_DUPLICIDADE, BACKEND_FINANCEIRO.carregar)
 
-# Função para carregar base CSV
+LIVRO_FINANCEIRO = LivroConciliacao("financeiro")  # Status por ID Transação
+
+# Função para carregar base CSV (com as edições pendentes do diário aplicadas)
 def carregar_base():
     try:
-        if os.path.exists(ARQ_BASE):
-            return pd.read_csv(ARQ_BASE, sep=";")
-        else:
-            cols = ["Data", "Descrição", "Valor", "Tipo", "Categoria",
-                    "Setor", "Centro de Custo", "ID Transação", "Conciliado com"]
-            return pd.DataFrame(columns=cols)
+        return DIARIO_FINANCEIRO.carregar()
     except Exception as e:
         st.error(f"Erro ao carregar a base: {e}")
         return pd.DataFrame()
@@ -34,14 +46,7 @@ def carregar_extrato():
     """
     try:
         if os.path.exists(ARQ_EXTRATO):
-            df = pd.read_csv(ARQ_EXTRATO, sep=";", encoding="utf-8")
-            df.columns = [c.strip() for c in df.columns]
-            
-            # Tratar data
-            if "Data Lançamento" in df.columns:
-                df["Data Lançamento"] = pd.to_datetime(df["Data Lançamento"], dayfirst=True, errors="coerce")
-            
-            return df
+            return ler_tabela("extrato", ARQ_EXTRATO)
         else:
             return pd.DataFrame()
     except Exception as e:
@@ -51,7 +56,8 @@ def carregar_extrato():
 # Função para salvar base CSV
 def salvar_base(df):
     try:
-        df.to_csv(ARQ_BASE, sep=";", index=False)
+        with DIARIO_FINANCEIRO.trava():
+            BACKEND_FINANCEIRO.salvar(df)
     except Exception as e:
         st.error(f"Erro ao salvar a base: {e}")
 
@@ -61,92 +67,236 @@ def atualizar_com_ofx(df_ofx):
     if df_ofx.empty:
         st.warning("⚠️ Nenhum dado OFX carregado.")
         return base, 0
-    # Evita duplicidade pela chave "ID Transação"
-    novos = df_ofx[~df_ofx["ID Transação"].isin(base["ID Transação"])]
+    # Evita duplicidade pelo FITID e pela impressão digital do conteúdo
+    novos = df_ofx[~INDICE_DUPLICIDADE.duplicadas(df_ofx)]
     if novos.empty:
         return base, 0
     final = pd.concat([base, novos], ignore_index=True)
-    salvar_base(final)
+    with DIARIO_FINANCEIRO.trava():
+        BACKEND_FINANCEIRO.upsert(novos, "ID Transação")
+        INDICE_DUPLICIDADE.registrar(df_ofx)
     return final, len(novos)
 
-# Upload OFX e processamento
-uploaded_file = st.file_uploader("📥 Importar arquivo OFX", type=["ofx"])
-if uploaded_file:
-    df_ofx = extrair_transacoes(uploaded_file)
-    st.success(f"{len(df_ofx)} transações lidas.")
-    base, novos = atualizar_com_ofx(df_ofx)
-    st.info(f"{novos} novas transações adicionadas.")
-else:
-    base = carregar_base()
+def conciliado_atual(base, ids):
+    """
+    "Conciliado com" atual de cada ID, o valor antigo gravado no diário
+    """
+    atuais = pd.Series(base["Conciliado com"].to_numpy(), index=base["ID Transação"].astype(str).to_numpy())
+    atuais = atuais[~atuais.index.duplicated(keep="last")]
+    return atuais.reindex([str(i) for i in ids]).tolist()
 
-if base.empty:
-    st.warning("⚠️ Base de dados vazia. Carregue um arquivo OFX.")
-    st.stop()
-
-# Filtros na sidebar
-setores = sorted(base["Setor"].dropna().unique())
-centros = sorted(base["Centro de Custo"].dropna().unique())
-categorias = sorted(base["Categoria"].dropna().unique())
-
-setor_sel = st.sidebar.multiselect("Setores", setores, default=setores)
-centro_sel = st.sidebar.multiselect("Centros de Custo", centros, default=centros)
-cat_sel = st.sidebar.multiselect("Categorias", categorias, default=categorias)
-
-df = base[
-    base["Setor"].isin(setor_sel) &
-    base["Centro de Custo"].isin(centro_sel) &
-    base["Categoria"].isin(cat_sel)
-]
-
-# Exibição tabela
-st.markdown(f"### 📋 Transações Financeiras (Total: {len(df)})")
-st.dataframe(df, use_container_width=True)
-
-# Conciliação manual com documento interno
-transacoes_nao_conciliadas = df[df["Conciliado com"].isna() | (df["Conciliado com"] == "")]
-if not transacoes_nao_conciliadas.empty:
-    with st.form("form_conciliacao"):
-        id_escolhido = st.selectbox("Escolha uma transação para conciliar", transacoes_nao_conciliadas["ID Transação"].tolist())
-        doc = st.text_input("Número da Minuta ou CT-e")
-        submit_conciliar = st.form_submit_button("Conciliar")
-
-    if submit_conciliar:
-        idx = base[base["ID Transação"] == id_escolhido].index
-        base.loc[idx, "Conciliado com"] = doc
-        salvar_base(base)
-        st.success(f"Transação {id_escolhido} conciliada com documento {doc}")
-
-# Resumo financeiro
-st.markdown("### 📊 Resumo Financeiro")
-total_receitas = base[base["Tipo"] == "Receita"]["Valor"].sum()
-total_despesas = base[base["Tipo"] == "Despesa"]["Valor"].sum()
-saldo_total = base["Valor"].sum()
-st.markdown(f"**Total Receitas:** R$ {total_receitas:,.2f}")
-st.markdown(f"**Total Despesas:** R$ {total_despesas:,.2f}")
-st.markdown(f"**Saldo Total:** R$ {saldo_total:,.2f}")
-
-# Resumo por Categoria (markdown)
-st.markdown("### 📊 Resumo por Categoria")
-st.markdown(base.groupby("Categoria")["Valor"].sum().to_markdown())
-
-# Transações sem Centro de Custo ou Setor definidos
-faltando = base[(base["Centro de Custo"] == "❗Definir") | (base["Setor"] == "❗Definir")]
-if not faltando.empty:
-    st.markdown("### ⚠️ Transações sem Centro de Custo ou Setor definidos")
-    st.markdown("Complete os dados abaixo:")
-
-    edit_df = st.data_editor(faltando, num_rows="dynamic", key="editor_cc_setor")
-
-    if st.button("✅ Confirmar Classificações Manuais"):
-        for idx, row in edit_df.iterrows():
-            base.loc[row.name, "Centro de Custo"] = row["Centro de Custo"]
-            base.loc[row.name, "Setor"] = row["Setor"]
-        salvar_base(base)
-        st.success("Dados atualizados com sucesso!")
-
-# Gráfico resumo por Categoria
-st.markdown("### 📈 Gráfico por Categoria")
-st.bar_chart(base.groupby("Categoria")["Valor"].sum())
+def carregar_documentos_abertos(base, extrato):
+    """
+    Faturas da base de CT-e e lançamentos do extrato ainda sem conciliação
+    """
+    from data_loader import carregar_base as carregar_base_fretes
+    return documentos_abertos(carregar_base_fretes(), extrato, base["Conciliado com"].dropna())
+
+def atualizar_livro_financeiro(base, extrato):
+    """
+    Reavalia no livro só as transações e documentos novos ou alterados
+    desde a última execução e devolve o livro completo
+    """
+    from data_loader import carregar_base as carregar_base_fretes
+    totais = totais_documentos(carregar_base_fretes(), extrato)
+    transacoes = LIVRO_FINANCEIRO.alteracoes(
+        "transacoes", base, "ID Transação", ["Data", "Descrição", "Valor", "Conciliado com"]
+    )
+    documentos = LIVRO_FINANCEIRO.alteracoes("documentos", totais, "Documento", ["Valor Documento"])
+
+    alvo = base["ID Transação"].astype(str).isin(transacoes.chaves)
+    alterados = set(documentos.chaves) | set(documentos.removidas)
+    if alterados:
+        # Transações ligadas a documentos cujo total mudou ou que sumiram
+        ligadas = base["Conciliado com"].fillna("").astype(str).str.split(",").explode().str.strip().isin(alterados)
+        alvo |= ligadas.groupby(level=0).any().reindex(base.index, fill_value=False)
+    if alvo.any() or transacoes.removidas or alterados:
+        LIVRO_FINANCEIRO.gravar(
+            avaliar_transacoes(base[alvo], totais), transacoes, documentos, remover=transacoes.removidas
+        )
+    return LIVRO_FINANCEIRO.lancamentos()
+
+@st.fragment
+def mostrar_sugestoes_conciliacao(base, extrato):
+    """
+    Propostas automáticas entre recebimentos e faturas/lançamentos em
+    aberto, aceitas ou recusadas em lote
+    """
+    st.markdown("### 🤖 Sugestões de Conciliação")
+    col1, col2 = st.columns(2)
+    with col1:
+        tolerancia_dias = st.number_input("Janela de datas (dias)", 0, 90, TOLERANCIA_DIAS)
+    with col2:
+        tolerancia_valor = st.number_input(
+            "Diferença máxima (R$)", 0.0, 1000.0, TOLERANCIA_CENTAVOS / 100, step=0.5
+        )
+
+    if st.button("🔍 Buscar Correspondências"):
+        documentos = carregar_documentos_abertos(base, extrato)
+        st.session_state["propostas_conciliacao"] = propor_conciliacoes(
+            recebimentos_abertos(base), documentos, carregar_rejeitadas(),
+            round(tolerancia_valor * 100), tolerancia_dias,
+        )
+
+    propostas = st.session_state.get("propostas_conciliacao")
+    if propostas is None:
+        return
+    if propostas.empty:
+        st.info("Nenhuma correspondência encontrada para os recebimentos em aberto.")
+        return
+
+    tabela = propostas.copy()
+    # Só vem marcado o que confere em valor, data e pagador
+    tabela.insert(0, "Selecionar", preselecionadas(tabela))
+    editada = st.data_editor(
+        tabela,
+        disabled=[c for c in tabela.columns if c != "Selecionar"],
+        column_config={"Confiança": st.column_config.ProgressColumn("Confiança", min_value=0, max_value=1)},
+        hide_index=True,
+        use_container_width=True,
+        key="editor_propostas",
+    )
+    marcadas = editada[editada["Selecionar"]]
+    usuario = st.session_state.get("username")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button(f"✅ Aceitar {len(marcadas)} Selecionadas", disabled=marcadas.empty):
+            antigos = conciliado_atual(base, marcadas["ID Transação"])
+            DIARIO_FINANCEIRO.registrar(
+                [
+                    (i, "Conciliado com", a, d)
+                    for i, a, d in zip(marcadas["ID Transação"], antigos, marcadas["Documento"])
+                ],
+                usuario=usuario,
+            )
+            st.session_state["propostas_conciliacao"] = propostas[~propostas["ID Transação"].isin(marcadas["ID Transação"])]
+            st.success(f"{len(marcadas)} transações conciliadas.")
+            st.rerun()
+    with col2:
+        if st.button(f"🚫 Recusar {len(marcadas)} Selecionadas", disabled=marcadas.empty):
+            rejeitar(marcadas, usuario=usuario)
+            st.session_state["propostas_conciliacao"] = propostas[~propostas["ID Transação"].isin(marcadas["ID Transação"])]
+            st.rerun()
+
+@st.fragment
+def mostrar_pagamentos_agrupados(base, extrato):
+    """
+    Combinações de faturas em aberto de um pagador que somam um recebimento
+    (um Pix pagando várias faturas)
+    """
+    st.markdown("### 🧩 Pagamentos Agrupados")
+    recebimentos = recebimentos_abertos(base)
+    if recebimentos.empty:
+        return
+    rotulos = {
+        i: f"{d:%d/%m/%Y} · R$ {v:,.2f} · {t[:60]}"
+        for i, d, v, t in zip(recebimentos["ID Transação"], recebimentos["Data"], recebimentos["Valor"], recebimentos["Descrição"])
+    }
+    id_escolhido = st.selectbox("Recebimento", list(rotulos), format_func=rotulos.get)
+    recebimento = recebimentos[recebimentos["ID Transação"] == id_escolhido].iloc[0]
+    documentos = carregar_documentos_abertos(base, extrato)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        pagadores = sorted(documentos["Pagador"].dropna().astype(str).unique())
+        pagador = st.selectbox("Pagador", [""] + pagadores)
+        cnpj = st.text_input("ou CNPJ do pagador")
+    with col2:
+        janela = st.number_input("Janela de vencimento (dias)", 1, 180, JANELA_DIAS)
+        quantidade = st.number_input("Quantidade de faturas (0 = qualquer)", 0, 100, 0)
+    with col3:
+        tolerancia = st.number_input("Diferença aceita (R$)", 0.0, 100.0, 0.0, step=0.01)
+
+    if st.button("🔍 Encontrar Combinações", disabled=not (pagador or cnpj)):
+        st.session_state["alocacoes"] = (id_escolhido, sugerir_alocacoes(
+            recebimento["Valor"], recebimento["Data"], documentos, cnpj=cnpj or None, pagador=pagador or None,
+            janela_dias=janela, tolerancia_centavos=round(tolerancia * 100), quantidade=quantidade or None,
+        ))
+
+    id_calculado, alocacoes = st.session_state.get("alocacoes", (None, None))
+    if alocacoes is None or id_calculado != id_escolhido:
+        return
+    if alocacoes.empty:
+        st.info("Nenhuma combinação de faturas em aberto explica este valor.")
+        return
+    st.dataframe(alocacoes, use_container_width=True)
+    linha = st.selectbox("Combinação", alocacoes.index, format_func=lambda i: alocacoes.at[i, "Documentos"])
+    if st.button("✅ Conciliar com a Combinação"):
+        DIARIO_FINANCEIRO.registrar(
+            [(id_escolhido, "Conciliado com", conciliado_atual(base, [id_escolhido])[0], alocacoes.at[linha, "Documentos"])],
+            usuario=st.session_state.get("username"),
+        )
+        del st.session_state["alocacoes"]
+        st.success(f"Transação {id_escolhido} conciliada com {alocacoes.at[linha, 'Documentos']}")
+        st.rerun()
+
+@st.fragment
+def mostrar_extrato(extrato):
+    """
+    Filtros, tabela e totais do extrato; trocar um filtro reexecuta só
+    este trecho
+    """
+    if not extrato.empty:
+        st.success(f"✅ Extrato carregado: {len(extrato)} registros encontrados")
+        
+        # Filtros
+        col1, col2 = st.columns(2)
+        with col1:
+            if "Cliente" in extrato.columns:
+                clientes = ["Todos"] + list(extrato["Cliente"].dropna().unique())
+                cliente_selecionado = st.selectbox("Filtrar por Cliente", clientes)
+        
+        with col2:
+            if "Conciliação" in extrato.columns:
+                status_conciliacao = ["Todos"] + list(extrato["Conciliação"].dropna().unique())
+                status_selecionado = st.selectbox("Status Conciliação", status_conciliacao)
+        
+        # Aplicar filtros
+        extrato_filtrado = extrato.copy()
+        
+        if cliente_selecionado != "Todos":
+            extrato_filtrado = extrato_filtrado[extrato_filtrado["Cliente"] == cliente_selecionado]
+        
+        if status_selecionado != "Todos":
+            extrato_filtrado = extrato_filtrado[extrato_filtrado["Conciliação"] == status_selecionado]
+        
+        # Exibir dados
+        tabela_paginada(extrato_filtrado, "tabela_extrato")
+        
+        # Estatísticas
+        if not extrato_filtrado.empty:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                total_registros = len(extrato_filtrado)
+                st.metric("Total Registros", total_registros)
+            
+            with col2:
+                if "Conciliação" in extrato_filtrado.columns:
+                    conciliados = len(extrato_filtrado[extrato_filtrado["Conciliação"] == "Conciliado"])
+                    st.metric("Conciliados", conciliados)
+            
+            with col3:
+                if "Valor Fatura Sistema" in extrato_filtrado.columns:
+                    total_valor = extrato_filtrado["Valor Fatura Sistema"].sum()
+                    st.metric("Valor Total", f"R$ {total_valor:,.2f}")
+        
+        # Download
+        csv = extrato_filtrado.to_csv(index=False, sep=";").encode("utf-8")
+        st.download_button(
+            "📥 Baixar Extrato Filtrado (CSV)",
+            csv,
+            "extrato_filtrado.csv",
+            "text/csv"
+        )
+    else:
+        st.info("📋 Nenhum dado encontrado no arquivo extrato.csv")
+        st.markdown("""
+        **Para visualizar dados do extrato:**
+        1. Certifique-se de que o arquivo `extrato.csv` existe na pasta principal
+        2. Verifique se o formato está correto (separado por `;`)
+        3. Recarregue a página após adicionar o arquivo
+        """)
 
 def mostrar_financeiro():
     """
@@ -181,8 +331,8 @@ def mostrar_financeiro():
         if base.empty:
             st.warning("⚠️ Nenhuma transação encontrada. Importe um arquivo OFX.")
         else:
-            # Mostrar dados
-            st.dataframe(base, use_container_width=True)
+            # Mostrar dados (só a página visível vai para o navegador)
+            tabela_paginada(base, "tabela_financeiro")
 
             # Conciliação de transações
             trans_nao_conciliadas = base[base["Conciliado com"].isna() | (base["Conciliado com"] == "")]
@@ -193,9 +343,12 @@ def mostrar_financeiro():
                     doc = st.text_input("Documento/Minuta/CT-e")
                     submit = st.form_submit_button("Conciliar")
                 if submit and doc:
-                    idx = base[base["ID Transação"] == id_escolhido].index
-                    base.loc[idx, "Conciliado com"] = doc
-                    salvar_base(base)
+                    antigo = base.loc[base["ID Transação"] == id_escolhido, "Conciliado com"].iloc[0]
+                    DIARIO_FINANCEIRO.registrar(
+                        [(id_escolhido, "Conciliado com", antigo, doc)],
+                        usuario=st.session_state.get("username"),
+                    )
+                    base = carregar_base()
                     st.success(f"Transação {id_escolhido} conciliada com documento {doc}")
 
             # Resumo financeiro
@@ -217,13 +370,24 @@ def mostrar_financeiro():
                 st.markdown("### ⚠️ Transações sem Centro de Custo ou Setor definidos")
                 st.markdown("Complete os dados abaixo:")
 
-                edit_df = st.data_editor(faltando, num_rows="dynamic", key="editor_cc_setor")
+                st.data_editor(
+                    faltando,
+                    disabled=[c for c in faltando.columns if c not in COLUNAS_MANUAIS],
+                    key="editor_cc_setor",
+                )
 
                 if st.button("✅ Confirmar Classificações Manuais"):
-                    for idx, row in edit_df.iterrows():
-                        base.loc[row.name, "Centro de Custo"] = row["Centro de Custo"]
-                        base.loc[row.name, "Setor"] = row["Setor"]
-                    salvar_base(base)
+                    # Só as células tocadas no editor vão para o diário
+                    conjunto = ler_alteracoes("editor_cc_setor", faltando, "ID Transação")
+                    DIARIO_FINANCEIRO.registrar(
+                        alteracoes_celula(conjunto, faltando, "ID Transação"),
+                        usuario=st.session_state.get("username"),
+                    )
+                    # Próximas importações já classificam estes favorecidos
+                    from parser_ofx import aprender_classificacoes
+                    editadas, afetadas = aplicar_alteracoes(faltando, conjunto, "ID Transação")
+                    aprender_classificacoes(editadas[afetadas], usuario=st.session_state.get("username"))
+                    base = carregar_base()
                     st.success("Dados atualizados com sucesso!")
 
             # Gráfico resumo por Categoria
@@ -236,70 +400,7 @@ def mostrar_financeiro():
         # Carregar extrato
         extrato = carregar_extrato()
         
-        if not extrato.empty:
-            st.success(f"✅ Extrato carregado: {len(extrato)} registros encontrados")
-            
-            # Filtros
-            col1, col2 = st.columns(2)
-            with col1:
-                if "Cliente" in extrato.columns:
-                    clientes = ["Todos"] + list(extrato["Cliente"].dropna().unique())
-                    cliente_selecionado = st.selectbox("Filtrar por Cliente", clientes)
-            
-            with col2:
-                if "Conciliação" in extrato.columns:
-                    status_conciliacao = ["Todos"] + list(extrato["Conciliação"].dropna().unique())
-                    status_selecionado = st.selectbox("Status Conciliação", status_conciliacao)
-            
-            # Aplicar filtros
-            extrato_filtrado = extrato.copy()
-            
-            if cliente_selecionado != "Todos":
-                extrato_filtrado = extrato_filtrado[extrato_filtrado["Cliente"] == cliente_selecionado]
-            
-            if status_selecionado != "Todos":
-                extrato_filtrado = extrato_filtrado[extrato_filtrado["Conciliação"] == status_selecionado]
-            
-            # Exibir dados
-            st.dataframe(extrato_filtrado, use_container_width=True)
-            
-            # Estatísticas
-            if not extrato_filtrado.empty:
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    total_registros = len(extrato_filtrado)
-                    st.metric("Total Registros", total_registros)
-                
-                with col2:
-                    if "Conciliação" in extrato_filtrado.columns:
-                        conciliados = len(extrato_filtrado[extrato_filtrado["Conciliação"] == "Conciliado"])
-                        st.metric("Conciliados", conciliados)
-                
-                with col3:
-                    if "Valor Fatura Sistema" in extrato_filtrado.columns:
-                        # Tentar extrair valores numéricos
-                        valores_str = extrato_filtrado["Valor Fatura Sistema"].astype(str)
-                        valores_num = valores_str.str.replace("R$", "").str.replace(" ", "").str.replace(",", ".")
-                        valores_float = pd.to_numeric(valores_num, errors='coerce').fillna(0)
-                        total_valor = valores_float.sum()
-                        st.metric("Valor Total", f"R$ {total_valor:,.2f}")
-            
-            # Download
-            csv = extrato_filtrado.to_csv(index=False, sep=";").encode("utf-8")
-            st.download_button(
-                "📥 Baixar Extrato Filtrado (CSV)",
-                csv,
-                "extrato_filtrado.csv",
-                "text/csv"
-            )
-        else:
-            st.info("📋 Nenhum dado encontrado no arquivo extrato.csv")
-            st.markdown("""
-            **Para visualizar dados do extrato:**
-            1. Certifique-se de que o arquivo `extrato.csv` existe na pasta principal
-            2. Verifique se o formato está correto (separado por `;`)
-            3. Recarregue a página após adicionar o arquivo
-            """)
+        mostrar_extrato(extrato)
     
     with tab3:
         st.subheader("🔗 Conciliação Completa")
@@ -309,12 +410,15 @@ def mostrar_financeiro():
         extrato = carregar_extrato()
         
         if not base_transacoes.empty and not extrato.empty:
+            livro = atualizar_livro_financeiro(base_transacoes, extrato)
             st.markdown("### 📊 Comparação entre Bases")
             
             col1, col2 = st.columns(2)
             with col1:
                 st.metric("Transações (OFX)", len(base_transacoes))
-                st.metric("Conciliadas", len(base_transacoes[base_transacoes["Conciliado com"].notna()]))
+                vinculadas = base_transacoes["Conciliado com"].notna() & (base_transacoes["Conciliado com"] != "")
+                st.metric("Conciliadas", int(vinculadas.sum()))
+                st.metric("Confirmadas no Livro", int((livro["status"] == "Conciliado").sum()))
             
             with col2:
                 st.metric("Registros Extrato", len(extrato))
@@ -323,6 +427,18 @@ def mostrar_financeiro():
                     st.metric("Conciliados (Extrato)", conciliados_extrato)
             
             # Divergências
+            divergentes = livro[livro["status"].isin(["Divergente", "Documento não encontrado"])]
+            if not divergentes.empty:
+                st.markdown("### ❗ Conciliações com Divergência")
+                st.dataframe(
+                    divergentes.rename(columns={
+                        "chave": "ID Transação", "documento": "Conciliado com", "origem": "Transação",
+                        "status": "Status", "valor": "Valor", "valor_documento": "Valor Documento",
+                        "diferenca": "Diferença", "em": "Avaliado em",
+                    }),
+                    use_container_width=True, hide_index=True,
+                )
+
             st.markdown("### ⚠️ Transações Não Conciliadas")
             nao_conciliadas = base_transacoes[
                 base_transacoes["Conciliado com"].isna() | 
@@ -330,9 +446,14 @@ def mostrar_financeiro():
             ]
             
             if not nao_conciliadas.empty:
-                st.dataframe(nao_conciliadas[["Data", "Descrição", "Valor", "Tipo", "Categoria"]], 
-                           use_container_width=True)
+                tabela_paginada(
+                    nao_conciliadas, "tabela_nao_conciliadas",
+                    colunas=["Data", "Descrição", "Valor", "Tipo", "Categoria"],
+                )
             else:
                 st.success("✅ Todas as transações estão conciliadas!")
+
+            mostrar_sugestoes_conciliacao(base_transacoes, extrato)
+            mostrar_pagamentos_agrupados(base_transacoes, extrato)
         else:
             st.info("💡 Carregue dados nas outras abas para ver a conciliação completa")
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+MAX_CATEGORIAS = 15      # barras individuais antes de agrupar em "Outros"
+MAX_PONTOS_GRAFICO = 1000
+OUTROS = "Outros"
+
+def top_n(valores, n=MAX_CATEGORIAS, rotulo=OUTROS):
+    """
+    As `n` maiores categorias de uma Series (categoria -> valor) e o
+    restante somado numa categoria `rotulo`
+    """
+    valores = valores.sort_values(ascending=False)
+    if len(valores) <= n:
+        return valores
+    principais = valores.iloc[:n]
+    principais.index = principais.index.astype(object)
+    return pd.concat([principais, pd.Series({rotulo: valores.iloc[n:].sum()})])
+
+def lttb(x, y, limite=MAX_PONTOS_GRAFICO):
+    """
+    Largest-Triangle-Three-Buckets: posições de até `limite` pontos que
+    preservam a forma da série (picos e vales). O primeiro e o último
+    ponto sempre ficam; de cada balde entre eles fica o ponto que forma o
+    maior triângulo com o escolhido anterior e a média do balde seguinte.
+    """
+    n = len(x)
+    if limite >= n or limite < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    bordas = np.linspace(1, n - 1, limite - 1).astype(np.int64)
+    escolhidos = np.empty(limite, dtype=np.int64)
+    escolhidos[0], escolhidos[-1] = 0, n - 1
+    anterior = 0
+    for i in range(limite - 2):
+        inicio, fim = bordas[i], bordas[i + 1]
+        seguinte = slice(fim, bordas[i + 2] if i + 2 < len(bordas) else n)
+        media_x, media_y = x[seguinte].mean(), y[seguinte].mean()
+        areas = np.abs(
+            (x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+            - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior])
+        )
+        anterior = inicio + int(np.argmax(areas))
+        escolhidos[i + 1] = anterior
+    return escolhidos
+
+def reduzir_serie(serie, limite=MAX_PONTOS_GRAFICO):
+    """
+    Série temporal (índice de datas ou números) com até `limite` pontos via LTTB
+    """
+    serie = serie.dropna().sort_index()
+    if len(serie) <= limite:
+        return serie
+    indice = serie.index
+    x = indice.asi8 if isinstance(indice, pd.DatetimeIndex) else indice.to_numpy()
+    return serie.iloc[lttb(x, serie.to_numpy(), limite)]
+
+def grafico_barras(valores, n=MAX_CATEGORIAS, titulo_valor=None):
+    """
+    Barras horizontais das `n` maiores categorias mais "Outros"
+    """
+    valores = top_n(valores, n)
+    figura = go.Figure(go.Bar(
+        x=valores.to_numpy(), y=valores.index.astype(str), orientation="h", name=titulo_valor or "",
+    ))
+    figura.update_layout(
+        yaxis={"autorange": "reversed"}, xaxis_title=titulo_valor, height=max(300, 24 * len(valores)),
+        margin={"l": 10, "r": 10, "t": 10, "b": 10},
+    )
+    return figura
+
+def grafico_linha(dados, limite=MAX_PONTOS_GRAFICO):
+    """
+    Linhas em WebGL (Scattergl) de uma Series ou de cada coluna de um
+    DataFrame, reduzidas a até `limite` pontos por linha
+    """
+    if isinstance(dados, pd.Series):
+        dados = dados.to_frame(dados.name or "Valor")
+    figura = go.Figure()
+    for coluna in dados.columns:
+        serie = reduzir_serie(dados[coluna], limite)
+        figura.add_trace(go.Scattergl(x=serie.index, y=serie.to_numpy(), mode="lines", name=str(coluna)))
+    figura.update_layout(margin={"l": 10, "r": 10, "t": 10, "b": 10}, showlegend=len(dados.columns) > 1)
+    return figura
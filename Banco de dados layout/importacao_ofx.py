@@ -1,9 +1,25 @@
 import streamlit as st
 import pandas as pd
-from parser_ofx import extrair_transacoes, classificar_transacao
+from parser_ofx import extrair_lotes, extrair_varios, classificar_transacao, carregar_regras, aprender_classificacoes
 from data_loader import salvar_base, carregar_base
+from indice_duplicidade import IndiceDuplicidade
+from alteracoes_editor import ler_alteracoes, aplicar_alteracoes
 import os
 
+ARQ_DUPLICIDADE = "data/base.dedup.jsonl"  # FITIDs e impressões já importados
+
+def carregar_historico_transacoes():
+    """
+    Transações já importadas para a base (linhas com ID Transação), que
+    alimentam o índice de duplicidade na primeira vez
+    """
+    base = carregar_base()
+    if "ID Transação" not in base.columns:
+        return pd.DataFrame(columns=["ID Transação"])
+    return base[base["ID Transação"].notna()]
+
+INDICE_DUPLICIDADE = IndiceDuplicidade(ARQ_DUPLICIDADE, carregar_historico_transacoes)
+
 def mostrar_importacao_ofx():
     """
     Interface para importação de extratos bancários OFX
@@ -15,28 +31,56 @@ def mostrar_importacao_ofx():
     automaticamente ao sistema financeiro com classificação automática de transações.
     """)
     
-    # Upload do arquivo
-    uploaded_file = st.file_uploader(
-        "📁 Selecione o arquivo OFX do extrato bancário",
-        type=['ofx', 'qfx'],
-        help="Arquivo de extrato bancário no formato OFX/QFX baixado do seu banco"
+    # Upload dos arquivos (vários extratos ou um .zip viram um lote)
+    uploaded_files = st.file_uploader(
+        "📁 Selecione os arquivos OFX dos extratos bancários",
+        type=['ofx', 'qfx', 'zip'],
+        accept_multiple_files=True,
+        help="Extratos no formato OFX/QFX baixados do banco; vários arquivos ou um .zip são importados juntos"
     )
     
-    if uploaded_file is not None:
+    if uploaded_files:
         try:
-            # Exibir informações do arquivo
-            st.info(f"📄 **Arquivo:** {uploaded_file.name} ({uploaded_file.size} bytes)")
+            lote_arquivos = len(uploaded_files) > 1 or uploaded_files[0].name.lower().endswith(".zip")
+            nome_lote = "lote" if lote_arquivos else uploaded_files[0].name
+            aviso = st.empty()
             
-            # Processar arquivo
-            with st.spinner("Processando extrato bancário..."):
-                df_transacoes = extrair_transacoes(uploaded_file)
+            if lote_arquivos:
+                # Exibir informações dos arquivos
+                tamanho_total = sum(f.size for f in uploaded_files)
+                st.info(f"📄 **{len(uploaded_files)} arquivos** ({tamanho_total} bytes)")
+                
+                with st.spinner("Processando extratos em paralelo..."):
+                    df_transacoes, resumo = extrair_varios([(f.name, f.getvalue()) for f in uploaded_files])
+                
+                st.subheader("🗂️ Resumo por Arquivo")
+                st.dataframe(resumo, use_container_width=True, hide_index=True)
+                if not df_transacoes.empty:
+                    st.subheader("👀 Preview das Transações Extraídas")
+                    st.dataframe(df_transacoes.head(10), use_container_width=True)
+            else:
+                uploaded_file = uploaded_files[0]
+                # Exibir informações do arquivo
+                st.info(f"📄 **Arquivo:** {uploaded_file.name} ({uploaded_file.size} bytes)")
+                
+                # Processar arquivo em lotes: o preview aparece antes do fim da leitura
+                preview = st.empty()
+                lotes = []
+                lidas = 0
+                with st.spinner("Processando extrato bancário..."):
+                    for lote in extrair_lotes(uploaded_file):
+                        if not lotes:
+                            # Mostrar preview das transações
+                            with preview.container():
+                                st.subheader("👀 Preview das Transações Extraídas")
+                                st.dataframe(lote.head(10), use_container_width=True)
+                        lotes.append(lote)
+                        lidas += len(lote)
+                        aviso.info(f"⏳ {lidas} transações lidas...")
+                df_transacoes = pd.concat(lotes, ignore_index=True) if lotes else pd.DataFrame()
             
             if not df_transacoes.empty:
-                st.success(f"✅ **{len(df_transacoes)} transações** extraídas com sucesso!")
-                
-                # Mostrar preview das transações
-                st.subheader("👀 Preview das Transações Extraídas")
-                st.dataframe(df_transacoes.head(10), use_container_width=True)
+                aviso.success(f"✅ **{len(df_transacoes)} transações** extraídas com sucesso!")
                 
                 # Estatísticas
                 col1, col2, col3, col4 = st.columns(4)
@@ -68,7 +112,7 @@ def mostrar_importacao_ofx():
                         
                         # Editor de dados para classificação manual
                         df_editavel = nao_classificadas[["Descrição", "Memo", "Valor", "Categoria", "Centro de Custo", "Setor"]].copy()
-                        df_editado = st.data_editor(
+                        st.data_editor(
                             df_editavel,
                             column_config={
                                 "Categoria": st.column_config.SelectboxColumn(
@@ -93,12 +137,12 @@ def mostrar_importacao_ofx():
                         )
                         
                         if st.button("✅ Aplicar Classificações Manuais"):
-                            # Aplicar classificações editadas
-                            for idx, row in df_editado.iterrows():
-                                original_idx = nao_classificadas.index[idx]
-                                df_transacoes.loc[original_idx, "Categoria"] = row["Categoria"]
-                                df_transacoes.loc[original_idx, "Centro de Custo"] = row["Centro de Custo"]
-                                df_transacoes.loc[original_idx, "Setor"] = row["Setor"]
+                            # Memoriza as classificações: ao reprocessar o extrato (e nas próximas
+                            # importações) os mesmos favorecidos já vêm classificados
+                            # Só as linhas tocadas no editor (pelo índice do extrato)
+                            conjunto = ler_alteracoes("editor_classificacao", df_editavel)
+                            df_aplicado, afetadas = aplicar_alteracoes(df_transacoes, conjunto)
+                            aprender_classificacoes(df_aplicado[afetadas], usuario=st.session_state.get("username"))
                             
                             st.success("Classificações aplicadas!")
                             st.rerun()
@@ -135,10 +179,9 @@ def mostrar_importacao_ofx():
                                 st.info(f"✅ Backup criado: {backup_filename}")
                             
                             # Processar importação
-                            if apenas_novas and not base_existente.empty:
-                                # Filtrar apenas IDs que não existem
-                                ids_existentes = set(base_existente.get("ID Transação", []).astype(str))
-                                df_para_importar = df_transacoes[~df_transacoes["ID Transação"].astype(str).isin(ids_existentes)]
+                            if apenas_novas:
+                                # Filtrar pelo índice de FITIDs e impressões já importados
+                                df_para_importar = df_transacoes[~INDICE_DUPLICIDADE.duplicadas(df_transacoes)]
                                 
                                 if df_para_importar.empty:
                                     st.warning("⚠️ Todas as transações já existem na base!")
@@ -162,6 +205,7 @@ def mostrar_importacao_ofx():
                             
                             # Salvar base atualizada
                             if salvar_base(base_final):
+                                INDICE_DUPLICIDADE.registrar(df_transacoes)
                                 st.success(f"✅ **{len(df_para_importar)} transações** importadas com sucesso!")
                                 
                                 # Estatísticas da importação
@@ -186,7 +230,7 @@ def mostrar_importacao_ofx():
                     st.download_button(
                         "📥 Baixar Transações (CSV)",
                         csv_data,
-                        f"transacoes_ofx_{uploaded_file.name}.csv",
+                        f"transacoes_ofx_{nome_lote}.csv",
                         "text/csv",
                         use_container_width=True
                     )
@@ -228,18 +272,21 @@ def mostrar_importacao_ofx():
     
     # Seção de regras de classificação
     with st.expander("🤖 Regras de Classificação Automática"):
+        st.markdown("### 📋 Regras Atuais de Classificação:")
+        regras = pd.DataFrame(carregar_regras())
+        st.dataframe(
+            regras.rename(columns={
+                "prioridade": "Prioridade",
+                "termo": "Palavra-chave",
+                "categoria": "Categoria",
+                "centro_custo": "Centro de Custo",
+                "setor": "Setor",
+            }),
+            use_container_width=True,
+            hide_index=True,
+        )
         st.markdown("""
-        ### 📋 Regras Atuais de Classificação:
-        
-        | Palavra-chave | Categoria | Centro de Custo | Setor |
-        |---------------|-----------|-----------------|-------|
-        | PIX, TED, DOC | Transferência | Financeiro | Administrativo |
-        | BOLETO | Pagamento | Financeiro | Administrativo |
-        | NU PAGAMENTOS | Recebimento | Financeiro | Administrativo |
-        | PAG* | Cartão de Crédito | Financeiro | Administrativo |
-        | UBER, 99 | Transporte | Logística | Operacional |
-        | GOL, LATAM | Viagem | Logística | Operacional |
-        
         ### ✏️ Personalização:
-        As regras podem ser editadas no arquivo `parser_ofx.py` para adequar às necessidades da empresa.
+        As regras ficam no arquivo `regras_classificacao.json` e são recarregadas automaticamente ao salvar.
+        A menor prioridade vence; o termo casa como palavra inteira e `*` aceita o resto da palavra (ex.: `PAG*`).
         """)
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import pandas as pd
+from esquemas import centavos
+from indice_texto import normalizar_texto
+from registro_append import trava_arquivo, anexar_linhas
+
+class IndiceDuplicidade:
+    """
+    Índice persistido para barrar transações bancárias repetidas.
+
+    Guarda os FITID ("ID Transação") e uma impressão digital do conteúdo
+    (conta, data, valor em centavos e descrição/memo normalizados) de tudo
+    o que já foi importado, num arquivo JSON por linha só de acréscimo.
+    Em memória são dois conjuntos: a checagem é O(1) por transação e cada
+    sincronização lê só as linhas novas do arquivo.
+
+    Transações idênticas no mesmo extrato (dois PIX iguais no mesmo dia)
+    recebem um ordinal na impressão, então não se anulam entre si.
+    """
+
+    def __init__(self, caminho, carregar_historico):
+        self.caminho = caminho
+        self.lock = f"{caminho}.lock"
+        self.carregar_historico = carregar_historico
+        self.ids = set()
+        self.impressoes = set()
+        self._posicao = 0
+        self._mutex = threading.Lock()
+
+    def _trava(self):
+        pasta = os.path.dirname(self.caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        return trava_arquivo(self.lock)
+
+    def _ler_novas(self):
+        """
+        Incorpora as linhas gravadas desde a última leitura (inclusive por
+        outros processos). Arquivo menor que a posição lida: foi refeito.
+        """
+        if not os.path.exists(self.caminho):
+            return False
+        if os.path.getsize(self.caminho) < self._posicao:
+            self.ids, self.impressoes, self._posicao = set(), set(), 0
+        with open(self.caminho, "rb") as f:
+            f.seek(self._posicao)
+            for linha in f:
+                if not linha.endswith(b"\n"):
+                    break
+                registro = json.loads(linha)
+                if registro.get("id"):
+                    self.ids.add(registro["id"])
+                if registro.get("impressao"):
+                    self.impressoes.add(registro["impressao"])
+                self._posicao += len(linha)
+        return True
+
+    def _sincronizar(self):
+        with self._mutex, self._trava():
+            if not self._ler_novas():
+                # Primeira vez: monta o índice a partir do histórico existente
+                self._gravar(self.carregar_historico())
+                self._ler_novas()
+
+    def _gravar(self, df):
+        if df is None or df.empty:
+            open(self.caminho, "a").close()
+            return
+        novos = [
+            {"id": i, "impressao": p}
+            for i, p in zip(_ids(df), impressoes_digitais(df))
+            if (i and i not in self.ids) or (p and p not in self.impressoes)
+        ]
+        if novos:
+            anexar_linhas(self.caminho, novos)
+        else:
+            open(self.caminho, "a").close()
+
+    def duplicadas(self, df):
+        """
+        Máscara das transações de `df` que já existem no histórico (mesmo
+        FITID ou mesma impressão) ou que se repetem dentro do próprio df
+        """
+        self._sincronizar()
+        ids = _ids(df)
+        impressoes = impressoes_digitais(df)
+        vistos_ids, vistas_impressoes = set(), set()
+        repetidas = []
+        for i, p in zip(ids, impressoes):
+            repetida = (
+                (i and (i in self.ids or i in vistos_ids))
+                or (p and (p in self.impressoes or p in vistas_impressoes))
+            )
+            repetidas.append(bool(repetida))
+            vistos_ids.add(i)
+            vistas_impressoes.add(p)
+        return pd.Series(repetidas, index=df.index, dtype=bool)
+
+    def registrar(self, df):
+        """
+        Acrescenta ao índice as transações do extrato importado. Passe o
+        extrato inteiro (com as repetidas): os ordinais das impressões
+        dependem de todas as linhas, e o que já existe não é regravado.
+        """
+        if df.empty:
+            return
+        self._sincronizar()
+        with self._mutex, self._trava():
+            self._gravar(df)
+            self._ler_novas()
+
+    def reconstruir(self):
+        """
+        Refaz o índice a partir do histórico (após exclusões manuais na base)
+        """
+        with self._mutex, self._trava():
+            if os.path.exists(self.caminho):
+                os.remove(self.caminho)
+            self.ids, self.impressoes, self._posicao = set(), set(), 0
+            self._gravar(self.carregar_historico())
+            self._ler_novas()
+
+def _ids(df):
+    if "ID Transação" not in df.columns:
+        return [""] * len(df)
+    return df["ID Transação"].fillna("").astype(str).str.strip().tolist()
+
+def _texto_normalizado(texto):
+    return re.sub(r"\s+", " ", normalizar_texto(texto)).strip()
+
+def impressoes_digitais(df):
+    """
+    Hash de (conta, data, centavos, descrição + memo normalizados, ordinal)
+    para cada transação. Sem as colunas Data e Valor não há impressão
+    (texto vazio) e só o FITID identifica a transação.
+    """
+    if df.empty:
+        return []
+    if "Data" not in df.columns or "Valor" not in df.columns:
+        return [""] * len(df)
+    vazio = pd.Series("", index=df.index)
+    conta = df["Conta"].fillna("").astype(str) if "Conta" in df.columns else vazio
+    data = pd.to_datetime(df["Data"], errors="coerce").dt.strftime("%Y-%m-%d").fillna("")
+    valor = centavos(df["Valor"]).astype("string").fillna("")
+    texto = (
+        df.get("Descrição", vazio).fillna("").astype(str) + " " + df.get("Memo", vazio).fillna("").astype(str)
+    )
+    unicos = texto.unique()
+    texto = texto.map(dict(zip(unicos, map(_texto_normalizado, unicos))))
+    chave = conta + "|" + data + "|" + valor + "|" + texto
+    ordinal = chave.groupby(chave, sort=False).cumcount().astype(str)
+    return [
+        hashlib.blake2b(f"{c}#{o}".encode("utf-8"), digest_size=12).hexdigest()
+        for c, o in zip(chave, ordinal)
+    ]
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+CHAVES = ["Nº Fatura", "Data de Vencimento"]
+PRIMEIROS = ["Pagador do Frete - Nome", "Quinzena"]
+
+class IndiceFaturas:
+    """
+    Resumo pré-calculado das faturas da base.
+
+    Guarda agregados parciais por (fatura, vencimento) ordenados pelo
+    vencimento, de modo que um intervalo de datas vira uma fatia via
+    searchsorted e o resumo por fatura só combina os parciais da fatia.
+    As linhas de cada fatura ficam num mapa fatura -> posições para o
+    detalhe ser um take direto.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        quadro = pd.DataFrame({
+            "Nº Fatura": base["Nº Fatura"].reset_index(drop=True),
+            "Data de Vencimento": pd.to_datetime(base["Data de Vencimento"]).to_numpy(),
+            "Valor do frete": pd.to_numeric(base["Valor do frete"], errors="coerce").reset_index(drop=True),
+            "Número": pd.to_numeric(base["Número"], errors="coerce").reset_index(drop=True),
+            "posicao": np.arange(len(base)),
+        })
+        quadro = quadro.dropna(subset=CHAVES)
+        grupos = quadro.groupby(CHAVES, sort=False)
+        parciais = grupos.agg(
+            frete=("Valor do frete", "sum"),
+            numero=("Número", "max"),
+            posicao=("posicao", "min"),
+        )
+        # "first" do pandas é o primeiro valor preenchido: guarda valor e
+        # posição de cada parcial para combinar respeitando a ordem da base
+        for coluna in PRIMEIROS:
+            if coluna not in base.columns:
+                continue
+            valores = quadro[CHAVES + ["posicao"]].assign(valor=base[coluna].to_numpy()[quadro["posicao"]])
+            valores = valores.dropna(subset=["valor"]).drop_duplicates(CHAVES, keep="first")
+            parciais = parciais.join(
+                valores.set_index(CHAVES).rename(columns={"valor": coluna, "posicao": f"posicao {coluna}"})
+            )
+        self.parciais = parciais.reset_index().sort_values("Data de Vencimento", kind="stable").reset_index(drop=True)
+        self.vencimentos = self.parciais["Data de Vencimento"].to_numpy()
+
+        # Posições de cada fatura, na ordem da base
+        ordem = quadro.sort_values("Nº Fatura", kind="stable")
+        self.posicoes = {
+            fatura: grupo.to_numpy()
+            for fatura, grupo in ordem.groupby("Nº Fatura", sort=False)["posicao"]
+        }
+
+    def _fatia(self, inicio, fim):
+        inicio, fim = np.datetime64(pd.Timestamp(inicio)), np.datetime64(pd.Timestamp(fim))
+        a = np.searchsorted(self.vencimentos, inicio, side="left")
+        b = np.searchsorted(self.vencimentos, fim, side="right")
+        return self.parciais.iloc[a:b]
+
+    def resumo(self, inicio, fim):
+        """
+        Uma linha por fatura com CT-e vencendo entre inicio e fim
+        """
+        fatia = self._fatia(inicio, fim)
+        resumo = fatia.groupby("Nº Fatura").agg(frete=("frete", "sum"), numero=("numero", "max"))
+        for coluna in PRIMEIROS:
+            if coluna in fatia.columns:
+                primeiros = (
+                    fatia.dropna(subset=[coluna])
+                    .sort_values(f"posicao {coluna}")
+                    .drop_duplicates("Nº Fatura")
+                    .set_index("Nº Fatura")[coluna]
+                )
+                resumo[coluna] = primeiros
+        resumo["frete"] = resumo["frete"].round(2)
+        colunas = ["Nº Fatura", "Pagador do Frete - Nome", "frete", "numero", "Quinzena"]
+        resumo = resumo.reset_index()
+        return resumo[[c for c in colunas if c in resumo.columns]].rename(columns={
+            "Pagador do Frete - Nome": "Empresa Pagadora",
+            "frete": "Total do Frete",
+            "numero": "Número Fatura",
+        })
+
+    def detalhe(self, fatura, inicio, fim):
+        """
+        CT-e da fatura com vencimento entre inicio e fim
+        """
+        posicoes = self.posicoes.get(fatura, np.empty(0, dtype=np.int64))
+        linhas = self.base.iloc[posicoes]
+        vencimento = pd.to_datetime(linhas["Data de Vencimento"])
+        return linhas[(vencimento >= pd.Timestamp(inicio)) & (vencimento <= pd.Timestamp(fim))]
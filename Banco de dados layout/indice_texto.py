@@ -0,0 +1,92 @@
+import unicodedata
+import numpy as np
+import pandas as pd
+
+TAMANHO_GRAMA = 3
+
+def normalizar_texto(texto):
+    """
+    Minúsculas e sem acentos, para comparar textos digitados com a base
+    """
+    decomposto = unicodedata.normalize("NFKD", str(texto))
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).lower()
+
+def _gramas(texto):
+    return {texto[i:i + TAMANHO_GRAMA] for i in range(len(texto) - TAMANHO_GRAMA + 1)}
+
+class IndiceTexto:
+    """
+    Índice invertido de trigramas sobre colunas de texto da base.
+
+    Cada valor distinto (normalizado) entra uma vez no vocabulário; os
+    trigramas apontam para os valores e cada valor aponta para as linhas
+    onde aparece, em qualquer das colunas indexadas. A busca por trecho
+    (inclusive prefixo) cruza as listas dos trigramas do termo, confirma
+    os candidatos e devolve as posições das linhas.
+    """
+
+    def __init__(self, base, colunas):
+        self.colunas = [c for c in colunas if c in base.columns]
+        self.tamanho = len(base)
+
+        vocabulario = {}
+        pares_valor, pares_linha = [], []
+        for coluna in self.colunas:
+            serie = base[coluna]
+            codigos, valores = pd.factorize(serie, use_na_sentinel=True)
+            # Valores distintos da coluna -> posição no vocabulário comum
+            mapa = np.array(
+                [vocabulario.setdefault(normalizar_texto(v), len(vocabulario)) for v in valores],
+                dtype=np.int64,
+            )
+            preenchidas = np.flatnonzero(codigos >= 0)
+            pares_valor.append(mapa[codigos[preenchidas]])
+            pares_linha.append(preenchidas)
+
+        self.vocabulario = list(vocabulario)
+        valores = np.concatenate(pares_valor) if pares_valor else np.empty(0, dtype=np.int64)
+        linhas = np.concatenate(pares_linha) if pares_linha else np.empty(0, dtype=np.int64)
+        # Linhas agrupadas por valor: as de vocabulario[i] ficam em
+        # self.linhas[self.inicios[i]:self.inicios[i + 1]]
+        ordem = np.argsort(valores, kind="stable")
+        self.linhas = linhas[ordem]
+        self.inicios = np.searchsorted(valores[ordem], np.arange(len(self.vocabulario) + 1))
+
+        gramas = {}
+        for posicao, texto in enumerate(self.vocabulario):
+            for grama in _gramas(texto):
+                gramas.setdefault(grama, []).append(posicao)
+        self.gramas = {g: np.array(p, dtype=np.int64) for g, p in gramas.items()}
+
+    def _valores(self, termo):
+        """
+        Posições do vocabulário que contêm o termo (já normalizado)
+        """
+        if len(termo) < TAMANHO_GRAMA:
+            return [i for i, texto in enumerate(self.vocabulario) if termo in texto]
+        candidatos = None
+        # Menores listas primeiro: a interseção encolhe mais rápido
+        for lista in sorted((self.gramas.get(g) for g in _gramas(termo)), key=lambda l: 0 if l is None else len(l)):
+            if lista is None:
+                return []
+            candidatos = lista if candidatos is None else np.intersect1d(candidatos, lista, assume_unique=True)
+            if len(candidatos) == 0:
+                return []
+        return [i for i in candidatos if termo in self.vocabulario[i]]
+
+    def buscar(self, termo):
+        """
+        Posições (ordenadas) das linhas em que alguma coluna indexada
+        contém o termo, sem diferenciar maiúsculas nem acentos. Termo vazio
+        não filtra; termo que some ao normalizar (só acentos soltos) não
+        encontra nada.
+        """
+        if not termo:
+            return np.arange(self.tamanho)
+        termo = normalizar_texto(termo)
+        if not termo:
+            return np.empty(0, dtype=np.int64)
+        fatias = [self.linhas[self.inicios[i]:self.inicios[i + 1]] for i in self._valores(termo)]
+        if not fatias:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(fatias))
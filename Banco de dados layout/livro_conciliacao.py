@@ -0,0 +1,157 @@
+import os
+import sqlite3
+from collections import namedtuple
+from contextlib import closing
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from armazenamento import _valor_sql
+
+ARQ_LIVRO = os.getenv("DASHBOARD_LIVRO", "data/conciliacao.db")
+LOTE_SQL = 500
+
+COLUNAS_LIVRO = ["chave", "documento", "origem", "status", "valor", "valor_documento", "diferenca", "em"]
+
+# chaves novas ou alteradas, chaves que sumiram, impressão de cada chave
+# atual e assinatura do lado inteiro (atalho quando nada mudou)
+Alteracoes = namedtuple("Alteracoes", "lado chaves removidas impressoes assinatura")
+
+def impressoes_linhas(df, chave, colunas):
+    """
+    Hash (int64) do conteúdo de cada linha, indexado pela chave
+    """
+    colunas = [c for c in colunas if c in df.columns]
+    dados = df[colunas].astype(object).where(df[colunas].notna(), None)
+    hashes = pd.util.hash_pandas_object(dados, index=False).to_numpy().view(np.int64)
+    return pd.Series(hashes, index=df[chave].astype(str).to_numpy())
+
+class LivroConciliacao:
+    """
+    Livro de conciliação persistido em SQLite.
+
+    Guarda um lançamento por chave de origem (documento, status, valores,
+    diferença e horário) e, para cada lado conciliado, a impressão digital
+    das linhas já avaliadas. Cada execução compara as impressões e devolve
+    só as chaves novas ou alteradas; se a assinatura do lado não mudou,
+    nem as impressões gravadas são lidas.
+    """
+
+    def __init__(self, nome, caminho=ARQ_LIVRO):
+        self.nome = nome
+        self.caminho = caminho
+
+    def _conectar(self):
+        pasta = os.path.dirname(self.caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        con = sqlite3.connect(self.caminho, timeout=30)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS lancamentos (livro TEXT, chave TEXT, documento TEXT, origem TEXT, "
+            "status TEXT, valor REAL, valor_documento REAL, diferenca REAL, em TEXT, PRIMARY KEY (livro, chave))"
+        )
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS marcas (livro TEXT, lado TEXT, chave TEXT, impressao INTEGER, "
+            "PRIMARY KEY (livro, lado, chave))"
+        )
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS assinaturas (livro TEXT, lado TEXT, assinatura TEXT, "
+            "PRIMARY KEY (livro, lado))"
+        )
+        return con
+
+    def alteracoes(self, lado, df, chave, colunas):
+        """
+        Compara as linhas de `df` com as impressões gravadas para o lado
+        """
+        impressoes = impressoes_linhas(df, chave, colunas)
+        impressoes = impressoes[~impressoes.index.duplicated(keep="last")]
+        assinatura = f"{len(impressoes)}:{int(impressoes.sum()) & 0xFFFFFFFFFFFFFFFF:x}"
+        with closing(self._conectar()) as con:
+            gravada = con.execute(
+                "SELECT assinatura FROM assinaturas WHERE livro=? AND lado=?", (self.nome, lado)
+            ).fetchone()
+            if gravada is not None and gravada[0] == assinatura:
+                return Alteracoes(lado, [], [], impressoes.iloc[:0], assinatura)
+            anteriores = pd.read_sql_query(
+                "SELECT chave, impressao FROM marcas WHERE livro=? AND lado=?", con, params=(self.nome, lado)
+            ).set_index("chave")["impressao"]
+        comuns = impressoes.astype("Int64").reindex(anteriores.index)
+        mudou = impressoes.index.difference(anteriores.index).tolist()
+        mudou += anteriores.index[comuns.notna() & (comuns != anteriores)].tolist()
+        removidas = anteriores.index[comuns.isna()].tolist()
+        return Alteracoes(lado, mudou, removidas, impressoes.loc[mudou], assinatura)
+
+    def gravar(self, lancamentos, *alteracoes, remover=()):
+        """
+        Grava (upsert) os lançamentos avaliados, remove os de `remover` e
+        avança as marcas dos lados, tudo numa transação
+        """
+        em = datetime.now().isoformat(timespec="seconds")
+        linhas = []
+        if lancamentos is not None and not lancamentos.empty:
+            dados = lancamentos.reindex(columns=COLUNAS_LIVRO)
+            dados["em"] = em
+            linhas = [
+                [self.nome] + [_valor_sql(v) for v in linha]
+                for linha in dados.itertuples(index=False, name=None)
+            ]
+        with closing(self._conectar()) as con, con:
+            con.executemany(
+                f"INSERT OR REPLACE INTO lancamentos (livro, {', '.join(COLUNAS_LIVRO)}) "
+                f"VALUES ({', '.join('?' * (len(COLUNAS_LIVRO) + 1))})",
+                linhas,
+            )
+            remover = [str(c) for c in remover]
+            for i in range(0, len(remover), LOTE_SQL):
+                lote = remover[i:i + LOTE_SQL]
+                con.execute(
+                    f"DELETE FROM lancamentos WHERE livro=? AND chave IN ({', '.join('?' * len(lote))})",
+                    [self.nome, *lote],
+                )
+            for alteracao in alteracoes:
+                con.executemany(
+                    "INSERT OR REPLACE INTO marcas (livro, lado, chave, impressao) VALUES (?, ?, ?, ?)",
+                    [(self.nome, alteracao.lado, c, int(v)) for c, v in alteracao.impressoes.items()],
+                )
+                removidas = list(alteracao.removidas)
+                for i in range(0, len(removidas), LOTE_SQL):
+                    lote = removidas[i:i + LOTE_SQL]
+                    con.execute(
+                        f"DELETE FROM marcas WHERE livro=? AND lado=? AND chave IN ({', '.join('?' * len(lote))})",
+                        [self.nome, alteracao.lado, *lote],
+                    )
+                con.execute(
+                    "INSERT OR REPLACE INTO assinaturas (livro, lado, assinatura) VALUES (?, ?, ?)",
+                    (self.nome, alteracao.lado, alteracao.assinatura),
+                )
+        return len(linhas)
+
+    def lancamentos(self, chaves=None):
+        """
+        Lançamentos do livro (todos ou só as chaves informadas)
+        """
+        colunas = ", ".join(COLUNAS_LIVRO)
+        with closing(self._conectar()) as con:
+            if chaves is None:
+                return pd.read_sql_query(
+                    f"SELECT {colunas} FROM lancamentos WHERE livro=?", con, params=(self.nome,)
+                )
+            chaves = [str(c) for c in chaves]
+            partes = [
+                pd.read_sql_query(
+                    f"SELECT {colunas} FROM lancamentos WHERE livro=? AND chave IN ({', '.join('?' * len(lote))})",
+                    con, params=[self.nome, *lote],
+                )
+                for lote in (chaves[i:i + LOTE_SQL] for i in range(0, len(chaves), LOTE_SQL))
+            ]
+        return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=COLUNAS_LIVRO)
+
+    def refazer(self):
+        """
+        Esquece lançamentos e marcas: a próxima execução reavalia tudo
+        """
+        with closing(self._conectar()) as con, con:
+            for tabela in ("lancamentos", "marcas", "assinaturas"):
+                con.execute(f"DELETE FROM {tabela} WHERE livro=?", (self.nome,))
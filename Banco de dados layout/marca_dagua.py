@@ -0,0 +1,39 @@
+import pandas as pd
+
+# Marca d'água dos agregados da base de CT-e (cubo e séries): o maior Número
+# já agregado e os totais das linhas até ele. Se essas linhas não mudaram, só
+# as de Número acima da marca precisam ser somadas ao agregado gravado.
+
+def assinatura(base):
+    """
+    Marca d'água (maior Número) e totais das linhas até ela. Só existe
+    quando o Número é inteiro e preenchido em todas as linhas.
+    """
+    numeros = base["Número"] if "Número" in base.columns else None
+    if numeros is None or not pd.api.types.is_integer_dtype(numeros) or numeros.isna().any():
+        return None
+    return {
+        "marca_numero": int(numeros.max()),
+        "linhas": len(base),
+        "total_frete": total_frete(base),
+    }
+
+def total_frete(base):
+    if "Valor do frete" not in base.columns:
+        return 0.0
+    return round(float(pd.to_numeric(base["Valor do frete"], errors="coerce").sum()), 2)
+
+def linhas_novas(base, meta):
+    """
+    Linhas com Número acima da marca d'água, se as linhas antigas
+    continuam as mesmas (mesma quantidade e mesmo total de frete).
+    Retorna None quando o agregado precisa ser refeito.
+    """
+    if meta.get("marca_numero") is None or assinatura(base) is None:
+        return None
+    antigas = base["Número"].to_numpy() <= meta["marca_numero"]
+    if int(antigas.sum()) != meta["linhas"]:
+        return None
+    if total_frete(base[antigas]) != meta["total_frete"]:
+        return None
+    return base[~antigas]
@@ -0,0 +1,152 @@
+import hashlib
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import fitz  # PyMuPDF
+from cache_colunar import ler_cache, salvar_cache
+
+# Versão do parser; ao mudar, as faturas em cache são extraídas de novo
+VERSAO_PARSER = 1
+# Páginas por tarefa do pool; PDFs até esse tamanho são lidos no próprio processo
+PAGINAS_POR_TAREFA = 25
+
+COLUNAS_FATURA = ["Número", "Data", "Valor do frete (PDF)", "Página"]
+
+# Uma linha que começa com o número do CT-e abre um registro; 14+ dígitos
+# (CNPJ, chave de acesso) não contam como número de documento
+_NOTA = re.compile(r"(\d{5,10})(?!\S)")
+_DATA = re.compile(r"(?<!\d)(\d{2}/\d{2}/\d{4})(?!\d)")
+_VALOR = re.compile(r"(?<![\d.,])(\d[\d.]*,\d{2})(?!\d)")
+
+_documento = None
+
+def hash_fatura(conteudo):
+    """
+    SHA-256 do conteúdo do PDF (chave do cache)
+    """
+    return hashlib.sha256(conteudo).hexdigest()
+
+def _registro(bloco, pagina):
+    """
+    Número, data e valor de um registro: a data é a primeira do bloco e o
+    valor, o primeiro depois dela
+    """
+    nota = _NOTA.match(bloco[0])
+    data = valor = None
+    for linha in [bloco[0][nota.end():], *bloco[1:]]:
+        if data is None:
+            m = _DATA.search(linha)
+            if m is None:
+                continue
+            data = m.group(1)
+            linha = linha[m.end():]
+        m = _VALOR.search(linha)
+        if m:
+            valor = m.group(1)
+            break
+    if data is None or valor is None:
+        return None
+    return {
+        "Número": nota.group(1),
+        "Data": data,
+        "Valor do frete (PDF)": float(valor.replace(".", "").replace(",", ".")),
+        "Página": pagina,
+    }
+
+def _ler_pagina(texto, pagina):
+    """
+    Quebra o texto da página em registros, linha a linha e sem backtracking.
+    Retorna (linhas antes do primeiro registro, registros completos,
+    (último bloco, página)), pois o último registro pode continuar na
+    página seguinte.
+    """
+    cabeca, blocos = [], []
+    for linha in texto.splitlines():
+        linha = linha.strip()
+        if not linha:
+            continue
+        if _NOTA.match(linha):
+            blocos.append([linha])
+        elif blocos:
+            blocos[-1].append(linha)
+        else:
+            cabeca.append(linha)
+    registros = [r for r in (_registro(b, pagina) for b in blocos[:-1]) if r]
+    return cabeca, registros, ((blocos[-1], pagina) if blocos else None)
+
+def _iniciar_processo(conteudo):
+    # O PDF é enviado uma vez por processo, não uma vez por tarefa
+    global _documento
+    _documento = fitz.open(stream=conteudo, filetype="pdf")
+
+def _ler_intervalo(intervalo):
+    inicio, fim = intervalo
+    return [_ler_pagina(_documento[i].get_text(), i + 1) for i in range(inicio, fim)]
+
+def _paginas(conteudo, max_processos=None):
+    """
+    Resultado de _ler_pagina para cada página, na ordem do documento.
+    PDFs grandes são lidos em paralelo, em intervalos de páginas.
+    """
+    with fitz.open(stream=conteudo, filetype="pdf") as doc:
+        total = doc.page_count
+        processos = min(max_processos or os.cpu_count() or 1, -(-total // PAGINAS_POR_TAREFA))
+        if processos <= 1:
+            for i in range(total):
+                yield _ler_pagina(doc[i].get_text(), i + 1)
+            return
+    intervalos = [(i, min(i + PAGINAS_POR_TAREFA, total)) for i in range(0, total, PAGINAS_POR_TAREFA)]
+    # spawn: o servidor do Streamlit tem threads e fork não é seguro
+    with ProcessPoolExecutor(
+        processos, mp_context=multiprocessing.get_context("spawn"),
+        initializer=_iniciar_processo, initargs=(conteudo,),
+    ) as pool:
+        for paginas in pool.map(_ler_intervalo, intervalos):
+            yield from paginas
+
+def _montar(registros):
+    df = pd.DataFrame(registros, columns=COLUNAS_FATURA)
+    df["Data"] = pd.to_datetime(df["Data"], format="%d/%m/%Y", errors="coerce")
+    return df
+
+def extrair_lotes(conteudo, max_processos=None):
+    """
+    Gera os registros da fatura página a página (um DataFrame por página).
+    Se o mesmo PDF já foi lido, devolve o resultado em cache de uma vez.
+    """
+    chave = f"fatura_{hash_fatura(conteudo)[:32]}"
+    cache, meta = ler_cache(chave)
+    if cache is not None and meta.get("formato") == VERSAO_PARSER:
+        yield cache
+        return
+
+    lotes = []
+    pendente = None  # (linhas, página) do registro que pode seguir na próxima página
+    for cabeca, registros, ultimo in _paginas(conteudo, max_processos):
+        if ultimo is None:
+            # Página sem início de registro: tudo continua o bloco pendente
+            if pendente is not None:
+                pendente = (pendente[0] + cabeca, pendente[1])
+            continue
+        linhas = [_registro(pendente[0] + cabeca, pendente[1])] if pendente is not None else []
+        linhas.extend(registros)
+        pendente = ultimo
+        lote = _montar([r for r in linhas if r])
+        lotes.append(lote)
+        yield lote
+    if pendente is not None:
+        lote = _montar([r for r in [_registro(*pendente)] if r])
+        lotes.append(lote)
+        yield lote
+
+    fatura = pd.concat(lotes, ignore_index=True) if lotes else _montar([])
+    salvar_cache(chave, fatura, {"formato": VERSAO_PARSER})
+
+def extrair_fatura(conteudo, max_processos=None):
+    """
+    Todos os registros da fatura em um DataFrame
+    """
+    lotes = list(extrair_lotes(conteudo, max_processos))
+    return pd.concat(lotes, ignore_index=True) if lotes else _montar([])
@@ -1,52 +1,411 @@
-from ofxparse import OfxParser
+import codecs
+import html
+import io
+import json
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
 import pandas as pd
+from indice_texto import normalizar_texto
+from registro_append import trava_arquivo, anexar_linhas, ler_linhas
 
-REGRAS = {
-    "PIX": ("Transferência", "Financeiro", "Administrativo"),
-    "BOLETO": ("Pagamento", "Financeiro", "Administrativo"),
-    "TED": ("Transferência", "Financeiro", "Administrativo"),
-    "DOC": ("Transferência", "Financeiro", "Administrativo"),
-    "NU PAGAMENTOS": ("Recebimento", "Financeiro", "Administrativo"),
-    "PAG*": ("Cartão de Crédito", "Financeiro", "Administrativo"),
-    "UBER": ("Transporte", "Logística", "Operacional"),
-    "GOL": ("Viagem", "Logística", "Operacional"),
-    "LATAM": ("Viagem", "Logística", "Operacional"),
-    "99": ("Transporte", "Logística", "Operacional")
-}
+# Regras de classificação editáveis (recarregadas quando o arquivo muda).
+# Cada regra: prioridade (menor vence), termo, categoria, centro_custo, setor.
+# O termo casa como palavra inteira; "*" é o asterisco literal dos descritores
+# de cartão ("PAG*LOJA") e dispensa o limite de palavra desse lado.
+ARQ_REGRAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "regras_classificacao.json")
+
+# Usadas quando o arquivo de regras não existe
+REGRAS = [
+    ("PIX", "Transferência", "Financeiro", "Administrativo"),
+    ("BOLETO", "Pagamento", "Financeiro", "Administrativo"),
+    ("TED", "Transferência", "Financeiro", "Administrativo"),
+    ("DOC", "Transferência", "Financeiro", "Administrativo"),
+    ("NU PAGAMENTOS", "Recebimento", "Financeiro", "Administrativo"),
+    ("PAG*", "Cartão de Crédito", "Financeiro", "Administrativo"),
+    ("UBER", "Transporte", "Logística", "Operacional"),
+    ("GOL", "Viagem", "Logística", "Operacional"),
+    ("LATAM", "Viagem", "Logística", "Operacional"),
+    ("99", "Transporte", "Logística", "Operacional"),
+]
+
+INDEFINIDO = "❗Definir"
+SEM_REGRA = ("Outros", INDEFINIDO, INDEFINIDO)
+COLUNAS_CLASSIFICACAO = ["Categoria", "Centro de Custo", "Setor"]
+COLUNAS_TRANSACAO = [
+    "Data", "Valor", "Tipo", "Descrição", "Memo", *COLUNAS_CLASSIFICACAO,
+    "ID Transação", "Conciliado com", "Conta",
+]
+
+# Leitura incremental do OFX: bloco lido do arquivo e transações por lote
+TAMANHO_BLOCO_OFX = 256 * 1024
+TAMANHO_LOTE_OFX = 2000
+EXTENSOES_OFX = (".ofx", ".qfx")
+_TAG_OFX = re.compile(r"<(/?)([A-Za-z0-9.]+)[^>]*>([^<]*)")
+
+_compilado = {"mtime": None, "regex": None, "resultados": []}
+
+# Classificações confirmadas manualmente: assinatura do favorecido ->
+# (categoria, centro de custo, setor). Consultadas antes das regras.
+ARQ_APRENDIDAS = "data/classificacoes_aprendidas.jsonl"
+# Números com pelo menos tantos dígitos identificam o favorecido (raiz de
+# CNPJ, CPF, agência/conta, terminal) e entram na assinatura; os menores
+# (parcelas, valores, códigos de operação) ficam de fora
+MIN_DIGITOS_IDENTIFICADOR = 5
+# Assinaturas com menos letras que isso não identificam ninguém
+MIN_LETRAS_ASSINATURA = 3
+_DATA_TEXTO = re.compile(r"\b\d{1,2}/\d{1,2}(?:/\d{2,4})?\b")
+_SEPARADOR_NUMERO = re.compile(r"(?<=\d)[./-](?=\d)")
+
+_aprendidas = {"versao": None, "tabela": {}}
+
+def carregar_regras():
+    """
+    Lê as regras do arquivo JSON em ordem de prioridade
+    """
+    if not os.path.exists(ARQ_REGRAS):
+        return [
+            {"prioridade": i, "termo": t, "categoria": c, "centro_custo": cc, "setor": s}
+            for i, (t, c, cc, s) in enumerate(REGRAS)
+        ]
+    with open(ARQ_REGRAS, "r", encoding="utf-8") as f:
+        regras = json.load(f)
+    return sorted(regras, key=lambda r: r.get("prioridade", 0))
+
+def _padrao(termo):
+    """
+    Termo -> regex de palavra inteira (limite só nas pontas que são letra
+    ou dígito; o resto, inclusive "*", é literal)
+    """
+    termo = termo.upper()
+    inicio = r"(?<!\w)" if re.match(r"\w", termo) else ""
+    fim = r"(?!\w)" if re.search(r"\w$", termo) else ""
+    return f"{inicio}{re.escape(termo)}{fim}"
+
+def _regex_regras():
+    """
+    Regex única com um grupo por regra. Cada alternativa varre o texto
+    inteiro antes da seguinte, então vence a regra de maior prioridade
+    (e não a que aparece primeiro no texto). Recompila se o arquivo mudou.
+    """
+    mtime = os.stat(ARQ_REGRAS).st_mtime_ns if os.path.exists(ARQ_REGRAS) else 0
+    if _compilado["regex"] is None or _compilado["mtime"] != mtime:
+        regras = carregar_regras()
+        alternativas = "|".join(f".*?({_padrao(r['termo'])})" for r in regras)
+        _compilado["regex"] = re.compile(f"^(?:{alternativas})", re.DOTALL)
+        _compilado["resultados"] = [(r["categoria"], r["centro_custo"], r["setor"]) for r in regras]
+        _compilado["mtime"] = mtime
+    return _compilado["regex"], _compilado["resultados"]
+
+def assinatura_transacao(texto):
+    """
+    Assinatura do favorecido: palavras de descrição + memo sem acentos e
+    pontuação, mais os números com cara de identificador (CNPJ/CPF
+    formatados viram um número só). Datas e números curtos ficam de fora,
+    para reconhecer o mesmo favorecido mês a mês
+    """
+    texto = _SEPARADOR_NUMERO.sub("", _DATA_TEXTO.sub(" ", normalizar_texto(texto)))
+    return " ".join(
+        parte for parte in re.findall(r"[a-z]+|\d+", texto)
+        if not parte.isdigit() or len(parte) >= MIN_DIGITOS_IDENTIFICADOR
+    )
+
+def _assinatura_aprendivel(assinatura):
+    return sum(c.isalpha() for c in assinatura) >= MIN_LETRAS_ASSINATURA
+
+def _texto_transacao(descricoes, memos):
+    return (descricoes.fillna("").astype(str) + " " + memos.fillna("").astype(str)).str.upper()
+
+def carregar_aprendidas():
+    """
+    Tabela assinatura -> classificação, relida só quando o arquivo muda
+    """
+    if not os.path.exists(ARQ_APRENDIDAS):
+        return {}
+    info = os.stat(ARQ_APRENDIDAS)
+    versao = (info.st_size, info.st_mtime_ns)
+    if _aprendidas["versao"] != versao:
+        tabela = {}
+        for registro in ler_linhas(ARQ_APRENDIDAS):
+            tabela[registro["assinatura"]] = (registro["categoria"], registro["centro_custo"], registro["setor"])
+        _aprendidas["tabela"] = tabela
+        _aprendidas["versao"] = versao
+    return _aprendidas["tabela"]
+
+def aprender_classificacoes(df, usuario=None):
+    """
+    Memoriza as classificações confirmadas pelo usuário (linhas com centro
+    de custo e setor definidos) para as próximas importações
+    """
+    definidas = df[
+        df["Centro de Custo"].notna() & (df["Centro de Custo"] != INDEFINIDO)
+        & df["Setor"].notna() & (df["Setor"] != INDEFINIDO)
+    ]
+    if definidas.empty:
+        return 0
+    textos = _texto_transacao(definidas["Descrição"], definidas["Memo"])
+    atuais = carregar_aprendidas()
+    novas = {}
+    for texto, categoria, centro, setor in zip(
+        textos, definidas["Categoria"], definidas["Centro de Custo"], definidas["Setor"]
+    ):
+        assinatura = assinatura_transacao(texto)
+        if not _assinatura_aprendivel(assinatura):
+            continue
+        if atuais.get(assinatura) != (categoria, centro, setor):
+            novas[assinatura] = (categoria, centro, setor)
+    if not novas:
+        return 0
+    em = datetime.now().isoformat(timespec="seconds")
+    os.makedirs(os.path.dirname(ARQ_APRENDIDAS), exist_ok=True)
+    with trava_arquivo(f"{ARQ_APRENDIDAS}.lock"):
+        anexar_linhas(ARQ_APRENDIDAS, [
+            {"assinatura": a, "categoria": c, "centro_custo": cc, "setor": setor, "usuario": usuario, "em": em}
+            for a, (c, cc, setor) in novas.items()
+        ])
+    return len(novas)
+
+def classificar_transacoes(descricoes, memos):
+    """
+    Classifica colunas inteiras de descrição e memo de uma vez: primeiro
+    pelas classificações aprendidas, depois pelas regras.
+    Retorna DataFrame com Categoria, Centro de Custo e Setor.
+    """
+    regex, resultados = _regex_regras()
+    aprendidas = carregar_aprendidas()
+    texto = _texto_transacao(descricoes, memos)
+    classificacoes = [*resultados, SEM_REGRA]
+    sem_regra = len(resultados)
+    posicoes = {}
+    # Extratos repetem muito as descrições: classifica cada texto distinto uma vez
+    codigos, unicos = pd.factorize(texto)
+    regra_unicos = np.full(len(unicos), sem_regra, dtype=np.int64)
+    for i, unico in enumerate(unicos):
+        aprendida = aprendidas.get(assinatura_transacao(unico)) if aprendidas else None
+        if aprendida is not None:
+            if aprendida not in posicoes:
+                posicoes[aprendida] = len(classificacoes)
+                classificacoes.append(aprendida)
+            regra_unicos[i] = posicoes[aprendida]
+            continue
+        achado = regex.match(unico)
+        if achado is not None and achado.lastindex:
+            regra_unicos[i] = achado.lastindex - 1
+    regra = regra_unicos[codigos] if len(regra_unicos) else np.full(len(texto), sem_regra)
+    tabela = pd.DataFrame(classificacoes, columns=COLUNAS_CLASSIFICACAO)
+    return tabela.iloc[regra].set_index(texto.index)
 
 def classificar_transacao(descricao: str, memo: str):
     texto = f"{descricao} {memo}".upper()
-    for palavra, (categoria, centro, setor) in REGRAS.items():
-        if palavra in texto:
-            return categoria, centro, setor
-    return "Outros", "❗Definir", "❗Definir"
+    aprendida = carregar_aprendidas().get(assinatura_transacao(texto))
+    if aprendida is not None:
+        return aprendida
+    regex, resultados = _regex_regras()
+    achado = regex.match(texto)
+    if achado is None or achado.lastindex is None:
+        return SEM_REGRA
+    return resultados[achado.lastindex - 1]
 
-def extrair_transacoes(ofx_file) -> pd.DataFrame:
-    ofx = OfxParser.parse(ofx_file)
-    transacoes = []
+def _decodificador(inicio):
+    """
+    Escolhe a codificação pelo cabeçalho OFX (SGML: CHARSET; XML: encoding)
+    """
+    cabecalho = inicio[:512].decode("ascii", errors="ignore").upper()
+    if "UTF-8" in cabecalho or "CHARSET:UTF" in cabecalho:
+        codificacao = "utf-8"
+    elif "CHARSET:1252" in cabecalho or "ENCODING:USASCII" in cabecalho or "CHARSET:ISO" in cabecalho:
+        codificacao = "cp1252"
+    else:
+        codificacao = "utf-8"
+    return codecs.getincrementaldecoder(codificacao)(errors="replace")
+
+def _ler_blocos(arquivo):
+    """
+    Lê o arquivo (caminho, bytes ou objeto tipo arquivo) em blocos de texto
+    """
+    if isinstance(arquivo, (str, os.PathLike)):
+        with open(arquivo, "rb") as f:
+            yield from _ler_blocos(f)
+        return
+    if isinstance(arquivo, bytes):
+        arquivo = io.BytesIO(arquivo)
+    if hasattr(arquivo, "seek"):
+        arquivo.seek(0)
+    decodificador = None
+    while True:
+        bloco = arquivo.read(TAMANHO_BLOCO_OFX)
+        if not bloco:
+            break
+        if decodificador is None:
+            decodificador = _decodificador(bloco)
+        yield decodificador.decode(bloco)
+    if decodificador is not None:
+        yield decodificador.decode(b"", final=True)
+
+def _tokens(arquivo):
+    """
+    Tags OFX em ordem: (fechamento?, nome, texto após a tag). Funciona para
+    SGML (elementos sem fechamento) e XML; o que sobra de um bloco
+    incompleto é juntado ao seguinte.
+    """
+    resto = ""
+    for bloco in _ler_blocos(arquivo):
+        texto = resto + bloco
+        ultimo = texto.rfind("<")
+        if ultimo == -1:
+            resto = texto
+            continue
+        for fecha, nome, valor in _TAG_OFX.findall(texto, 0, ultimo):
+            yield fecha == "/", nome.upper(), valor
+        resto = texto[ultimo:]
+    for fecha, nome, valor in _TAG_OFX.findall(resto):
+        yield fecha == "/", nome.upper(), valor
+
+def _data_ofx(valor):
+    # AAAAMMDD[HHMMSS[.XXX]][[-3:BRT]]: fica só a data local
+    digitos = valor.strip()[:8]
+    return f"{digitos[:4]}-{digitos[4:6]}-{digitos[6:8]}" if len(digitos) == 8 else None
 
-    for txn in ofx.account.statement.transactions:
-        desc = txn.payee or ""
-        memo = txn.memo or ""
-        categoria, centro, setor = classificar_transacao(desc, memo)
+def _valor_ofx(valor):
+    valor = valor.strip().replace(",", ".")
+    try:
+        return float(valor)
+    except ValueError:
+        return None
 
+def ler_transacoes_ofx(ofx_file):
+    """
+    Percorre o OFX de forma incremental e gera um dicionário por transação
+    (STMTTRN) de todas as contas do arquivo, corrente ou cartão
+    """
+    conta = ""
+    campos = None
+    for fecha, nome, valor in _tokens(ofx_file):
+        valor = html.unescape(valor.strip())
+        if fecha:
+            if nome == "STMTTRN" and campos is not None:
+                yield {**campos, "Conta": conta}
+                campos = None
+            continue
+        if nome == "STMTTRN":
+            campos = {}
+        elif nome == "ACCTID" and campos is None:
+            conta = valor
+        elif campos is not None and valor:
+            campos.setdefault(nome, valor)
+
+def _montar_lote(registros):
+    transacoes = []
+    for campos in registros:
+        valor = _valor_ofx(campos.get("TRNAMT", ""))
+        data = _data_ofx(campos.get("DTPOSTED", ""))
+        if valor is None or data is None:
+            continue
         transacoes.append({
-            "Data": txn.date.strftime("%Y-%m-%d"),  # padroniza para string ISO
-            "Valor": float(txn.amount),
-            "Tipo": "Receita" if txn.amount > 0 else "Despesa",
-            "Descrição": desc,
-            "Memo": memo,
-            "Categoria": categoria,
-            "Centro de Custo": centro,
-            "Setor": setor,
-            "ID Transação": str(txn.id),  # Garante string para chave
-            "Conciliado com": ""
+            "Data": data,  # padroniza para string ISO
+            "Valor": valor,
+            "Tipo": "Receita" if valor > 0 else "Despesa",
+            "Descrição": campos.get("NAME") or campos.get("PAYEE") or "",
+            "Memo": campos.get("MEMO", ""),
+            "ID Transação": campos.get("FITID", ""),  # Garante string para chave
+            "Conciliado com": "",
+            "Conta": campos["Conta"],
         })
 
-    df = pd.DataFrame(transacoes)
+    df = pd.DataFrame(transacoes, columns=[c for c in COLUNAS_TRANSACAO if c not in COLUNAS_CLASSIFICACAO])
+    df[COLUNAS_CLASSIFICACAO] = classificar_transacoes(df["Descrição"], df["Memo"])
+    df = df[COLUNAS_TRANSACAO]
 
     # Garante tipos coerentes para uso posterior
     df["Valor"] = df["Valor"].astype(float)
     df["Data"] = pd.to_datetime(df["Data"])
-
     return df
+
+def extrair_lotes(ofx_file, tamanho_lote=TAMANHO_LOTE_OFX):
+    """
+    Gera DataFrames já classificados de até `tamanho_lote` transações,
+    à medida que o arquivo é lido
+    """
+    lote = []
+    for registro in ler_transacoes_ofx(ofx_file):
+        lote.append(registro)
+        if len(lote) >= tamanho_lote:
+            yield _montar_lote(lote)
+            lote = []
+    if lote:
+        yield _montar_lote(lote)
+
+def extrair_transacoes(ofx_file) -> pd.DataFrame:
+    lotes = list(extrair_lotes(ofx_file))
+    if not lotes:
+        return _montar_lote([])
+    return pd.concat(lotes, ignore_index=True)
+
+def expandir_arquivos(arquivos):
+    """
+    Lista de (nome, bytes) com os OFX/QFX soltos e os de dentro de arquivos .zip
+    """
+    expandidos = []
+    for nome, conteudo in arquivos:
+        if nome.lower().endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(conteudo)) as zf:
+                for info in zf.infolist():
+                    if not info.is_dir() and info.filename.lower().endswith(EXTENSOES_OFX):
+                        expandidos.append((f"{nome}/{info.filename}", zf.read(info)))
+        else:
+            expandidos.append((nome, conteudo))
+    return expandidos
+
+def _extrair_arquivo(arquivo):
+    # Executado nos processos do pool: precisa ser função de módulo
+    nome, conteudo = arquivo
+    try:
+        return nome, extrair_transacoes(conteudo), None
+    except Exception as e:
+        return nome, None, str(e)
+
+def extrair_varios(arquivos, max_processos=None):
+    """
+    Lê e classifica vários extratos em paralelo (um processo por arquivo)
+    e junta tudo sem duplicidade de (Conta, ID Transação).
+    Retorna (transações, resumo por arquivo).
+    """
+    arquivos = expandir_arquivos(arquivos)
+    if len(arquivos) > 1:
+        processos = min(len(arquivos), max_processos or os.cpu_count() or 1)
+        # spawn: o servidor do Streamlit tem threads e fork não é seguro
+        with ProcessPoolExecutor(processos, mp_context=multiprocessing.get_context("spawn")) as pool:
+            resultados = list(pool.map(_extrair_arquivo, arquivos))
+    else:
+        resultados = [_extrair_arquivo(a) for a in arquivos]
+
+    vistos = set()
+    lotes, resumo = [], []
+    for nome, df, erro in resultados:
+        linha = {"Arquivo": nome, "Contas": "", "Transações": 0, "Duplicadas": 0,
+                 "Receitas": 0.0, "Despesas": 0.0, "Início": None, "Fim": None, "Erro": erro or ""}
+        if df is not None and not df.empty:
+            repetida = np.zeros(len(df), dtype=bool)
+            for i, chave in enumerate(zip(df["Conta"], df["ID Transação"])):
+                repetida[i] = chave in vistos
+                vistos.add(chave)
+            novas = df[~repetida]
+            linha.update({
+                "Contas": ", ".join(sorted(df["Conta"].astype(str).unique())),
+                "Transações": len(novas),
+                "Duplicadas": int(repetida.sum()),
+                "Receitas": novas.loc[novas["Valor"] > 0, "Valor"].sum(),
+                "Despesas": novas.loc[novas["Valor"] < 0, "Valor"].sum(),
+                "Início": df["Data"].min(),
+                "Fim": df["Data"].max(),
+            })
+            lotes.append(novas)
+        resumo.append(linha)
+
+    transacoes = pd.concat(lotes, ignore_index=True) if lotes else _montar_lote([])
+    return transacoes, pd.DataFrame(resumo)
+
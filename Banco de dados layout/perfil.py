@@ -0,0 +1,158 @@
+import builtins
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# Ativado com DASHBOARD_PROFILE=1; os relatórios vão para DASHBOARD_PROFILE_DIR
+ATIVO = os.getenv("DASHBOARD_PROFILE", "").lower() not in ("", "0", "false", "nao", "não")
+PASTA_PERFIL = os.getenv("DASHBOARD_PROFILE_DIR", "data/perfil")
+
+_local = threading.local()
+_import_original = builtins.__import__
+# O gancho de import é do processo inteiro e as sessões do Streamlit rodam em
+# threads próprias: fica instalado enquanto houver alguma execução medida
+_trava_import = threading.Lock()
+_execucoes_ativas = 0
+
+class _Etapa:
+    def __init__(self, nome, tipo):
+        self.nome = nome
+        self.tipo = tipo
+        self.filhos = []
+        self.inicio = time.perf_counter()
+        self.duracao = 0.0
+
+    def encerrar(self):
+        self.duracao = time.perf_counter() - self.inicio
+
+    def proprio(self):
+        """
+        Tempo gasto na etapa fora das etapas filhas
+        """
+        return max(self.duracao - sum(f.duracao for f in self.filhos), 0.0)
+
+    def como_dict(self):
+        return {
+            "nome": self.nome,
+            "tipo": self.tipo,
+            "ms": round(self.duracao * 1000, 3),
+            "proprio_ms": round(self.proprio() * 1000, 3),
+            "filhos": [f.como_dict() for f in self.filhos],
+        }
+
+def _pilha():
+    if not hasattr(_local, "pilha"):
+        _local.pilha = []
+    return _local.pilha
+
+@contextmanager
+def _etapa(nome, tipo):
+    pilha = _pilha()
+    if not pilha:
+        # Fora de uma execução medida (outra thread, import tardio)
+        yield
+        return
+    etapa = _Etapa(nome, tipo)
+    pilha[-1].filhos.append(etapa)
+    pilha.append(etapa)
+    try:
+        yield
+    finally:
+        etapa.encerrar()
+        pilha.pop()
+
+def _import_medido(nome, globals=None, locals=None, fromlist=(), level=0):
+    # Só o primeiro carregamento custa; imports já resolvidos passam direto
+    if level or nome in sys.modules:
+        return _import_original(nome, globals, locals, fromlist, level)
+    with _etapa(nome, "import"):
+        return _import_original(nome, globals, locals, fromlist, level)
+
+def _instalar_import():
+    global _execucoes_ativas
+    with _trava_import:
+        _execucoes_ativas += 1
+        if _execucoes_ativas == 1:
+            builtins.__import__ = _import_medido
+
+def _restaurar_import():
+    global _execucoes_ativas
+    with _trava_import:
+        _execucoes_ativas -= 1
+        if _execucoes_ativas == 0:
+            builtins.__import__ = _import_original
+
+def iniciar(nome="main"):
+    """
+    Abre a medição de uma execução do script (inclusive os imports que vierem
+    depois desta chamada). Sem DASHBOARD_PROFILE não faz nada.
+    """
+    if not ATIVO:
+        return
+    # Execução anterior desta thread interrompida sem finalizar: já conta
+    if not _pilha():
+        _instalar_import()
+    _local.pilha = [_Etapa(nome, "execucao")]
+
+def medir(nome):
+    """
+    Context manager que mede um trecho (carregamento, autenticação, página)
+    dentro da execução corrente
+    """
+    if not ATIVO:
+        return nullcontext()
+    return _etapa(nome, "etapa")
+
+def _linhas_flamegraph(etapa, prefixo=""):
+    """
+    Formato "pilha;dobrada microssegundos" aceito pelo flamegraph.pl/speedscope
+    """
+    caminho = f"{prefixo};{etapa.nome}" if prefixo else etapa.nome
+    linhas = [f"{caminho} {int(etapa.proprio() * 1_000_000)}"]
+    for filho in etapa.filhos:
+        linhas.extend(_linhas_flamegraph(filho, caminho))
+    return linhas
+
+def finalizar():
+    """
+    Fecha a execução medida e grava o relatório JSON e o arquivo para
+    flamegraph em PASTA_PERFIL. Retorna o caminho do JSON.
+    """
+    pilha = _pilha()
+    if not ATIVO or not pilha:
+        return None
+    _restaurar_import()
+    raiz = pilha[0]
+    raiz.encerrar()
+    _local.pilha = []
+
+    os.makedirs(PASTA_PERFIL, exist_ok=True)
+    carimbo = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    base = os.path.join(PASTA_PERFIL, f"perfil-{carimbo}")
+    importacoes = sorted(
+        (e for e in _percorrer(raiz) if e.tipo == "import"), key=lambda e: e.duracao, reverse=True
+    )
+    relatorio = {
+        "em": datetime.now().isoformat(timespec="seconds"),
+        "pid": os.getpid(),
+        "total_ms": round(raiz.duracao * 1000, 3),
+        "etapas": raiz.como_dict(),
+        "importacoes": [
+            {"modulo": e.nome, "ms": round(e.duracao * 1000, 3), "proprio_ms": round(e.proprio() * 1000, 3)}
+            for e in importacoes
+        ],
+    }
+    with open(f"{base}.json", "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    with open(f"{base}.folded", "w", encoding="utf-8") as f:
+        f.write("\n".join(_linhas_flamegraph(raiz)) + "\n")
+    return f"{base}.json"
+
+def _percorrer(etapa):
+    yield etapa
+    for filho in etapa.filhos:
+        yield from _percorrer(filho)
@@ -0,0 +1,340 @@
+import json
+import logging
+import os
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from esquemas import ESQUEMAS, CATEGORIA, ler_tabela, gravar_tabela, tipar
+
+# Tamanho do log a partir do qual a compactação é disparada
+LIMITE_COMPACTACAO = 1024 * 1024
+TAMANHO_BLOCO = 64 * 1024
+
+@contextmanager
+def trava_arquivo(caminho):
+    """
+    Trava exclusiva entre processos sobre um arquivo de lock
+    """
+    with open(caminho, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def anexar_linhas(caminho, registros):
+    """
+    Acrescenta vários registros JSON com um único fsync. Uma última linha
+    incompleta deixada por gravação interrompida é descartada antes, para
+    não ser emendada ao primeiro registro novo. Quem chama segura a trava.
+    """
+    descartar_linha_incompleta(caminho)
+    texto = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in registros)
+    with open(caminho, "a", encoding="utf-8") as f:
+        f.write(texto)
+        f.flush()
+        os.fsync(f.fileno())
+
+def descartar_linha_incompleta(caminho):
+    """
+    Trunca o arquivo logo após o último fim de linha
+    """
+    if not os.path.exists(caminho):
+        return
+    with open(caminho, "rb+") as f:
+        fim = f.seek(0, os.SEEK_END)
+        if fim == 0:
+            return
+        f.seek(fim - 1)
+        if f.read(1) == b"\n":
+            return
+        posicao = fim
+        while posicao > 0:
+            inicio = max(0, posicao - TAMANHO_BLOCO)
+            f.seek(inicio)
+            quebra = f.read(posicao - inicio).rfind(b"\n")
+            if quebra >= 0:
+                break
+            posicao = inicio
+        f.truncate(inicio + quebra + 1 if posicao > 0 else 0)
+        f.flush()
+        os.fsync(f.fileno())
+
+def ler_linhas(caminho):
+    """
+    Lê os registros de um log JSON por linha, ignorando uma última linha
+    incompleta (gravação interrompida) e pulando linhas corrompidas
+    """
+    if not os.path.exists(caminho):
+        return []
+    registros = []
+    with open(caminho, "rb") as f:
+        for numero, linha in enumerate(f, 1):
+            if not linha.endswith(b"\n"):
+                break
+            try:
+                registros.append(json.loads(linha))
+            except ValueError:
+                logging.warning(f"Linha {numero} de {caminho} corrompida; ignorada")
+    return registros
+
+def _geracao_log(caminho):
+    """
+    Geração gravada na primeira linha do log (None se não houver)
+    """
+    try:
+        with open(caminho, "rb") as f:
+            primeira = json.loads(f.readline())
+    except (OSError, ValueError):
+        return None
+    return primeira.get("geracao") if primeira.get("op") == "geracao" else None
+
+class RegistroAppend:
+    """
+    Tabela persistida como snapshot CSV + log de operações só de acréscimo.
+
+    Inserções e atualizações são gravadas como uma linha no log (custo
+    constante); a leitura materializa snapshot + log; a compactação
+    periódica regrava o snapshot e zera o log.
+
+    Cada log nasce com um número de geração na primeira linha. Ao regravar o
+    snapshot, a geração incorporada e o tamanho/mtime do novo arquivo vão
+    para `<arquivo>.geracao`; um log de geração já incorporada a esse
+    snapshot (compactação interrompida depois da troca) é descartado em vez
+    de reaplicado, o que duplicaria as inserções.
+    """
+
+    def __init__(self, nome, chave=None, limite_compactacao=LIMITE_COMPACTACAO):
+        self.nome = nome
+        self.chave = chave
+        self.limite_compactacao = limite_compactacao
+        self.arquivo = ESQUEMAS[nome]["arquivo"]
+        self.log = f"{self.arquivo}.log"
+        self.log_compactando = f"{self.log}.compactando"
+        self.arquivo_geracao = f"{self.arquivo}.geracao"
+        self.lock = f"{self.arquivo}.lock"
+
+    def inserir(self, dados):
+        """
+        Acrescenta um novo registro à tabela
+        """
+        self._gravar({"op": "inserir", "dados": dados})
+
+    def atualizar(self, valor_chave, campos):
+        """
+        Atualiza campos do registro identificado pela chave
+        """
+        if self.chave is None:
+            raise ValueError(f"Registro '{self.nome}' não tem coluna chave")
+        self._gravar({"op": "atualizar", "chave": valor_chave, "dados": campos})
+
+    def aplicar_lote(self, inseridos=(), atualizados=None, removidos=()):
+        """
+        Grava de uma vez (um único fsync) inserções, atualizações
+        {valor_chave: {coluna: valor}} e remoções por chave
+        """
+        atualizados = atualizados or {}
+        if (atualizados or removidos) and self.chave is None:
+            raise ValueError(f"Registro '{self.nome}' não tem coluna chave")
+        registros = [{"op": "inserir", "dados": dados} for dados in inseridos]
+        registros += [
+            {"op": "atualizar", "chave": valor_chave, "dados": campos}
+            for valor_chave, campos in atualizados.items()
+        ]
+        registros += [{"op": "remover", "chave": valor_chave} for valor_chave in removidos]
+        self._gravar_varios(registros)
+        return len(registros)
+
+    def existe(self):
+        """
+        Indica se a tabela já tem snapshot ou operações gravadas
+        """
+        return any(os.path.exists(c) for c in (self.arquivo, self.log, self.log_compactando))
+
+    def carregar(self):
+        """
+        Materializa a tabela atual (snapshot + operações do log)
+        """
+        with trava_arquivo(self.lock):
+            return self._materializar()
+
+    def substituir(self, df):
+        """
+        Regrava a tabela inteira com `df` e descarta o log pendente
+        (importações que sobrescrevem tudo)
+        """
+        with trava_arquivo(self.lock):
+            # Os logs pendentes contam como incorporados ao novo snapshot
+            self._gravar_snapshot(df, self._ultima_geracao())
+            for log in (self.log, self.log_compactando):
+                if os.path.exists(log):
+                    os.remove(log)
+
+    def _gravar(self, registro):
+        self._gravar_varios([registro])
+
+    def _gravar_varios(self, registros):
+        if not registros:
+            return
+        em = datetime.now().isoformat(timespec="seconds")
+        for registro in registros:
+            registro["em"] = em
+        with trava_arquivo(self.lock):
+            descartar_linha_incompleta(self.log)
+            if not os.path.exists(self.log) or os.path.getsize(self.log) == 0:
+                registros = [{"op": "geracao", "geracao": self._ultima_geracao() + 1}] + registros
+            anexar_linhas(self.log, registros)
+            if os.path.getsize(self.log) >= self.limite_compactacao:
+                self._compactar()
+
+    def _ler_geracao(self):
+        try:
+            with open(self.arquivo_geracao, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _incorporada(self):
+        """
+        Geração já incorporada ao snapshot atual (0 se não houver registro
+        ou se ele descreve outro arquivo)
+        """
+        estado = self._ler_geracao()
+        if not estado or not os.path.exists(self.arquivo):
+            return 0
+        info = os.stat(self.arquivo)
+        if (estado.get("tamanho"), estado.get("mtime_ns")) != (info.st_size, info.st_mtime_ns):
+            return 0
+        return estado.get("geracao", 0)
+
+    def _ultima_geracao(self):
+        geracoes = [self._ler_geracao().get("geracao", 0)]
+        geracoes += [_geracao_log(log) or 0 for log in (self.log_compactando, self.log) if os.path.exists(log)]
+        return max(geracoes)
+
+    def _logs_pendentes(self):
+        """
+        Logs ainda não incorporados ao snapshot; os já incorporados (sobra
+        de compactação interrompida) são apagados
+        """
+        logs = []
+        incorporada = self._incorporada()
+        for log in (self.log_compactando, self.log):
+            if not os.path.exists(log):
+                continue
+            geracao = _geracao_log(log)
+            if geracao is not None and geracao <= incorporada:
+                os.remove(log)
+            else:
+                logs.append(log)
+        return logs
+
+    def _gravar_snapshot(self, df, geracao):
+        """
+        Regrava o snapshot. O registro de geração descreve o arquivo
+        temporário antes da troca (o rename preserva tamanho e mtime): se a
+        troca não acontecer, ele não confere com o snapshot antigo.
+        """
+        tmp = f"{self.arquivo}.tmp"
+        gravar_tabela(self.nome, df, tmp)
+        info = os.stat(tmp)
+        estado = {"geracao": geracao, "tamanho": info.st_size, "mtime_ns": info.st_mtime_ns}
+        with open(f"{self.arquivo_geracao}.tmp", "w", encoding="utf-8") as f:
+            json.dump(estado, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{self.arquivo_geracao}.tmp", self.arquivo_geracao)
+        os.replace(tmp, self.arquivo)
+
+    def _materializar(self, logs=None):
+        df = ler_tabela(self.nome, self.arquivo)
+        operacoes = []
+        for log in self._logs_pendentes() if logs is None else logs:
+            operacoes.extend(r for r in ler_linhas(log) if r["op"] != "geracao")
+        if not operacoes:
+            return df
+
+        # Categorias viram texto para aceitar valores novos e voltam no fim
+        categorias = [c for c, tipo in ESQUEMAS[self.nome]["colunas"].items() if tipo == CATEGORIA]
+        df = df.astype({c: object for c in categorias if c in df.columns})
+
+        # Chave -> posições no snapshot e nos registros inseridos pelo log,
+        # montado uma vez; atualizações e remoções valem sobre tudo o que já
+        # foi inserido até elas
+        posicoes = {}
+        if self.chave in df.columns:
+            for posicao, valor in enumerate(df[self.chave].astype(str)):
+                posicoes.setdefault(valor, []).append(posicao)
+        pendentes = {}
+        novos = []
+        alteracoes = {}
+        removidas = np.zeros(len(df), dtype=bool)
+        for op in operacoes:
+            if op["op"] == "inserir":
+                if self.chave in op["dados"]:
+                    pendentes.setdefault(str(op["dados"][self.chave]), []).append(len(novos))
+                novos.append(dict(op["dados"]))
+                continue
+            chave = str(op["chave"])
+            if op["op"] == "atualizar":
+                for posicao in posicoes.get(chave, ()):
+                    for coluna, valor in op["dados"].items():
+                        alteracoes.setdefault(coluna, {})[posicao] = valor
+                for indice in pendentes.get(chave, ()):
+                    novos[indice].update(op["dados"])
+            elif op["op"] == "remover":
+                for posicao in posicoes.pop(chave, ()):
+                    removidas[posicao] = True
+                for indice in pendentes.pop(chave, ()):
+                    novos[indice] = None
+
+        for coluna, valores in alteracoes.items():
+            if coluna not in df.columns:
+                df[coluna] = None
+            df.iloc[list(valores), df.columns.get_loc(coluna)] = list(valores.values())
+        df = df[~removidas]
+        novos = [registro for registro in novos if registro is not None]
+        if novos:
+            df = self._concatenar(df, novos)
+
+        for coluna in categorias:
+            if coluna in df.columns:
+                df[coluna] = df[coluna].astype("category")
+        return df.reset_index(drop=True)
+
+    def _concatenar(self, df, registros):
+        novos = tipar(self.nome, pd.DataFrame(registros))
+        if df.empty:
+            return novos
+        return pd.concat([df, novos], ignore_index=True)
+
+    def _compactar(self):
+        pendentes = self._logs_pendentes()
+        if self.log_compactando in pendentes:
+            # Sobra de compactação interrompida: incorpora antes do log atual
+            self._incorporar()
+        if self.log in pendentes:
+            os.replace(self.log, self.log_compactando)
+            self._incorporar()
+
+    def _incorporar(self):
+        """
+        Leva o log em compactação para o snapshot e o apaga
+        """
+        df = self._materializar([self.log_compactando])
+        # Log sem geração (anterior ao registro) mantém a geração atual
+        geracao = _geracao_log(self.log_compactando) or self._ler_geracao().get("geracao", 0)
+        self._gravar_snapshot(df, geracao)
+        os.remove(self.log_compactando)
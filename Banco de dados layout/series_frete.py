@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+from cache_colunar import atualizar_meta_cache, ler_cache, salvar_cache
+from cubo_frete import MEDIDAS, CONTAGEM
+from data_loader import versao_base
+from marca_dagua import assinatura, linhas_novas
+
+CACHE_SERIES = "series_frete"
+# Versão do formato das séries; ao mudar, os caches gravados são descartados
+VERSAO_SERIES = 1
+
+# Resoluções da mais fina para a mais grossa (nome -> dias aproximados por ponto)
+RESOLUCOES = {
+    "Dia": 1,
+    "Semana": 7,
+    "Quinzena": 15,
+    "Mês": 30,
+    "Ano": 365,
+}
+MAX_PONTOS = 400  # teto de pontos de um gráfico de tendência
+
+COLUNAS_SERIES = ["Resolução", "Início"] + list(MEDIDAS.values()) + [CONTAGEM]
+
+def inicio_periodo(datas, resolucao):
+    """
+    Data de início do período (dia, semana ISO, quinzena, mês ou ano) de
+    cada data, calculada sobre o array inteiro
+    """
+    dias = pd.to_datetime(datas).to_numpy().astype("datetime64[D]")
+    if resolucao == "Dia":
+        inicio = dias
+    elif resolucao == "Semana":
+        # 1970-01-01 foi quinta: +3 leva a segunda-feira ao resto zero
+        inicio = dias - ((dias.astype(np.int64) + 3) % 7).astype("timedelta64[D]")
+    elif resolucao == "Quinzena":
+        meses = dias.astype("datetime64[M]").astype("datetime64[D]")
+        inicio = meses + np.where(dias - meses >= np.timedelta64(15, "D"), 15, 0).astype("timedelta64[D]")
+    elif resolucao == "Mês":
+        inicio = dias.astype("datetime64[M]").astype("datetime64[D]")
+    elif resolucao == "Ano":
+        inicio = dias.astype("datetime64[Y]").astype("datetime64[D]")
+    else:
+        raise ValueError(f"Resolução desconhecida: {resolucao}")
+    return inicio.astype("datetime64[ns]")
+
+def construir_series(base):
+    """
+    Frete, volumes, peso e quantidade de CT-e somados por período, em
+    todas as resoluções (formato longo: uma linha por resolução e início)
+    """
+    medidas = pd.DataFrame(index=base.index)
+    for origem, medida in MEDIDAS.items():
+        if origem in base.columns:
+            medidas[medida] = pd.to_numeric(base[origem], errors="coerce").fillna(0).to_numpy()
+    medidas[CONTAGEM] = 1
+
+    # Agrega por dia uma vez; as demais resoluções partem dos dias
+    validas = base["Data de Emissão"].notna().to_numpy()
+    medidas = medidas[validas].assign(Início=inicio_periodo(base["Data de Emissão"][validas], "Dia"))
+    por_dia = medidas.groupby("Início", sort=True).sum()
+    partes = []
+    for resolucao in RESOLUCOES:
+        chave = inicio_periodo(por_dia.index.to_series(), resolucao)
+        pontos = por_dia.groupby(chave).sum() if resolucao != "Dia" else por_dia
+        partes.append(pontos.rename_axis("Início").reset_index().assign(**{"Resolução": resolucao}))
+    series = pd.concat(partes, ignore_index=True)
+    return series[[c for c in COLUNAS_SERIES if c in series.columns]]
+
+def _combinar(series, novas):
+    """
+    Soma as séries das linhas novas nas gravadas; só os períodos presentes
+    em `novas` mudam de valor
+    """
+    juntas = pd.concat([series, novas], ignore_index=True)
+    medidas = [c for c in juntas.columns if c not in ("Resolução", "Início")]
+    return juntas.groupby(["Resolução", "Início"], sort=True)[medidas].sum().reset_index()
+
+def obter_series(base):
+    """
+    Séries de todas as resoluções. Reaproveitadas enquanto a versão do
+    dataset não muda; quando só chegam CT-e novos (marca d'água do cubo),
+    apenas os períodos dessas linhas são atualizados.
+    """
+    if base.empty or "Data de Emissão" not in base.columns:
+        return pd.DataFrame(columns=COLUNAS_SERIES)
+
+    versao = versao_base(base)
+    series, meta = ler_cache(CACHE_SERIES)
+    if series is not None and meta.get("formato") == VERSAO_SERIES:
+        if versao is not None and meta.get("versao") == versao:
+            return series
+        novas = linhas_novas(base, meta)
+        if novas is not None:
+            if not novas.empty:
+                series = _combinar(series, construir_series(novas))
+                _gravar(series, base, versao)
+            elif meta.get("versao") != versao:
+                # Arquivo regravado sem linhas novas: só a versão muda
+                atualizar_meta_cache(CACHE_SERIES, {**meta, "versao": versao})
+            return series
+
+    series = construir_series(base)
+    _gravar(series, base, versao)
+    return series
+
+def _gravar(series, base, versao):
+    meta = {"formato": VERSAO_SERIES, "versao": versao}
+    meta.update(assinatura(base) or {"marca_numero": None})
+    salvar_cache(CACHE_SERIES, series, meta)
+
+def resolucao_para(inicio, fim, max_pontos=MAX_PONTOS):
+    """
+    Resolução mais fina que cobre o intervalo com até `max_pontos` pontos
+    """
+    dias = max((pd.Timestamp(fim) - pd.Timestamp(inicio)).days, 1)
+    for resolucao, passo in RESOLUCOES.items():
+        if dias / passo <= max_pontos:
+            return resolucao
+    return "Ano"
+
+def serie(series, resolucao, inicio=None, fim=None):
+    """
+    Pontos de uma resolução entre inicio e fim, indexados pelo início do período
+    """
+    pontos = series[series["Resolução"] == resolucao].set_index("Início").drop(columns="Resolução")
+    if inicio is not None:
+        # Inclui o período que contém `inicio`, mesmo começando antes dele
+        inicio = inicio_periodo(pd.Series([pd.Timestamp(inicio)]), resolucao)[0]
+        pontos = pontos[pontos.index >= inicio]
+    if fim is not None:
+        pontos = pontos[pontos.index <= pd.Timestamp(fim)]
+    return pontos.sort_index()
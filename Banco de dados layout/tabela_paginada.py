@@ -0,0 +1,114 @@
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+TAMANHOS_PAGINA = [50, 100, 250, 500]
+SEM_ORDEM = "—"
+
+# dados: linhas e colunas da página; numero: página atual (1..paginas);
+# linhas: total de linhas depois do filtro
+Pagina = namedtuple("Pagina", "dados numero paginas linhas")
+
+def _texto(serie):
+    return (
+        isinstance(serie.dtype, pd.CategoricalDtype)
+        or pd.api.types.is_string_dtype(serie.dtype)
+        or serie.dtype == object
+    )
+
+def _contem(serie, termo):
+    """
+    Máscara (numpy) das linhas cujo texto contém o termo. Em colunas
+    categóricas a busca roda só nas categorias e volta pelos códigos.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        achou = serie.cat.categories.astype(str).str.contains(termo, case=False, regex=False)
+        # Código -1 (vazio) cai na última posição, sempre False
+        return np.append(np.asarray(achou, dtype=bool), False)[serie.cat.codes.to_numpy()]
+    if serie.dtype == object:
+        serie = serie.astype("string")
+    return serie.str.contains(termo, case=False, regex=False, na=False).to_numpy(dtype=bool)
+
+def filtrar_posicoes(df, termo, colunas):
+    """
+    Posições das linhas com `termo` em alguma das colunas de texto
+    """
+    if not termo:
+        return np.arange(len(df))
+    mascara = np.zeros(len(df), dtype=bool)
+    for coluna in colunas:
+        if coluna in df.columns and _texto(df[coluna]):
+            mascara |= _contem(df[coluna], termo)
+    return np.flatnonzero(mascara)
+
+def ordenar_posicoes(df, posicoes, coluna, decrescente=False):
+    """
+    Reordena as posições pela coluna (vazios por último), sem mexer em `df`
+    """
+    if coluna is None or coluna not in df.columns or len(posicoes) == 0:
+        return posicoes
+    valores = df[coluna].iloc[posicoes].reset_index(drop=True)
+    if isinstance(valores.dtype, pd.CategoricalDtype) and not valores.cat.ordered:
+        # Categorias sem ordem definida: ordena pelo texto
+        valores = valores.astype(object)
+    ordem = valores.sort_values(ascending=not decrescente, na_position="last", kind="stable").index.to_numpy()
+    return posicoes[ordem]
+
+def paginar(df, chave, colunas=None, fixas=(), tamanho=TAMANHOS_PAGINA[0]):
+    """
+    Controles de filtro, ordenação, colunas e página para `df`. Filtro e
+    ordenação rodam no servidor sobre posições; só a página e as colunas
+    escolhidas são montadas para envio ao navegador. `fixas` entram na
+    página mesmo sem estar entre as colunas escolhidas (ex.: um ID oculto).
+    """
+    todas = [c for c in df.columns if c not in fixas]
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        termo = st.text_input("🔍 Filtrar", key=f"{chave}_filtro")
+    with col2:
+        coluna_ordem = st.selectbox("Ordenar por", [SEM_ORDEM] + todas, key=f"{chave}_ordem")
+    with col3:
+        decrescente = st.checkbox("Decrescente", key=f"{chave}_decrescente")
+    visiveis = st.multiselect(
+        "Colunas", todas, default=[c for c in (colunas or todas) if c in todas], key=f"{chave}_colunas"
+    ) or todas
+
+    posicoes = filtrar_posicoes(df, termo.strip(), visiveis)
+    posicoes = ordenar_posicoes(df, posicoes, None if coluna_ordem == SEM_ORDEM else coluna_ordem, decrescente)
+
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        por_pagina = st.selectbox(
+            "Linhas por página", TAMANHOS_PAGINA,
+            index=TAMANHOS_PAGINA.index(tamanho) if tamanho in TAMANHOS_PAGINA else 0,
+            key=f"{chave}_tamanho",
+        )
+    paginas = max(1, -(-len(posicoes) // por_pagina))
+    chave_numero = f"{chave}_pagina"
+    if st.session_state.get(chave_numero, 1) > paginas:
+        # O filtro encolheu a tabela: volta para a primeira página
+        st.session_state[chave_numero] = 1
+    with col2:
+        numero = int(st.number_input("Página", min_value=1, max_value=paginas, step=1, key=chave_numero))
+    inicio = (numero - 1) * por_pagina
+    fim = min(inicio + por_pagina, len(posicoes))
+    with col3:
+        if len(posicoes):
+            st.caption(f"Linhas {inicio + 1}–{fim} de {len(posicoes)} (página {numero} de {paginas})")
+        else:
+            st.caption("Nenhuma linha encontrada")
+
+    projetadas = list(fixas) + [c for c in todas if c in visiveis]
+    dados = df.iloc[posicoes[inicio:fim]][[c for c in projetadas if c in df.columns]]
+    return Pagina(dados, numero, paginas, len(posicoes))
+
+@st.fragment
+def tabela_paginada(df, chave, colunas=None, tamanho=TAMANHOS_PAGINA[0], **opcoes):
+    """
+    st.dataframe só com a página visível de `df` (ver paginar). É um
+    fragmento: trocar página, filtro ou ordem reexecuta só a tabela.
+    """
+    pagina = paginar(df, chave, colunas, tamanho=tamanho)
+    st.dataframe(pagina.dados, use_container_width=True, **opcoes)
+    return pagina